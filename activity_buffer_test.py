@@ -0,0 +1,32 @@
+import tempfile
+from pathlib import Path
+
+from app.portfolio_manager import Portfolio
+from app.ring_buffer import EventLog
+
+
+def main():
+    p = Portfolio("Buffer", "key", "secret", "https://paper-api.alpaca.markets")
+    for i in range(500):
+        p.log_event("prompt", f"prompt {i}")
+        p.log_event("trade", f"buy {i} AAPL")
+    print("events kept", len(p.activity_log))
+    print("last trades", [e["message"] for e in p.activity_log.last(2, ["trade"])])
+    print("last debug", [e["message"] for e in p.activity_log.last(3, ["prompt", "response"])])
+
+    p.max_drawdown_pct = 0.1
+    p.check_risk(100.0, simulate=True)
+    for _ in range(5):
+        p.check_risk(80.0, simulate=True)
+    print("drawdown alerts", len(p.risk_alerts))
+    print("memory", p.memory_usage()["total"], "dropped", p.activity_log.dropped)
+
+    spill = Path(tempfile.mkdtemp()) / "spill.jsonl"
+    log = EventLog(capacity=2, overflow="spill", spill_path=spill)
+    for i in range(5):
+        log.append({"time": str(i), "type": "trade", "message": str(i)})
+    print("spilled", log.spilled, "lines", len(spill.read_text().splitlines()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import time
+
+from app.event_bus import ActivityBus
+
+
+def main():
+    batches = []
+    bus = ActivityBus(batches.append, flush_interval=0.1, max_queue=50)
+    start = time.perf_counter()
+    for i in range(200):
+        bus.publish("Bus", {"type": "research", "message": f"event {i}"})
+    bus.publish("Bus", {"type": "prompt", "message": "x" * 5000})
+    print("publish ms", round((time.perf_counter() - start) * 1000, 2))
+    time.sleep(0.3)
+    print("batches", len(batches), "events", sum(len(b) for b in batches))
+    last = batches[-1][-1]["event"]
+    print("truncated", last["truncated"], len(last["message"]))
+    print("full length", len(bus.get_ref(last["ref"])["event"]["message"]))
+    metrics = bus.metrics()
+    print("dropped", metrics["dropped"], "max depth", metrics["max_depth"])
+    bus.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import math
+import time
+
+import numpy as np
+
+from app.analytics import PerformanceTracker, values_at
+from app.lot_ledger import LotLedger
+from app.portfolio_manager import Portfolio
+from app.reporting import calculate_stats
+from app.timeseries import TimeSeries
+
+
+def reference(times, values, bench):
+    """Metrics recomputed from scratch for comparison."""
+    r = values[1:] / values[:-1] - 1
+    years = (times[-1] - times[0]) / (365.25 * 86400)
+    per_year = len(r) / years
+    b = values_at(bench, times)
+    rb = b[1:] / b[:-1] - 1
+    ok = np.isfinite(rb)
+    cov = np.cov(rb[ok], r[ok])
+    beta = cov[0, 1] / cov[0, 0]
+    peaks = np.maximum.accumulate(values)
+    return {
+        "sharpe": r.mean() / r.std(ddof=1) * math.sqrt(per_year),
+        "sortino": r.mean() / math.sqrt(np.mean(np.minimum(r, 0) ** 2)) * math.sqrt(per_year),
+        "volatility": r.std(ddof=1) * math.sqrt(per_year),
+        "max_drawdown": float((1 - values / peaks).max()),
+        "beta": beta,
+        "alpha": (r[ok].mean() - beta * rb[ok].mean()) * per_year,
+    }
+
+
+def main():
+    rng = np.random.default_rng(7)
+    n = 20_000
+    times = 1.7e9 + np.arange(n) * 3600.0
+    bench_values = 400 * np.cumprod(1 + rng.normal(0, 0.002, n))
+    bench_returns = np.diff(bench_values, prepend=bench_values[0]) / bench_values
+    values = 1e5 * np.cumprod(1 + 1.3 * bench_returns + rng.normal(0, 0.001, n))
+    bench = TimeSeries()
+    for t, v in zip(times, bench_values):
+        bench.add(t, v)
+
+    series = TimeSeries()
+    tracker = PerformanceTracker()
+    start = time.perf_counter()
+    for i, (t, v) in enumerate(zip(times, values)):
+        series.add(t, v)
+        if i % 100 == 0:
+            tracker.sync(series, bench)
+            tracker.metrics()
+    tracker.sync(series, bench)
+    result = tracker.metrics()
+    print(f"incremental over {n} points: {time.perf_counter() - start:.2f}s")
+    ref = reference(times, values, bench)
+    print("matches reference", all(math.isclose(result[k], ref[k], rel_tol=1e-6) for k in ref))
+    print({k: round(result[k], 3) for k in ref})
+
+    # a replaced last point is not folded twice
+    series.add(times[-1], values[-1] * 0.5)
+    tracker.sync(series, bench)
+    print("drawdown after replaced point", round(tracker.metrics()["max_drawdown"], 3))
+
+    ledger = LotLedger()
+    for trade in [
+        {"symbol": "AAPL", "side": "buy", "qty": 10, "filled_avg_price": 100},
+        {"symbol": "AAPL", "side": "sell", "qty": 4, "filled_avg_price": 110},
+        {"symbol": "AAPL", "side": "sell", "qty": 2, "filled_avg_price": 90},
+    ]:
+        ledger.add(trade)
+    m = tracker.metrics(ledger, {"portfolio_value": "1000", "cash": "250"})
+    print("winrate", m["winrate"], "exposure", m["exposure"], "turnover", round(m["turnover"], 5))
+
+    p = Portfolio("Stats", "key", "secret", "https://paper-api.alpaca.markets")
+    p.history = [
+        {"symbol": "AAPL", "side": "buy", "qty": 1, "filled_avg_price": 150},
+        {"symbol": "AAPL", "side": "sell", "qty": 1, "filled_avg_price": 155},
+    ]
+    p.equity_curve = [
+        {"time": "2023-01-01T00:00:00", "value": 1000.0},
+        {"time": "2023-01-02T00:00:00", "value": 1005.0},
+        {"time": "2023-01-03T00:00:00", "value": 995.0},
+    ]
+    stats = calculate_stats(p)
+    print("report winrate", stats["winrate"], "drawdown", round(stats["max_drawdown"], 5))
+
+
+if __name__ == "__main__":
+    main()
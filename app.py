@@ -1,8 +1,20 @@
+import atexit
+import multiprocessing
+import time
 from pathlib import Path
 from datetime import datetime, timedelta
 
-from flask import Flask, render_template, redirect, url_for, request, send_file
-from flask_socketio import SocketIO
+from flask import (
+    Flask,
+    Response,
+    render_template,
+    redirect,
+    url_for,
+    request,
+    send_file,
+    stream_with_context,
+)
+from flask_socketio import SocketIO, emit
 
 from app.logger import get_logger
 
@@ -14,46 +26,138 @@ from app.portfolio_manager import (
     set_activity_callback,
 )
 from app.research_engine import get_research
+from app.backtest import backtest_portfolio
+from app.sweep import (
+    SWEEP_PARAMS,
+    SweepJobs,
+    check_metric,
+    parameter_grid,
+    random_sample,
+)
+from app.report_builder import ReportBuilder
+from app.columnar_export import DATASETS, ParquetExporter
 from app.reporting import (
-    export_trades_csv,
-    generate_reports,
     export_dashboard_data,
+    iter_trades,
+    stream_trades_csv,
+    stream_trades_zip,
 )
-from app.diversification import analyze_portfolio
 from app.price_history import get_price_history
+from app.storage import TradeStore
+from app.journal import OrderJournal
+from app.config_store import ConfigStore
+from app.snapshot_cache import snapshot_cache_for
+from app.state_sync import StateTracker
+from app.event_bus import ActivityBus
+from app.compare import COMPARE_TTL, PortfolioComparer
+from app.http_cache import conditional, compress_response
+from app.cassette import eject, use_cassette_from_env
+from app.timeseries import DEFAULT_CHART_POINTS
 
 ENV = load_env()
 API_KEY = ENV.get("ALPACA_API_KEY")
 SECRET_KEY = ENV.get("ALPACA_SECRET_KEY")
 BASE_URL = ENV.get("ALPACA_BASE_URL")
 PORTFOLIO_FILE = Path("portfolios.json")
+DB_FILE = Path("trading.db")
+JOURNAL_DIR = Path("journal")
 
 manager = MultiPortfolioManager()
 logger = get_logger(__name__)
 
-# load persisted portfolios or create defaults if none exist
-manager.load_from_file(PORTFOLIO_FILE)
-if not manager.portfolios and API_KEY and "your_alpaca_api_key" not in API_KEY:
-    try:
-        manager.add_portfolio(Portfolio("P1", API_KEY, SECRET_KEY, BASE_URL))
-        manager.save_to_file(PORTFOLIO_FILE)
-    except ValueError:
-        pass
+
+def init_services() -> None:
+    """Load portfolios and open the config store, journal and trade store.
+
+    Runs on import except in report and sweep worker processes: the spawn
+    start method re-imports the main script there, and a worker must not
+    replay the journal, open trading.db again or start workers of its own.
+    """
+    global config_store, journal, store
+    # CASSETTE=<name> records or replays all upstream HTTP traffic
+    if use_cassette_from_env(ENV):
+        atexit.register(eject)
+
+    # load persisted portfolios or create defaults if none exist; later changes
+    # are written in the background by the config store
+    config_store = ConfigStore(PORTFOLIO_FILE)
+    manager.attach_config_store(config_store)
+    atexit.register(config_store.close)
+    if not manager.portfolios and API_KEY and "your_alpaca_api_key" not in API_KEY:
+        try:
+            manager.add_portfolio(Portfolio("P1", API_KEY, SECRET_KEY, BASE_URL))
+            manager.mark_dirty()
+        except ValueError:
+            pass
+
+    # rebuild holdings and recent trades from the order journal after a restart
+    journal = OrderJournal(JOURNAL_DIR)
+    manager.attach_journal(journal)
+    atexit.register(journal.close)
+
+    # trades, equity, activity and alerts are persisted in SQLite
+    store = TradeStore(DB_FILE)
+    manager.attach_store(store)
+    atexit.register(store.close)
+
+    set_activity_callback(activity_bus.publish)
+    atexit.register(activity_bus.close)
+
+    # start report workers now rather than on the first PDF export
+    report_builder.warm()
+
+
+# dashboard sections are cached and rebuilt when portfolio revisions change
+snapshot_cache = snapshot_cache_for(manager, points=DEFAULT_CHART_POINTS)
+atexit.register(snapshot_cache.close)
+# revisions of the state sections last sent to dashboards
+state = StateTracker()
+comparer = PortfolioComparer(manager, points=DEFAULT_CHART_POINTS)
+# reports are rendered in worker processes and reused until portfolios change
+report_builder = ReportBuilder(manager, "reports")
+atexit.register(report_builder.close)
+parquet_exporter = ParquetExporter(manager, "exports/parquet")
+# parameter sweeps run as background jobs on one reused process pool
+sweeps = SweepJobs()
+atexit.register(sweeps.close)
+MAX_SWEEP_RUNS = 500
 
 app = Flask(__name__)
+app.after_request(compress_response)
 socketio = SocketIO(app, async_mode="threading")
-# broadcast activity updates to all connected clients
-set_activity_callback(
-    lambda name, evt: socketio.emit(
-        "activity_update",
-        {"name": name, "event": evt},
-    )
-)
+# broadcast activity updates to all connected clients in batches so that
+# logging never blocks the trading loop on socket I/O
+activity_bus = ActivityBus(lambda batch: socketio.emit("activity_batch", batch))
+
+if multiprocessing.parent_process() is None:
+    init_services()
 
 # placeholders required for custom prompts
 REQUIRED_PLACEHOLDERS = ["{strategy_type}", "{portfolio}", "{research}"]
 
 
+def _portfolio_state(*sections):
+    """Return a ``conditional`` state function for portfolio ``sections``."""
+
+    def state_of(name: str):
+        for p in manager.portfolios:
+            if p.name == name:
+                revision = (state.epoch, id(p), p.revision(*sections))
+                return revision, p.last_modified(*sections)
+        return None
+
+    return state_of
+
+
+def _compare_state():
+    names = [n.strip() for n in request.args.get("names", "").split(",") if n.strip()]
+    revision = [state.epoch, int(time.time() // COMPARE_TTL)]
+    for p in manager.portfolios:
+        if not names or p.name in names:
+            revision.append((id(p), p.revision("history", "holdings")))
+    return tuple(revision), None
+
+
 def validate_prompt(prompt: str) -> bool:
     """Basic validation for a custom prompt."""
     if not prompt or len(prompt) > 1000:
@@ -61,55 +165,36 @@ def validate_prompt(prompt: str) -> bool:
     return all(ph in prompt for ph in REQUIRED_PLACEHOLDERS)
 
 
-def _portfolio_snapshot():
-    manager.update_benchmark()
-    bench = manager.get_normalized_benchmark()
-    data = []
-    for p in manager.portfolios:
-        try:
-            info = p.get_account_info()
-            cash = info.get("cash")
-            value = info.get("portfolio_value")
-        except Exception as exc:
-            logger.error("Failed to get info for %s: %s", p.name, exc)
-            cash = "N/A"
-            value = "N/A"
-        p.refresh_open_orders()
-        divers = analyze_portfolio(p)
-        p.correlation_matrix = divers["matrix"]
-        p.diversification_score = divers["score"]
-        p.diversification_warnings = divers["warnings"]
-        data.append(
-            {
-                "name": p.name,
-                "key_hint": (p.api_key[:4] + "***") if p.api_key else "",
-                "cash": cash,
-                "portfolio_value": value,
-                "positions": p.get_positions(),
-                "history": p.history[-5:],
-                "open_orders": p.open_orders,
-                "allocation": p.get_allocation(),
-                "equity": p.equity_curve[-50:],
-                "equity_norm": manager.get_normalized_equity(p)[-50:],
-                "benchmark": bench[-50:],
-                "strategy_type": p.strategy_type,
-                "custom_prompt": p.custom_prompt,
-                "risk_alerts": p.risk_alerts[-5:] + p.diversification_warnings,
-                "stop_loss_pct": p.stop_loss_pct,
-                "take_profit_pct": p.take_profit_pct,
-                "max_drawdown_pct": p.max_drawdown_pct,
-                "trade_pnl_limit_pct": p.trade_pnl_limit_pct,
-                "diversification_score": p.diversification_score,
-                "correlation": p.correlation_matrix,
-            }
-        )
-    return data
+def _fresh_requested() -> bool:
+    return request.args.get("fresh", "").lower() in ("1", "true", "yes")
+
+
+def _portfolio_snapshot(fresh: bool = False):
+    return snapshot_cache.snapshot(fresh)
+
+
+def _publish_state(fresh: bool = False):
+    """Send changed state sections to all dashboards; return snapshot and revision."""
+    portfolios = _portfolio_snapshot(fresh)
+    delta = state.update(portfolios)
+    if delta:
+        socketio.emit("state_delta", delta)
+    return portfolios, state.rev
+
+
+@socketio.on("resync")
+def handle_resync(data=None):
+    """Send a client every section changed after the revision it has."""
+    data = data or {}
+    emit("state_delta", state.since(int(data.get("rev") or 0), data.get("epoch")))
 
 
 @app.route("/")
 def index():
-    portfolios = _portfolio_snapshot()
-    return render_template("dashboard.html", portfolios=portfolios)
+    portfolios, rev = _publish_state(_fresh_requested())
+    return render_template(
+        "dashboard.html", portfolios=portfolios, state_rev=rev, state_epoch=state.epoch
+    )
 
 
 @app.route("/compare")
@@ -129,9 +214,8 @@ def step():
     if symbols_param:
         symbols = [s.strip().upper() for s in symbols_param.split(",") if s.strip()]
     manager.step_all(symbols)
-    portfolios = _portfolio_snapshot()
-    # notify all connected clients with the latest portfolio snapshot
-    socketio.emit("trade_update", portfolios)
+    # notify all connected clients about the changed portfolio sections
+    _publish_state()
     return redirect(url_for("index"))
 
 
@@ -144,8 +228,7 @@ def buy():
     if symbols_param:
         symbols = [s.strip().upper() for s in symbols_param.split(",") if s.strip()]
     manager.buy_opportunities(symbols)
-    portfolios = _portfolio_snapshot()
-    socketio.emit("trade_update", portfolios)
+    _publish_state()
     return redirect(url_for("index"))
 
 
@@ -157,7 +240,7 @@ def set_strategy(name: str):
             p.strategy_type = strategy
             p.log_event("strategy", f"set to {strategy}")
             break
-    manager.save_to_file(PORTFOLIO_FILE)
+    manager.mark_dirty()
     logger.info("Set strategy for %s to %s", name, strategy)
     return redirect(url_for("index"))
 
@@ -172,7 +255,7 @@ def set_prompt(name: str):
             p.custom_prompt = prompt
             p.log_event("prompt", "updated custom prompt")
             break
-    manager.save_to_file(PORTFOLIO_FILE)
+    manager.mark_dirty()
     logger.info("Updated custom prompt for %s", name)
     return redirect(url_for("index"))
 
@@ -196,7 +279,7 @@ def set_alerts(name: str):
                 p.trade_pnl_limit_pct = pnl
             p.log_event("config", "updated alert thresholds")
             break
-    manager.save_to_file(PORTFOLIO_FILE)
+    manager.mark_dirty()
     logger.info("Updated alerts for %s", name)
     return redirect(url_for("index"))
 
@@ -212,16 +295,12 @@ def manual_trade(name: str):
     for p in manager.portfolios:
         if p.name == name:
             try:
-                p.place_order(symbol, qty, side)
-                if p.history:
-                    p.history[-1]["source"] = "manual"
+                p.place_order(symbol, qty, side, source="manual")
                 p.log_event("manual", f"{side} {qty} {symbol}")
             except Exception as exc:
                 logger.error("Manual trade failed for %s: %s", name, exc)
             break
-    manager.save_to_file(PORTFOLIO_FILE)
-    portfolios = _portfolio_snapshot()
-    socketio.emit("trade_update", portfolios)
+    _publish_state()
     return redirect(url_for("index"))
 
 
@@ -275,12 +354,168 @@ def api_liquidate(name: str):
             except Exception as exc:
                 logger.error("Manual liquidation failed for %s: %s", p.name, exc)
                 return {"error": str(exc)}, 500
-            portfolios = _portfolio_snapshot()
-            socketio.emit("trade_update", portfolios)
+            _publish_state()
             return {"status": "ok"}
     return {"error": "not_found"}, 404
 
 
+@app.route("/api/portfolio/<name>/positions/sync", methods=["GET", "POST"])
+def api_sync_positions(name: str):
+    """Compare local holdings with the broker's positions.
+
+    A POST with ``adopt`` set replaces drifted holdings with the broker's.
+    """
+    data = request.get_json(silent=True) or {}
+    adopt = request.method == "POST" and bool(
+        data.get("adopt") or request.form.get("adopt")
+    )
+    for p in manager.portfolios:
+        if p.name == name:
+            result = p.sync_positions(adopt=adopt)
+            if "error" in result:
+                return result, 502
+            if adopt:
+                _publish_state()
+            return result
+    return {"error": "not_found"}, 404
+
+
+def _history_range(data: dict):
+    """Return symbols, start and end of a backtest request body."""
+    symbols = data.get("symbols") or []
+    if isinstance(symbols, str):
+        symbols = [s.strip() for s in symbols.split(",") if s.strip()]
+    if not symbols:
+        raise ValueError("symbols required")
+    try:
+        start = datetime.fromisoformat(data.get("start") or "")
+        end = datetime.fromisoformat(data["end"]) if data.get("end") else None
+    except ValueError:
+        raise ValueError("invalid start or end date") from None
+    return symbols, start, end
+
+
+@app.route("/api/portfolio/<name>/backtest", methods=["POST"])
+def api_backtest(name: str):
+    """Backtest a portfolio's settings on daily bars of ``symbols``.
+
+    ``source`` is ``rule`` (moving-average crossover with ``fast``/``slow``),
+    ``recorded`` (the portfolio's logged decisions) or ``llm`` (cached
+    OpenAI decisions).
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        symbols, start, end = _history_range(data)
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+    for p in manager.portfolios:
+        if p.name == name:
+            try:
+                result = backtest_portfolio(
+                    p,
+                    symbols,
+                    start,
+                    end,
+                    source=data.get("source", "rule"),
+                    benchmark=manager.benchmark_symbol,
+                    cash=float(data.get("cash") or 100_000),
+                    fast=int(data.get("fast") or 10),
+                    slow=int(data.get("slow") or 30),
+                )
+            except ValueError as exc:
+                return {"error": str(exc)}, 400
+            if "error" in result:
+                return result, 502
+            return result
+    return {"error": "not_found"}, 404
+
+
+@app.route("/api/portfolio/<name>/sweep", methods=["POST"])
+def api_sweep(name: str):
+    """Start ranking risk settings by backtesting a ``grid`` or ``random`` sample.
+
+    ``grid`` lists values per parameter, ``random`` gives ``[low, high]``
+    per parameter for ``samples`` draws. Results are ranked by ``metric``;
+    the job's status URL returns the best ``limit`` of them once done, and
+    the best setting can be applied with ``/sweep/apply``.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        symbols, start, end = _history_range(data)
+        metric = data.get("metric", "sharpe")
+        check_metric(metric)
+        if data.get("grid"):
+            configs = parameter_grid(data["grid"])
+        elif data.get("random"):
+            configs = random_sample(
+                data["random"], int(data.get("samples") or 20), data.get("seed")
+            )
+        else:
+            raise ValueError("grid or random required")
+        if not configs or len(configs) > MAX_SWEEP_RUNS:
+            raise ValueError(f"a sweep takes 1 to {MAX_SWEEP_RUNS} settings")
+        source = data.get("source", "rule")
+        if source not in ("rule", "recorded"):
+            raise ValueError("sweeps need rule or recorded decisions")
+        options = {
+            "configs": configs,
+            "metric": metric,
+            "source": source,
+            "benchmark": manager.benchmark_symbol,
+            "cash": float(data.get("cash") or 100_000),
+            "fast": int(data.get("fast") or 10),
+            "slow": int(data.get("slow") or 30),
+        }
+    except (TypeError, ValueError) as exc:
+        return {"error": str(exc)}, 400
+    for p in manager.portfolios:
+        if p.name == name:
+            job_id = sweeps.start_job(p, symbols, start, end, **options)
+            job_url = url_for(
+                "api_sweep_job", job_id=job_id, limit=int(data.get("limit") or 20)
+            )
+            return {"job": job_id, "status_url": job_url}, 202
+    return {"error": "not_found"}, 404
+
+
+@app.route("/api/sweeps/<job_id>")
+def api_sweep_job(job_id: str):
+    """Return the state of a sweep job with its best ``limit`` results once done."""
+    job = sweeps.job(job_id)
+    if job is None:
+        return {"error": "not_found"}, 404
+    if job["result"]:
+        limit = request.args.get("limit", 20, type=int)
+        job["result"] = {**job["result"], "results": job["result"]["results"][:limit]}
+    return job
+
+
+@app.route("/api/portfolio/<name>/sweep/apply", methods=["POST"])
+def api_apply_sweep(name: str):
+    """Apply ``settings`` (default: the best of the last sweep) to a portfolio."""
+    data = request.get_json(silent=True) or {}
+    settings = data.get("settings")
+    if settings is None:
+        best = (sweeps.results.get(name) or {}).get("best")
+        if not best:
+            return {"error": "no sweep results"}, 404
+        settings = {k: best[k] for k in SWEEP_PARAMS if k in best}
+    try:
+        settings = {k: float(v) for k, v in settings.items() if k in SWEEP_PARAMS}
+    except (AttributeError, TypeError, ValueError):
+        return {"error": "invalid settings"}, 400
+    for p in manager.portfolios:
+        if p.name == name:
+            for key, value in settings.items():
+                setattr(p, key, value)
+            p.log_event("config", f"applied sweep settings {settings}")
+            manager.mark_dirty()
+            _publish_state()
+            logger.info("Applied sweep settings to %s: %s", name, settings)
+            return {"applied": settings}
+    return {"error": "not_found"}, 404
+
+
 @app.route("/api/portfolio/<name>/allocation")
 def api_allocation(name: str):
     """Return current asset allocation for a portfolio."""
@@ -291,55 +526,104 @@ def api_allocation(name: str):
 
 
 @app.route("/api/portfolio/<name>/trade_history")
+@conditional(_portfolio_state("history"))
 def api_trade_history(name: str):
-    """Return trade history for a portfolio with optional filtering."""
+    """Return trade history for a portfolio with optional filtering.
+
+    ``before`` accepts the ``next_cursor`` of a previous response to page
+    through older trades.
+    """
     symbol = request.args.get("symbol")
     side = request.args.get("side")
     limit = request.args.get("limit", type=int)
+    before = request.args.get("before", type=int)
     for p in manager.portfolios:
         if p.name == name:
-            trades = p.history
-            if symbol:
-                trades = [t for t in trades if t.get("symbol") == symbol]
-            if side:
-                trades = [t for t in trades if t.get("side") == side]
-            if limit:
-                trades = trades[-limit:]
+            cursor = None
+            if p.store:
+                trades, cursor = p.store.query_trades(
+                    p.name, symbol=symbol, side=side, limit=limit, before=before
+                )
+            else:
+                trades = manager.filter_trades(p, symbol=symbol, side=side)
+                if limit:
+                    trades = trades[-limit:]
             buy = sum(1 for t in trades if t.get("side") == "buy")
             sell = sum(1 for t in trades if t.get("side") == "sell")
             summary = {"count": len(trades), "buy_count": buy, "sell_count": sell}
-            return {"trades": trades, "summary": summary}
+            return {"trades": trades, "summary": summary, "next_cursor": cursor}
     return {"trades": [], "summary": {}}
 
 
+ACTIVITY_TYPES = {
+    "trades": ["trade"],
+    "alerts": ["alert"],
+    "debug": ["prompt", "response"],
+}
+
+
 @app.route("/api/portfolio/<name>/activity_log")
+@conditional(_portfolio_state("activity"))
 def api_activity_log(name: str):
     """Return activity log for a portfolio."""
     type_filter = request.args.get("type", "all")
     limit = request.args.get("limit", type=int) or 100
+    before = request.args.get("before", type=int)
+    types = ACTIVITY_TYPES.get(type_filter)
     for p in manager.portfolios:
         if p.name == name:
-            events = p.activity_log
-            if type_filter == "trades":
-                events = [e for e in events if e.get("type") == "trade"]
-            elif type_filter == "alerts":
-                events = [e for e in events if e.get("type") == "alert"]
-            elif type_filter == "debug":
-                events = [e for e in events if e.get("type") in ("prompt", "response")]
-            return {"log": events[-limit:]}
+            if p.store:
+                events, cursor = p.store.query_activity(
+                    p.name, types=types, limit=limit, before=before
+                )
+                return {"log": events, "next_cursor": cursor}
+            return {"log": p.activity_log.last(limit, types)}
     return {"log": []}
 
 
 @app.route("/api/portfolio/<name>/alerts")
+@conditional(_portfolio_state("alerts"))
 def api_alerts(name: str):
     """Return risk alerts for a portfolio."""
+    limit = request.args.get("limit", type=int)
+    before = request.args.get("before", type=int)
     for p in manager.portfolios:
         if p.name == name:
-            return {"alerts": p.risk_alerts}
+            if p.store:
+                alerts, cursor = p.store.query_alerts(
+                    p.name, limit=limit, before=before
+                )
+                return {"alerts": alerts, "next_cursor": cursor}
+            return {"alerts": list(p.risk_alerts)}
     return {"alerts": []}
 
 
+@app.route("/api/portfolio/<name>/memory")
+def api_memory_usage(name: str):
+    """Return approximate memory used by a portfolio's in-memory records."""
+    for p in manager.portfolios:
+        if p.name == name:
+            return {"memory": p.memory_usage()}
+    return {"error": "not_found"}, 404
+
+
+@app.route("/api/activity/<ref>")
+def api_activity_ref(ref: str):
+    """Return the full event of a truncated activity message."""
+    item = activity_bus.get_ref(ref)
+    if item is None:
+        return {"error": "not_found"}, 404
+    return item
+
+
+@app.route("/api/activity_bus/metrics")
+def api_activity_bus_metrics():
+    """Return queue depth and drop counters of the activity event bus."""
+    return activity_bus.metrics()
+
+
 @app.route("/api/portfolio/<name>/pnl_history")
+@conditional(_portfolio_state("equity", "history"))
 def api_pnl_history(name: str):
     """Return pnl history and top/flop trades for a portfolio."""
     interval = request.args.get("interval", "day")
@@ -352,17 +636,51 @@ def api_pnl_history(name: str):
     return {"pnl": [], "top": [], "flop": []}
 
 
+@app.route("/api/portfolio/<name>/equity")
+def api_equity(name: str):
+    """Return a downsampled equity curve and benchmark for a time range.
+
+    ``points`` sets the number of returned points (LTTB downsampling),
+    ``start`` and ``end`` are optional ISO timestamps. Without ``start`` the
+    points kept in memory are used; older ranges are read from the store.
+    """
+    points = request.args.get("points", type=int) or DEFAULT_CHART_POINTS
+    start = request.args.get("start") or None
+    end = request.args.get("end") or None
+    try:
+        for p in manager.portfolios:
+            if p.name == name:
+                return {
+                    "equity": p.equity_series(start, end).downsample(
+                        points, start, end
+                    ),
+                    "equity_norm": manager.get_normalized_equity(
+                        p, points, start, end
+                    ),
+                    "benchmark": manager.get_normalized_benchmark(points, start, end),
+                }
+    except ValueError:
+        return {"error": "invalid time range"}, 400
+    return {"error": "not_found"}, 404
+
+
 @app.route("/api/portfolio/<name>/export")
 def api_export_portfolio(name: str):
     """Export dashboard data in various formats."""
     fmt = request.args.get("format", "json")
+    fresh = _fresh_requested()
     for p in manager.portfolios:
         if p.name == name:
             if fmt == "json":
-                data = export_dashboard_data(p, manager, "json")
+                data = export_dashboard_data(p, manager, "json", fresh=fresh)
                 return data
+            if fmt == "pdf":
+                paths = report_builder.build([p], "pdf", fresh=fresh)
+                if not paths:
+                    return {"error": "render_failed"}, 500
+                return send_file(paths[0], as_attachment=True)
             try:
-                path = export_dashboard_data(p, manager, fmt, "reports")
+                path = export_dashboard_data(p, manager, fmt, "reports", fresh)
             except ValueError:
                 return {"error": "invalid format"}, 400
             return send_file(path, as_attachment=True)
@@ -370,121 +688,89 @@ def api_export_portfolio(name: str):
 
 
 @app.route("/api/portfolios/compare")
+@conditional(_compare_state)
 def api_compare_portfolios():
-    """Return key metrics for multiple portfolios."""
+    """Return key metrics and aligned equity curves for multiple portfolios."""
     names_param = request.args.get("names", "")
-    names = [n.strip() for n in names_param.split(",") if n.strip()] or [
-        p.name for p in manager.portfolios
-    ]
-    bench = manager.get_normalized_benchmark()[-50:]
-    result = []
-    for p in manager.portfolios:
-        if p.name not in names:
-            continue
-        info = p.get_account_info()
-        value = float(info.get("portfolio_value") or 0)
-        cash = float(info.get("cash") or 0)
-        pnl = 0.0
-        if len(p.equity_curve) >= 2:
-            pnl = float(p.equity_curve[-1]["value"])
-            pnl -= float(p.equity_curve[0]["value"])
-        result.append(
-            {
-                "name": p.name,
-                "portfolio_value": value,
-                "cash": cash,
-                "pnl": pnl,
-                "allocation": p.get_allocation(),
-                "equity_norm": manager.get_normalized_equity(p)[-50:],
-                "risk_alerts": p.risk_alerts[-5:],
-            }
-        )
-    return {"bench": bench, "portfolios": result}
+    names = [n.strip() for n in names_param.split(",") if n.strip()]
+    return comparer.compare(names)
 
 
 @app.route("/api/trade/<trade_id>/price_history")
 def api_trade_price_history(trade_id: str):
     """Return price history for a trade identified by its id."""
-    for p in manager.portfolios:
-        for trade in p.history:
-            tid = str(trade.get("id") or trade.get("client_order_id"))
-            if tid == trade_id:
-                symbol = trade.get("symbol")
-                submitted = trade.get("submitted_at") or trade.get("created_at")
-                filled = trade.get("filled_at") or submitted
-                if not symbol or not submitted:
-                    break
-                try:
-                    start = datetime.fromisoformat(str(submitted))
-                except ValueError:
-                    start = datetime.utcnow()
-                try:
-                    end = datetime.fromisoformat(str(filled))
-                except ValueError:
-                    end = start
-                # fetch a few extra days around the trade
-                start = start - timedelta(days=1)
-                end = end + timedelta(days=1)
-                prices = get_price_history(symbol, start, end)
-                return {"symbol": symbol, "prices": prices}
+    _, trade = manager.find_trade(trade_id)
+    if trade:
+        symbol = trade.get("symbol")
+        submitted = trade.get("submitted_at") or trade.get("created_at")
+        filled = trade.get("filled_at") or submitted
+        if symbol and submitted:
+            try:
+                start = datetime.fromisoformat(str(submitted))
+            except ValueError:
+                start = datetime.utcnow()
+            try:
+                end = datetime.fromisoformat(str(filled))
+            except ValueError:
+                end = start
+            # fetch a few extra days around the trade
+            start = start - timedelta(days=1)
+            end = end + timedelta(days=1)
+            prices = get_price_history(symbol, start, end)
+            return {"symbol": symbol, "prices": prices}
     return {"symbol": "", "prices": []}
 
 
 @app.route("/api/trade/<trade_id>/decision_explainer")
 def api_trade_decision_explainer(trade_id: str):
     """Return stored prompt, research and AI response for a trade."""
-    for p in manager.portfolios:
-        for trade in p.history:
-            tid = str(trade.get("id") or trade.get("client_order_id"))
-            if tid == trade_id:
-                data = trade.get("decision_explainer") or {}
-                return data
+    _, trade = manager.find_trade(trade_id)
+    if trade:
+        return trade.get("decision_explainer") or {}
     return {}
 
 
 @app.route("/api/trade/<trade_id>/notes", methods=["GET", "POST", "DELETE"])
 def api_trade_notes(trade_id: str):
     """Manage notes for a trade."""
-    for p in manager.portfolios:
-        trade = p.find_trade(trade_id) if hasattr(p, "find_trade") else None
-        if trade:
-            if request.method == "GET":
-                return {"notes": trade.get("notes", "")}
-            elif request.method == "POST":
-                data = request.get_json(silent=True) or {}
-                notes = data.get("notes") or request.form.get("notes", "")
-                p.set_trade_notes(trade_id, notes)
-                p.log_event("note", f"updated trade {trade_id} note")
-                return {"notes": notes}
-            else:
-                p.set_trade_notes(trade_id, "")
-                p.log_event("note", f"deleted trade {trade_id} note")
-                return {"notes": ""}
+    p, trade = manager.find_trade(trade_id)
+    if trade:
+        if request.method == "GET":
+            return {"notes": trade.get("notes", "")}
+        elif request.method == "POST":
+            data = request.get_json(silent=True) or {}
+            notes = data.get("notes") or request.form.get("notes", "")
+            p.set_trade_notes(trade_id, notes, trade)
+            p.log_event("note", f"updated trade {trade_id} note")
+            return {"notes": notes}
+        else:
+            p.set_trade_notes(trade_id, "", trade)
+            p.log_event("note", f"deleted trade {trade_id} note")
+            return {"notes": ""}
     return {"notes": ""}, 404
 
 
 @app.route("/api/trade/<trade_id>/tags", methods=["GET", "POST", "DELETE"])
 def api_trade_tags(trade_id: str):
     """Manage tags for a trade."""
-    for p in manager.portfolios:
-        trade = p.find_trade(trade_id) if hasattr(p, "find_trade") else None
-        if trade:
-            if request.method == "GET":
-                return {"tags": trade.get("tags", [])}
-            elif request.method == "POST":
-                data = request.get_json(silent=True) or {}
-                tags = data.get("tags") or request.form.get("tags", "")
-                if isinstance(tags, str):
-                    tags_list = [t.strip() for t in tags.split(",") if t.strip()]
-                else:
-                    tags_list = tags if isinstance(tags, list) else []
-                p.set_trade_tags(trade_id, tags_list)
-                p.log_event("tag", f"updated trade {trade_id} tags")
-                return {"tags": tags_list}
+    p, trade = manager.find_trade(trade_id)
+    if trade:
+        if request.method == "GET":
+            return {"tags": trade.get("tags", [])}
+        elif request.method == "POST":
+            data = request.get_json(silent=True) or {}
+            tags = data.get("tags") or request.form.get("tags", "")
+            if isinstance(tags, str):
+                tags_list = [t.strip() for t in tags.split(",") if t.strip()]
             else:
-                p.set_trade_tags(trade_id, [])
-                p.log_event("tag", f"deleted trade {trade_id} tags")
-                return {"tags": []}
+                tags_list = tags if isinstance(tags, list) else []
+            p.set_trade_tags(trade_id, tags_list, trade)
+            p.log_event("tag", f"updated trade {trade_id} tags")
+            return {"tags": tags_list}
+        else:
+            p.set_trade_tags(trade_id, [], trade)
+            p.log_event("tag", f"deleted trade {trade_id} tags")
+            return {"tags": []}
     return {"tags": []}, 404
 
 
@@ -500,7 +786,7 @@ def create_portfolio():
             manager.add_portfolio(
                 Portfolio(name, api_key, secret_key, base_url, strategy)
             )
-            manager.save_to_file(PORTFOLIO_FILE)
+            manager.mark_dirty()
             logger.info("Created portfolio %s", name)
         except ValueError as exc:
             logger.error("Create portfolio failed: %s", exc)
@@ -510,30 +796,113 @@ def create_portfolio():
 @app.route("/portfolio/<name>/delete", methods=["POST"])
 def delete_portfolio(name: str):
     manager.remove_portfolio(name)
-    manager.save_to_file(PORTFOLIO_FILE)
+    manager.mark_dirty()
     logger.info("Deleted portfolio %s", name)
     return redirect(url_for("index"))
 
 
+def _export_filters():
+    """Return ``(start, end, symbols)`` from the export query parameters."""
+    symbols = [
+        s.strip().upper()
+        for s in request.args.get("symbols", "").split(",")
+        if s.strip()
+    ]
+    return (
+        request.args.get("start") or None,
+        request.args.get("end") or None,
+        symbols or None,
+    )
+
+
 @app.route("/portfolio/<name>/export")
 def export_trades(name: str):
+    """Stream the trade history as CSV, filtered by ``start``/``end``/``symbols``."""
     for p in manager.portfolios:
         if p.name == name:
-            paths = export_trades_csv([p])
-            if paths:
-                return send_file(paths[0], as_attachment=True)
+            rows = stream_trades_csv(iter_trades(p, *_export_filters()))
+            return Response(
+                stream_with_context(rows),
+                mimetype="text/csv",
+                headers={
+                    "Content-Disposition": f"attachment; filename={name}_trades.csv"
+                },
+            )
     return redirect(url_for("index"))
 
 
+@app.route("/export/trades.zip")
+def export_trades_zip():
+    """Stream a zip with one trade CSV per selected portfolio (``names``)."""
+    names = [n for n in request.args.get("names", "").split(",") if n]
+    portfolios = [p for p in manager.portfolios if not names or p.name in names]
+    if not portfolios:
+        return {"error": "not_found"}, 404
+    archive = stream_trades_zip(portfolios, *_export_filters())
+    return Response(
+        stream_with_context(archive),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=trades.zip"},
+    )
+
+
+@app.route("/api/export/parquet", methods=["POST"])
+def api_export_parquet():
+    """Append records added since the last run to the Parquet datasets."""
+    data = request.get_json(silent=True) or {}
+    datasets = data.get("datasets") or DATASETS
+    if any(d not in DATASETS for d in datasets):
+        return {"error": "unknown dataset"}, 400
+    summary = parquet_exporter.export(datasets)
+    if summary.get("error") == "pyarrow_not_installed":
+        return summary, 501
+    if "error" in summary:
+        return summary, 500
+    return summary
+
+
 @app.route("/portfolio/<name>/report")
 def get_report(name: str):
     for p in manager.portfolios:
         if p.name == name:
-            paths = generate_reports([p])
+            paths = report_builder.build([p])
             if paths:
                 return send_file(paths[0], as_attachment=True)
     return redirect(url_for("index"))
 
 
+@app.route("/api/reports/build", methods=["POST"])
+def api_build_reports():
+    """Start building reports (``kind`` report or pdf) for ``names`` or all."""
+    data = request.get_json(silent=True) or {}
+    names = data.get("names") or None
+    try:
+        job_id = report_builder.start_job(names, data.get("kind", "report"))
+    except ValueError:
+        return {"error": "invalid kind"}, 400
+    return {"job": job_id, "status_url": url_for("api_report_job", job_id=job_id)}, 202
+
+
+@app.route("/api/reports/jobs/<job_id>")
+def api_report_job(job_id: str):
+    """Return the state of a report job with download links once done."""
+    job = report_builder.job(job_id)
+    if job is None:
+        return {"error": "not_found"}, 404
+    job["files"] = [
+        {"name": f, "url": url_for("api_report_file", filename=f)}
+        for f in job["files"]
+    ]
+    return job
+
+
+@app.route("/api/reports/files/<filename>")
+def api_report_file(filename: str):
+    path = report_builder.file(filename)
+    if path is None:
+        return {"error": "not_found"}, 404
+    return send_file(path, as_attachment=True)
+
+
 if __name__ == "__main__":
     socketio.run(app, debug=True)
@@ -0,0 +1,241 @@
+import math
+from bisect import bisect_left, bisect_right
+from typing import Dict, Optional
+
+import numpy as np
+
+from .timeseries import TimeSeries
+
+YEAR = 365.25 * 86400
+# periods per year assumed while a curve covers no time yet
+TRADING_DAYS = 252
+
+
+def values_at(series: TimeSeries, times: np.ndarray) -> np.ndarray:
+    """Return the last value of ``series`` at or before each of ``times``.
+
+    Times before the first point of ``series`` get NaN, like ``align_curves``.
+    """
+    out = np.full(len(times), np.nan)
+    size = min(len(series.times), len(series.values))
+    if not size or not len(times):
+        return out
+    lo = max(bisect_right(series.times, times[0], 0, size) - 1, 0)
+    hi = bisect_right(series.times, times[-1], 0, size)
+    if hi <= lo:
+        return out
+    ref_times = np.frombuffer(series.times[lo:hi], dtype=np.float64)
+    ref_values = np.frombuffer(series.values[lo:hi], dtype=np.float64)
+    idx = np.searchsorted(ref_times, times, side="right") - 1
+    valid = idx >= 0
+    out[valid] = ref_values[idx[valid]]
+    return out
+
+
+class _State:
+    """Running sums over the returns folded so far."""
+
+    __slots__ = (
+        "n",
+        "ret_sum",
+        "ret_sq",
+        "down_sq",
+        "pairs",
+        "bench_sum",
+        "pair_sum",
+        "bench_sq",
+        "cross",
+        "value_sum",
+        "values",
+        "peak",
+        "max_drawdown",
+        "first_time",
+        "first_value",
+        "prev_value",
+        "prev_bench",
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0.0)
+        self.first_time = None
+        self.first_value = None
+        self.prev_value = None
+        self.prev_bench = math.nan
+
+    def copy(self) -> "_State":
+        other = _State.__new__(_State)
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        return other
+
+    def add(self, times: np.ndarray, values: np.ndarray, bench: np.ndarray) -> None:
+        """Fold consecutive equity points (and benchmark values at their times)."""
+        if not len(values):
+            return
+        if self.first_time is None:
+            self.first_time = float(times[0])
+            self.first_value = float(values[0])
+        prev = values[:-1]
+        prev_bench = bench[:-1]
+        if self.prev_value is not None:
+            prev = np.concatenate(([self.prev_value], prev))
+            prev_bench = np.concatenate(([self.prev_bench], prev_bench))
+            current, current_bench = values, bench
+        else:
+            current, current_bench = values[1:], bench[1:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.where(prev > 0, current / prev - 1, 0.0)
+            bench_returns = current_bench / prev_bench - 1
+        self.n += len(returns)
+        self.ret_sum += float(returns.sum())
+        self.ret_sq += float(returns @ returns)
+        downside = np.minimum(returns, 0.0)
+        self.down_sq += float(downside @ downside)
+        paired = np.isfinite(bench_returns)
+        x, y = bench_returns[paired], returns[paired]
+        self.pairs += len(x)
+        self.bench_sum += float(x.sum())
+        self.pair_sum += float(y.sum())
+        self.bench_sq += float(x @ x)
+        self.cross += float(x @ y)
+        self.value_sum += float(values.sum())
+        self.values += len(values)
+        peaks = np.maximum.accumulate(np.concatenate(([self.peak], values)))[1:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drawdowns = np.where(peaks > 0, 1 - values / peaks, 0.0)
+        self.peak = float(peaks[-1])
+        self.max_drawdown = max(self.max_drawdown, float(drawdowns.max()))
+        self.prev_value = float(values[-1])
+        self.prev_bench = float(bench[-1])
+
+
+class PerformanceTracker:
+    """Risk and return metrics of an equity curve, updated incrementally.
+
+    ``sync`` folds only the points added since the previous call into
+    running sums (returns, squared and downside returns, benchmark
+    co-moments, drawdown). Points that may still change are kept as a tail
+    and applied on top of the sums per ``metrics`` call: the last point
+    (``TimeSeries.add`` replaces it on an equal timestamp) and points paired
+    with the last benchmark point, whose value may be replaced the same way.
+    """
+
+    def __init__(self):
+        self._state = _State()
+        self._source: Optional[TimeSeries] = None
+        self._bench: Optional[TimeSeries] = None
+        self._bench_start: Optional[float] = None
+        self._folded = 0
+        self._tail: Optional[tuple] = None
+
+    def sync(self, series: TimeSeries, benchmark: TimeSeries | None = None) -> None:
+        """Feed points of ``series`` not seen yet; benchmark values are looked up."""
+        size = len(series)
+        bench_start = None
+        if benchmark is not None and len(benchmark):
+            bench_start = benchmark.times[0]
+        if (
+            series is not self._source
+            or benchmark is not self._bench
+            or bench_start != self._bench_start
+            or size < self._folded
+        ):
+            # a first benchmark point can pair with points folded without one
+            self.__init__()
+            self._source = series
+            self._bench = benchmark
+            self._bench_start = bench_start
+        end = size - 1
+        if bench_start is not None:
+            end = min(end, bisect_left(series.times, benchmark.times[-1], 0, size))
+        if end > self._folded:
+            self._state.add(*self._points(self._folded, end))
+            self._folded = end
+        self._tail = self._points(self._folded, size) if size else None
+
+    def _points(self, lo: int, hi: int):
+        times = np.frombuffer(self._source.times[lo:hi], dtype=np.float64)
+        values = np.frombuffer(self._source.values[lo:hi], dtype=np.float64)
+        if self._bench is not None:
+            bench = values_at(self._bench, times)
+        else:
+            bench = np.full(len(times), np.nan)
+        return times, values, bench
+
+    def metrics(self, ledger=None, info: Dict | None = None) -> Dict[str, Optional[float]]:
+        """Return annualized metrics; undefined values are None.
+
+        ``ledger`` (a ``LotLedger``) adds turnover, win rate and realized
+        PnL; ``info`` (account information) gives exposure from market
+        values instead of the cost basis of open lots.
+        """
+        s = self._state
+        if self._tail is not None:
+            s = s.copy()
+            s.add(*self._tail)
+        result: Dict[str, Optional[float]] = dict.fromkeys(
+            (
+                "total_return",
+                "volatility",
+                "sharpe",
+                "sortino",
+                "max_drawdown",
+                "beta",
+                "alpha",
+                "turnover",
+                "exposure",
+                "winrate",
+                "realized_pnl",
+            )
+        )
+        if s.values:
+            last_value = s.prev_value
+            if s.first_value:
+                result["total_return"] = last_value / s.first_value - 1
+            result["max_drawdown"] = s.max_drawdown
+        n = s.n
+        span = float(self._tail[0][-1] - s.first_time) if self._tail is not None else 0.0
+        per_year = n / (span / YEAR) if span > 0 and n else TRADING_DAYS
+        if n >= 2:
+            mean = s.ret_sum / n
+            var = max((s.ret_sq - n * mean * mean) / (n - 1), 0.0)
+            std = math.sqrt(var)
+            result["volatility"] = std * math.sqrt(per_year)
+            if std > 0:
+                result["sharpe"] = mean / std * math.sqrt(per_year)
+            downside = math.sqrt(s.down_sq / n)
+            if downside > 0:
+                result["sortino"] = mean / downside * math.sqrt(per_year)
+        m = s.pairs
+        if m >= 2:
+            var_b = s.bench_sq - s.bench_sum * s.bench_sum / m
+            if var_b > 0:
+                beta = (s.cross - s.bench_sum * s.pair_sum / m) / var_b
+                result["beta"] = beta
+                result["alpha"] = (s.pair_sum - beta * s.bench_sum) / m * per_year
+        mean_equity = s.value_sum / s.values if s.values else 0.0
+        if ledger is not None:
+            if mean_equity > 0:
+                result["turnover"] = ledger.traded / mean_equity
+            if ledger.closed:
+                result["winrate"] = ledger.wins / ledger.closed * 100
+            result["realized_pnl"] = ledger.realized
+        result["exposure"] = self._exposure(s, ledger, info)
+        return result
+
+    @staticmethod
+    def _exposure(s: _State, ledger, info: Dict | None) -> Optional[float]:
+        if info:
+            equity = float(info.get("portfolio_value") or info.get("equity") or 0)
+            if equity <= 0:
+                return None
+            long_value = info.get("long_market_value")
+            if long_value is not None:
+                short_value = float(info.get("short_market_value") or 0)
+                return (abs(float(long_value)) + abs(short_value)) / equity
+            return (equity - float(info.get("cash") or 0)) / equity
+        if ledger is None or not s.prev_value:
+            return None
+        cost = sum(q * price for lots in ledger.lots.values() for q, price in lots)
+        return cost / s.prev_value
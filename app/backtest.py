@@ -0,0 +1,491 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .logger import get_logger
+from .portfolio_manager import (
+    ACTIVITY_LOG_CAPACITY,
+    Portfolio,
+    get_strategy_from_openai,
+)
+from .price_history import get_price_history
+from .ring_buffer import EventLog
+from .sim_broker import SimulatedBroker
+from .timeseries import DEFAULT_CHART_POINTS, TimeSeries, to_epoch
+
+logger = get_logger(__name__)
+
+DEFAULT_CASH = 100_000.0
+# settings copied from the portfolio a backtest is run for
+BACKTEST_SETTINGS = (
+    "strategy_type",
+    "custom_prompt",
+    "stop_loss_pct",
+    "take_profit_pct",
+    "max_drawdown_pct",
+    "trade_pnl_limit_pct",
+    "risk_level",
+)
+# decisions that are failures to decide and must not be cached
+_UNCACHED = ("error", "rate_limit", "no_api_key")
+
+
+def _utc(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+
+
+class PriceBars:
+    """Daily closes of several symbols on a shared calendar.
+
+    ``closes`` has one row per day and one column per symbol; gaps are
+    forward-filled and days before a symbol's first bar are NaN.
+    """
+
+    def __init__(self, times: Sequence[float], symbols: Sequence[str], closes):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.symbols = list(symbols)
+        self.closes = np.asarray(closes, dtype=np.float64).reshape(
+            len(self.times), len(self.symbols)
+        )
+        self.index = {sym: j for j, sym in enumerate(self.symbols)}
+
+    @classmethod
+    def from_series(cls, series: Dict[str, List[Dict]]) -> "PriceBars":
+        """Build bars from ``{symbol: [{"time", "close"}]}`` as returned by
+        ``get_price_history``."""
+        symbols = [sym for sym, rows in series.items() if rows]
+        parsed = {}
+        for sym in symbols:
+            rows = series[sym]
+            parsed[sym] = (
+                np.array([to_epoch(r["time"]) for r in rows]),
+                np.array([float(r["close"]) for r in rows]),
+            )
+        times = (
+            np.unique(np.concatenate([t for t, _ in parsed.values()]))
+            if parsed
+            else np.array([])
+        )
+        closes = np.full((len(times), len(symbols)), np.nan)
+        for j, sym in enumerate(symbols):
+            t, c = parsed[sym]
+            order = np.argsort(t, kind="stable")
+            t, c = t[order], c[order]
+            # last bar at or before each calendar day
+            idx = np.searchsorted(t, times, side="right") - 1
+            valid = idx >= 0
+            closes[valid, j] = c[idx[valid]]
+        return cls(times, symbols, closes)
+
+    @classmethod
+    def load(
+        cls,
+        symbols: Sequence[str],
+        start: datetime,
+        end: datetime,
+        fetch: Callable = get_price_history,
+    ) -> "PriceBars":
+        """Fetch the daily history of ``symbols`` concurrently."""
+        symbols = list(dict.fromkeys(symbols))
+        workers = max(1, min(8, len(symbols)))
+        with ThreadPoolExecutor(workers, thread_name_prefix="bars") as pool:
+            histories = list(pool.map(lambda s: fetch(s, start, end), symbols))
+        missing = [s for s, rows in zip(symbols, histories) if not rows]
+        if missing:
+            logger.warning("No price history for %s", ", ".join(missing))
+        return cls.from_series(dict(zip(symbols, histories)))
+
+    def series(self, symbol: str, times: Sequence[float] | None = None) -> TimeSeries:
+        """Return the closes of ``symbol`` as a curve.
+
+        With ``times`` the last close at or before each of them is used, so
+        the curve lines up with another calendar (e.g. the replayed days).
+        """
+        closes = self.closes[:, self.index[symbol]]
+        if times is None:
+            times, values = self.times, closes
+        else:
+            times = np.asarray(times, dtype=np.float64)
+            idx = np.searchsorted(self.times, times, side="right") - 1
+            values = np.where(idx >= 0, closes[np.maximum(idx, 0)], np.nan)
+        curve = TimeSeries()
+        for ts, value in zip(times, values):
+            if not np.isnan(value):
+                curve.add(float(ts), float(value))
+        return curve
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+# --- Decision sources ---------------------------------------------------
+# A source is prepared once per run and then asked for the decisions of
+# each day for the backtest portfolio as ``(symbol column, decision)``
+# pairs, in the words the LLM answers with ("buy ...", "sell ...",
+# anything else holds).
+
+
+class MovingAverageRule:
+    """Buy when the fast moving average crosses above the slow one, sell below."""
+
+    def __init__(self, fast: int = 10, slow: int = 30):
+        if not 0 < fast < slow:
+            raise ValueError("fast window must be shorter than the slow one")
+        self.fast = fast
+        self.slow = slow
+        self._signals: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _mean(closes: np.ndarray, window: int) -> np.ndarray:
+        sums = np.cumsum(np.vstack([np.zeros(closes.shape[1]), closes]), axis=0)
+        out = np.full(closes.shape, np.nan)
+        out[window - 1 :] = (sums[window:] - sums[:-window]) / window
+        return out
+
+    def prepare(self, bars: PriceBars) -> None:
+        closes = bars.closes
+        with np.errstate(invalid="ignore"):
+            above = self._mean(closes, self.fast) > self._mean(closes, self.slow)
+            valid = ~np.isnan(self._mean(closes, self.slow))
+        signals = np.zeros(closes.shape, dtype=np.int8)
+        prev_above, prev_valid = above[:-1], valid[:-1]
+        cross = valid[1:] & prev_valid
+        signals[1:][cross & above[1:] & ~prev_above] = 1
+        signals[1:][cross & ~above[1:] & prev_above] = -1
+        self._signals = signals
+
+    def decisions(
+        self, portfolio: Portfolio, day: int, bars: PriceBars
+    ) -> Iterable[Tuple[int, str]]:
+        row = self._signals[day]
+        for j in np.flatnonzero(row):
+            yield int(j), "buy" if row[j] > 0 else "sell"
+
+
+class RecordedDecisions:
+    """Replay decisions recorded as ``{"time", "symbol", "decision"}``.
+
+    A decision applies on the first bar at or after its time.
+    """
+
+    def __init__(self, records: Iterable[Dict]):
+        self.records = list(records)
+        self._by_day: Dict[int, List[Tuple[int, str]]] = {}
+
+    @classmethod
+    def from_activity(cls, events: Iterable[Dict]) -> "RecordedDecisions":
+        """Pair "research ... for SYMBOL" activity entries with the decision
+        logged right after them, as ``step_all`` writes them."""
+        records = []
+        symbol = None
+        for entry in events:
+            kind = entry.get("type")
+            message = str(entry.get("message") or "")
+            if kind == "research" and " for " in message:
+                symbol = message.rsplit(" for ", 1)[1].strip()
+            elif kind == "decision" and symbol:
+                records.append(
+                    {"time": entry.get("time"), "symbol": symbol, "decision": message}
+                )
+                symbol = None
+        return cls(records)
+
+    def prepare(self, bars: PriceBars) -> None:
+        self._by_day = {}
+        for record in self.records:
+            j = bars.index.get(record.get("symbol"))
+            if j is None or record.get("time") is None:
+                continue
+            ts = to_epoch(record["time"])
+            # a decision during a day acts on that day's close
+            day = int(np.searchsorted(bars.times, ts - ts % 86400, side="left"))
+            if day < len(bars):
+                self._by_day.setdefault(day, []).append((j, str(record["decision"])))
+
+    def decisions(
+        self, portfolio: Portfolio, day: int, bars: PriceBars
+    ) -> Iterable[Tuple[int, str]]:
+        return self._by_day.get(day, ())
+
+
+class CachedReplay:
+    """Ask ``decide(portfolio, symbol, day, bars)`` once per bar and symbol.
+
+    Answers are cached under the bar date, symbol and ``key`` (e.g. the
+    strategy and prompt) and saved to ``path`` as JSON by ``save``, so a
+    rerun of the same backtest does not call the model again. ``every``
+    asks only every n-th bar.
+    """
+
+    def __init__(
+        self,
+        decide: Callable[[Portfolio, str, int, PriceBars], str],
+        path: str | Path | None = None,
+        key: str = "",
+        every: int = 1,
+    ):
+        self.decide = decide
+        self.path = Path(path) if path else None
+        self.key = key
+        self.every = max(1, int(every))
+        self.cache: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        if self.path and self.path.exists():
+            try:
+                self.cache = json.loads(self.path.read_text())
+            except (OSError, ValueError) as exc:
+                logger.error("Failed to read decision cache %s: %s", self.path, exc)
+
+    def prepare(self, bars: PriceBars) -> None:
+        pass
+
+    def decisions(
+        self, portfolio: Portfolio, day: int, bars: PriceBars
+    ) -> Iterable[Tuple[int, str]]:
+        if day % self.every:
+            return
+        date = _utc(bars.times[day]).date().isoformat()
+        row = bars.closes[day]
+        for j, sym in enumerate(bars.symbols):
+            if np.isnan(row[j]):
+                continue
+            cache_key = f"{date}|{sym}|{self.key}"
+            decision = self.cache.get(cache_key)
+            if decision is None:
+                self.misses += 1
+                decision = self.decide(portfolio, sym, day, bars)
+                if not str(decision).lower().startswith(_UNCACHED):
+                    self.cache[cache_key] = decision
+            else:
+                self.hits += 1
+            yield j, decision
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.cache, indent=1, sort_keys=True))
+        os.replace(tmp, self.path)
+
+
+def llm_decision(portfolio: Portfolio, symbol: str, day: int, bars: PriceBars) -> str:
+    """Ask OpenAI like ``step_all`` does; a ``CachedReplay`` decide function.
+
+    Research is limited to what was known at the bar (recent closes and
+    returns), so the model cannot see the future. The account shown to the
+    model is the simulated broker's at the bar's closes; asking it does not
+    record an equity point.
+    """
+    closes = bars.closes[: day + 1, bars.index[symbol]]
+    close = float(closes[-1])
+
+    def change(n: int) -> Optional[float]:
+        if len(closes) <= n or not closes[-1 - n]:
+            return None
+        return round(close / float(closes[-1 - n]) - 1, 4)
+
+    research = {
+        "symbol": symbol,
+        "date": _utc(bars.times[day]).date().isoformat(),
+        "close": close,
+        "return_5d": change(5),
+        "return_20d": change(20),
+    }
+    account = portfolio.client.get_account().model_dump()
+    return get_strategy_from_openai(
+        portfolio, research, portfolio.strategy_type, account
+    )
+
+
+def replay_key(portfolio: Portfolio) -> str:
+    """Cache key of the LLM decisions of ``portfolio``'s strategy and prompt."""
+    prompt = hashlib.sha1(portfolio.custom_prompt.encode()).hexdigest()[:12]
+    return f"{portfolio.strategy_type}|{prompt}"
+
+
+class Backtester:
+    """Replay daily bars through a ``Portfolio``'s own trading logic.
+
+    Each day the decision source's answers go through
+    ``Portfolio.apply_decision`` (``smart_allocation`` sizing and
+    ``place_order``), then ``check_risk`` runs against the day's account
+    value, exactly as ``step_all`` does live. Orders go to a
+    ``SimulatedBroker`` and fill at the close of the bar (moved by
+    ``slippage_bps``). The portfolio only sees that broker, bar prices and
+    the bar date, so no quotes, alerts or activity leave the backtest: it
+    has no trade store or journal and its activity log never spills to
+    disk. A ``PriceBars`` benchmark is aligned to the replayed days before
+    beta and alpha are computed against it.
+    """
+
+    def __init__(
+        self,
+        bars: PriceBars,
+        decisions,
+        portfolio: Portfolio | None = None,
+        cash: float = DEFAULT_CASH,
+        benchmark: PriceBars | TimeSeries | None = None,
+        name: str = "backtest",
+        slippage_bps: float = 0.0,
+        overrides: Dict | None = None,
+    ):
+        self.bars = bars
+        self.decisions = decisions
+        self.settings = (
+            {key: getattr(portfolio, key) for key in BACKTEST_SETTINGS}
+            if portfolio is not None
+            else {}
+        )
+        # e.g. risk settings under test in a parameter sweep
+        self.settings.update(
+            {k: v for k, v in (overrides or {}).items() if k in BACKTEST_SETTINGS}
+        )
+        self.cash = cash
+        self.benchmark = benchmark
+        self.name = name
+        self.slippage_bps = slippage_bps
+        self.portfolio: Optional[Portfolio] = None
+        self.broker: Optional[SimulatedBroker] = None
+
+    def _portfolio(self, broker: SimulatedBroker) -> Portfolio:
+        p = Portfolio(
+            self.name,
+            "backtest",
+            "",
+            "",
+            activity_log=EventLog(ACTIVITY_LOG_CAPACITY),
+            store=None,
+            journal=None,
+            price_source=broker.price,
+            clock=broker.now,
+            quiet=True,
+            **self.settings,
+        )
+        p.client = broker
+        return p
+
+    def run(self, points: int | None = DEFAULT_CHART_POINTS) -> Dict:
+        """Run over all bars and return metrics and a downsampled equity curve."""
+        start = time.perf_counter()
+        bars = self.bars
+        day = 0
+        broker = self.broker = SimulatedBroker(
+            self.cash,
+            slippage_bps=self.slippage_bps,
+            symbols=bars.symbols,
+            clock=lambda: float(day),
+            now=lambda: _utc(bars.times[day]),
+        )
+        p = self.portfolio = self._portfolio(broker)
+        self.decisions.prepare(bars)
+        symbols = bars.symbols
+        for day in range(len(bars)):
+            broker.set_prices(bars.closes[day])
+            liquidations = broker.liquidations
+            for j, decision in self.decisions.decisions(p, day, bars):
+                if broker.prices[j]:
+                    p.apply_decision(symbols[j], decision)
+            info = p.get_account_info()
+            p.check_risk(float(info["portfolio_value"]))
+            if broker.liquidations != liquidations:
+                # a drawdown breach liquidated the account at the broker
+                p.sync_positions(adopt=True)
+        if isinstance(self.decisions, CachedReplay):
+            self.decisions.save()
+        benchmark = self.benchmark
+        if isinstance(benchmark, PriceBars):
+            benchmark = (
+                benchmark.series(benchmark.symbols[0], bars.times)
+                if benchmark.symbols
+                else None
+            )
+        result = {
+            "name": self.name,
+            "start": _utc(bars.times[0]).date().isoformat() if len(bars) else None,
+            "end": _utc(bars.times[-1]).date().isoformat() if len(bars) else None,
+            "days": len(bars),
+            "symbols": symbols,
+            "cash": self.cash,
+            "final_value": float(broker.get_account().portfolio_value),
+            "trades": len(p.history),
+            "alerts": list(p.risk_alerts)[-20:],
+            "metrics": p.get_performance(benchmark),
+            "equity": p.equity_curve.downsample(points),
+        }
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        logger.info(
+            "Backtest %s: %d days, %d symbols, %d trades in %.2fs",
+            self.name,
+            len(bars),
+            len(symbols),
+            result["trades"],
+            result["seconds"],
+        )
+        return result
+
+
+def decision_source(
+    portfolio: Portfolio,
+    source: str = "rule",
+    fast: int = 10,
+    slow: int = 30,
+    cache_dir: str | Path = "backtests",
+):
+    """Return the decision source named ``source`` for ``portfolio``.
+
+    ``rule`` is a moving-average crossover, ``recorded`` replays the
+    portfolio's logged decisions and ``llm`` asks OpenAI with answers cached
+    per day in ``cache_dir``.
+    """
+    if source == "rule":
+        return MovingAverageRule(fast, slow)
+    if source == "recorded":
+        return RecordedDecisions.from_activity(list(portfolio.activity_log))
+    if source == "llm":
+        return CachedReplay(
+            llm_decision,
+            Path(cache_dir) / f"{portfolio.name}_decisions.json",
+            key=replay_key(portfolio),
+        )
+    raise ValueError("unknown decision source")
+
+
+def backtest_portfolio(
+    portfolio: Portfolio,
+    symbols: Sequence[str],
+    start: datetime,
+    end: datetime | None = None,
+    source: str = "rule",
+    benchmark: str | None = None,
+    cash: float = DEFAULT_CASH,
+    fast: int = 10,
+    slow: int = 30,
+    cache_dir: str | Path = "backtests",
+    points: int | None = DEFAULT_CHART_POINTS,
+) -> Dict:
+    """Backtest ``portfolio``'s settings on the daily history of ``symbols``.
+
+    ``source`` selects the decisions (see ``decision_source``); beta and
+    alpha refer to the daily history of the ``benchmark`` symbol over the
+    same range.
+    """
+    decisions = decision_source(portfolio, source, fast, slow, cache_dir)
+    end = end or datetime.utcnow()
+    bars = PriceBars.load(symbols, start, end)
+    if not len(bars):
+        return {"error": "no_price_history"}
+    if benchmark:
+        benchmark = PriceBars.load([benchmark], start, end)
+    tester = Backtester(
+        bars, decisions, portfolio, cash, benchmark, name=f"{portfolio.name}-backtest"
+    )
+    return tester.run(points)
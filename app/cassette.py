@@ -0,0 +1,333 @@
+import base64
+import hashlib
+import importlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+CASSETTE_DIR = Path("cassettes")
+MODES = ("record", "replay", "auto")
+# query parameters holding credentials; never written to a cassette
+REDACTED_PARAMS = {"apikey", "api_key", "token", "key", "secret"}
+# response headers that no longer apply to the decoded body we store
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+# HTTP clients whose ``send`` is wrapped: httpx and the httpx2 fork openai uses
+_HTTPX_MODULES = ("httpx", "httpx2")
+
+
+class CassetteMiss(requests.ConnectionError):
+    """A replayed request has no recording; behaves like a network error."""
+
+
+def _url_key(url: str) -> str:
+    parts = urlsplit(str(url))
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in REDACTED_PARAMS
+    )
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def _body_hash(body) -> str:
+    if body is None:
+        return ""
+    if isinstance(body, str):
+        body = body.encode()
+    if not isinstance(body, (bytes, bytearray)):
+        body = json.dumps(body, sort_keys=True, default=str).encode()
+    return hashlib.sha1(body).hexdigest()[:16] if body else ""
+
+
+def _encode(content: bytes) -> Tuple[str, bool]:
+    try:
+        return content.decode("utf-8"), False
+    except UnicodeDecodeError:
+        return base64.b64encode(content).decode("ascii"), True
+
+
+def _decode(entry: Dict) -> bytes:
+    body = entry.get("body") or ""
+    return base64.b64decode(body) if entry.get("base64") else body.encode("utf-8")
+
+
+class Cassette:
+    """Recorded HTTP responses of one scenario, with their latencies.
+
+    Interactions are matched by method, URL (credentials stripped) and a
+    hash of the request body; repeated requests replay their recordings in
+    order and the last one keeps answering once they run out. Requests
+    whose body differs from every recording (prompts embedding timestamps)
+    fall back to the recordings of the same method and URL. ``speed``
+    scales replayed latencies: 1 waits as long as the upstream took, 10 a
+    tenth of it and 0 not at all.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        mode: str = "replay",
+        speed: float = 1.0,
+        directory: str | Path = CASSETTE_DIR,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        self.name = name
+        self.mode = mode
+        self.speed = float(speed)
+        self.path = Path(directory) / f"{name}.json"
+        self.interactions: List[Dict] = []
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._exact: Dict[Tuple, Deque[Dict]] = defaultdict(deque)
+        self._loose: Dict[Tuple, Deque[Dict]] = defaultdict(deque)
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text())
+            except (OSError, ValueError) as exc:
+                logger.error("Failed to read cassette %s: %s", self.path, exc)
+                data = {}
+            for entry in data.get("interactions", []):
+                self._index(entry)
+        elif mode == "replay":
+            logger.warning("Cassette %s does not exist; every request misses", self.path)
+
+    def _index(self, entry: Dict) -> None:
+        self.interactions.append(entry)
+        self._exact[(entry["method"], entry["url"], entry["body_hash"])].append(entry)
+        self._loose[(entry["method"], entry["url"])].append(entry)
+
+    @staticmethod
+    def _next(queue: Deque[Dict]) -> Dict:
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def find(self, method: str, url: str, body) -> Optional[Dict]:
+        key = (method.upper(), _url_key(url))
+        with self._lock:
+            queue = self._exact.get(key + (_body_hash(body),)) or self._loose.get(key)
+            if not queue:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._next(queue)
+
+    def wait(self, entry: Dict) -> None:
+        if self.speed > 0 and entry.get("latency"):
+            time.sleep(entry["latency"] / self.speed)
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        body,
+        status: int,
+        headers,
+        content: bytes,
+        latency: float,
+    ) -> None:
+        text, is_base64 = _encode(content)
+        entry = {
+            "method": method.upper(),
+            "url": _url_key(url),
+            "body_hash": _body_hash(body),
+            "status": int(status),
+            "headers": {
+                k: v for k, v in dict(headers).items() if k.lower() not in _DROPPED_HEADERS
+            },
+            "body": text,
+            "base64": is_base64,
+            "latency": round(latency, 6),
+        }
+        with self._lock:
+            self._index(entry)
+            self.recorded += 1
+
+    def save(self) -> None:
+        if not self.recorded:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with self._lock:
+            data = {"name": self.name, "interactions": self.interactions}
+            tmp.write_text(json.dumps(data, indent=1))
+        os.replace(tmp, self.path)
+        logger.info("Saved %d interactions to %s", len(self.interactions), self.path)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+    def __enter__(self) -> "Cassette":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if _active is self:
+            eject()
+
+
+# --- Transport hooks ------------------------------------------------------
+_active: Optional[Cassette] = None
+_originals: Dict = {}
+_install_lock = threading.Lock()
+
+
+def _replay_requests(entry: Dict, method: str, url: str) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = entry["status"]
+    resp._content = _decode(entry)
+    resp.headers = CaseInsensitiveDict(entry.get("headers") or {})
+    resp.url = url
+    resp.reason = "OK" if resp.status_code < 400 else "Replayed error"
+    resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+    resp.elapsed = timedelta(seconds=entry.get("latency") or 0)
+    resp.request = requests.Request(method, url).prepare()
+    return resp
+
+
+def _session_request(session, method, url, *args, **kwargs):
+    cassette = _active
+    original = _originals["requests"]
+    if cassette is None:
+        return original(session, method, url, *args, **kwargs)
+    # Session.request(method, url, params=None, data=None, ...)
+    params = kwargs.get("params", args[0] if args else None)
+    body = kwargs.get("data", args[1] if len(args) > 1 else None)
+    if kwargs.get("json") is not None:
+        body = kwargs["json"]
+    # match on the URL as sent: alpaca-py passes every GET query as ``params``
+    full_url = requests.Request(method, url, params=params).prepare().url
+    if cassette.mode != "record":
+        entry = cassette.find(method, full_url, body)
+        if entry is not None:
+            cassette.wait(entry)
+            return _replay_requests(entry, method, full_url)
+        if cassette.mode == "replay":
+            raise CassetteMiss(f"no recording for {method} {_url_key(full_url)}")
+    start = time.perf_counter()
+    resp = original(session, method, url, *args, **kwargs)
+    content = resp.content
+    cassette.record(
+        method, full_url, body, resp.status_code, resp.headers, content,
+        time.perf_counter() - start,
+    )
+    return resp
+
+
+def _httpx_send(module_name: str):
+    module = importlib.import_module(module_name)
+    original = _originals[module_name]
+
+    def send(client, request, *args, **kwargs):
+        cassette = _active
+        if cassette is None:
+            return original(client, request, *args, **kwargs)
+        method, url = request.method, str(request.url)
+        body = request.content
+        if cassette.mode != "record":
+            entry = cassette.find(method, url, body)
+            if entry is not None:
+                cassette.wait(entry)
+                return module.Response(
+                    entry["status"],
+                    headers=entry.get("headers") or {},
+                    content=_decode(entry),
+                    request=request,
+                )
+            if cassette.mode == "replay":
+                raise module.ConnectError(
+                    f"no recording for {method} {_url_key(url)}", request=request
+                )
+        start = time.perf_counter()
+        resp = original(client, request, *args, **kwargs)
+        content = resp.read()
+        cassette.record(
+            method, url, body, resp.status_code, resp.headers, content,
+            time.perf_counter() - start,
+        )
+        return resp
+
+    return send
+
+
+def _install() -> None:
+    with _install_lock:
+        if "requests" not in _originals:
+            _originals["requests"] = requests.Session.request
+            requests.Session.request = _session_request
+        for name in _HTTPX_MODULES:
+            if name in _originals:
+                continue
+            try:
+                module = importlib.import_module(name)
+            except ImportError:
+                continue
+            _originals[name] = module.Client.send
+            module.Client.send = _httpx_send(name)
+
+
+def _uninstall() -> None:
+    with _install_lock:
+        original = _originals.pop("requests", None)
+        if original is not None:
+            requests.Session.request = original
+        for name in _HTTPX_MODULES:
+            original = _originals.pop(name, None)
+            if original is not None:
+                importlib.import_module(name).Client.send = original
+
+
+def use_cassette(
+    name: str,
+    mode: str = "replay",
+    speed: float = 1.0,
+    directory: str | Path = CASSETTE_DIR,
+) -> Cassette:
+    """Route all HTTP traffic of ``requests`` and httpx through a cassette.
+
+    Covers Stooq, Yahoo, Finnhub and NewsAPI (requests), Alpaca (a
+    requests session) and OpenAI (httpx). Call ``eject`` to save
+    recordings and restore the real transports, or use the returned
+    cassette as a context manager.
+    """
+    global _active
+    cassette = Cassette(name, mode, speed, directory)
+    _install()
+    _active = cassette
+    logger.info("Using cassette %s in %s mode", cassette.path, mode)
+    return cassette
+
+
+def eject() -> Optional[Cassette]:
+    """Save and deactivate the current cassette."""
+    global _active
+    cassette, _active = _active, None
+    _uninstall()
+    if cassette is not None:
+        cassette.save()
+    return cassette
+
+
+def use_cassette_from_env(env: Dict) -> Optional[Cassette]:
+    """Activate ``CASSETTE`` with ``CASSETTE_MODE`` and ``CASSETTE_SPEED``."""
+    name = env.get("CASSETTE")
+    if not name:
+        return None
+    return use_cassette(
+        name,
+        env.get("CASSETTE_MODE") or "replay",
+        float(env.get("CASSETTE_SPEED") or 1.0),
+        env.get("CASSETTE_DIR") or CASSETTE_DIR,
+    )
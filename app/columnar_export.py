@@ -0,0 +1,332 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .logger import get_logger
+from .timeseries import TimeSeries, to_epoch
+
+logger = get_logger(__name__)
+
+DATASETS = ("trades", "equity", "benchmark", "activity")
+# rows per Parquet row group; readers skip whole groups outside a filter
+ROW_GROUP_ROWS = 65536
+# records converted to Arrow at a time, bounding memory during an export
+BATCH_ROWS = 10000
+WATERMARK_FILE = "_watermarks.json"
+# trade keys stored in typed columns; all others go to "extra" as JSON
+TRADE_FIELDS = {
+    "trade_id": "string",
+    "symbol": "string",
+    "side": "string",
+    "qty": "float64",
+    "filled_qty": "float64",
+    "price": "float64",
+    "filled_avg_price": "float64",
+    "pnl": "float64",
+    "status": "string",
+    "source": "string",
+    "notes": "string",
+}
+_TRADE_SKIP = {"id", "client_order_id", "tags", "submitted_at", "created_at"}
+
+
+def _pyarrow():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    return pa, pq
+
+
+def schemas(pa) -> Dict:
+    """Return the Arrow schema of every dataset (partition column excluded)."""
+    ts = pa.timestamp("us", tz="UTC")
+    types = {"string": pa.string(), "float64": pa.float64()}
+    return {
+        "trades": pa.schema(
+            [("portfolio", pa.string()), ("time", ts)]
+            + [(name, types[kind]) for name, kind in TRADE_FIELDS.items()]
+            + [("tags", pa.list_(pa.string())), ("extra", pa.string())]
+        ),
+        "equity": pa.schema(
+            [("portfolio", pa.string()), ("time", ts), ("value", pa.float64())]
+        ),
+        "benchmark": pa.schema([("time", ts), ("value", pa.float64())]),
+        "activity": pa.schema(
+            [
+                ("portfolio", pa.string()),
+                ("time", ts),
+                ("type", pa.string()),
+                ("message", pa.string()),
+            ]
+        ),
+    }
+
+
+def _epoch(value) -> Optional[float]:
+    if value in (None, ""):
+        return None
+    try:
+        return to_epoch(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return None if value in (None, "") else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    # enums of the broker models carry the plain string in ``value``
+    return str(getattr(value, "value", value))
+
+
+def _trade_record(portfolio: str, trade: Dict) -> Dict:
+    record = {
+        "portfolio": portfolio,
+        "time": _epoch(trade.get("submitted_at") or trade.get("created_at")),
+        "trade_id": _text(trade.get("id") or trade.get("client_order_id")),
+        "tags": [str(t) for t in trade.get("tags") or []],
+    }
+    for name, kind in TRADE_FIELDS.items():
+        if name == "trade_id":
+            continue
+        value = trade.get(name)
+        record[name] = _float(value) if kind == "float64" else _text(value)
+    extra = {
+        k: v for k, v in trade.items() if k not in TRADE_FIELDS and k not in _TRADE_SKIP
+    }
+    record["extra"] = json.dumps(extra, default=str) if extra else None
+    return record
+
+
+def _series_after(series: TimeSeries, after: float) -> Iterator[Tuple[float, float]]:
+    # the last point may still be replaced, so it is exported once a newer one exists
+    size = min(len(series.times), len(series.values)) - 1
+    for i in range(bisect_right(series.times, after, 0, max(size, 0)), size):
+        yield series.times[i], series.values[i]
+
+
+class ParquetExporter:
+    """Append trades, equity, benchmark and activity to date-partitioned Parquet.
+
+    Each dataset lives in ``<output_dir>/<dataset>/date=YYYY-MM-DD/`` with
+    one file per export run and day. A watermark per dataset and portfolio
+    (store row id, or time/count for in-memory data) is saved after every
+    run, so each run only writes records added since the previous one.
+    pyarrow is an optional dependency imported on first use.
+    """
+
+    def __init__(
+        self,
+        manager,
+        output_dir: str | Path = "exports/parquet",
+        row_group_rows: int = ROW_GROUP_ROWS,
+    ):
+        self.manager = manager
+        self.output_dir = Path(output_dir)
+        self.row_group_rows = row_group_rows
+        self._lock = threading.Lock()
+
+    # --- Watermarks ------------------------------------------------------
+    def watermarks(self) -> Dict[str, float]:
+        path = self.output_dir / WATERMARK_FILE
+        try:
+            return json.loads(path.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exc:
+            logger.error("Failed to read export watermarks: %s", exc)
+            return {}
+
+    def _save_watermarks(self, marks: Dict[str, float]) -> None:
+        path = self.output_dir / WATERMARK_FILE
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(marks, indent=2, sort_keys=True))
+        os.replace(tmp, path)
+
+    # --- Sources ---------------------------------------------------------
+    def _records(self, dataset: str, marks: Dict, new_marks: Dict) -> Iterator[Dict]:
+        """Yield records newer than ``marks`` and note the new watermarks."""
+        if dataset == "benchmark":
+            after = marks.get("benchmark", float("-inf"))
+            for ts, value in _series_after(self.manager.benchmark_curve, after):
+                new_marks["benchmark"] = ts
+                yield {"time": ts, "value": value}
+            return
+        for p in list(self.manager.portfolios):
+            store = p.store
+            key = f"{dataset}:{p.name}:{'id' if store else 'memory'}"
+            after = marks.get(key, 0 if store or dataset == "trades" else float("-inf"))
+            for mark, record in self._portfolio_rows(dataset, p, after):
+                # activity is yielded in arrival order, not time order
+                new_marks[key] = max(mark, new_marks.get(key, mark))
+                yield record
+
+    def _portfolio_rows(self, dataset: str, p, after) -> Iterator[Tuple[float, Dict]]:
+        name = p.name
+        if p.store is not None:
+            for row_id, row in p.store.iter_rows(dataset, name, int(after)):
+                yield row_id, self._record(dataset, name, row)
+            return
+        if dataset == "trades":
+            # without a store the history is append-only, so count trades
+            for i in range(int(after), len(p.history)):
+                yield i + 1, _trade_record(name, p.history[i])
+        elif dataset == "equity":
+            for ts, value in _series_after(p.equity_curve, after):
+                yield ts, {"portfolio": name, "time": ts, "value": value}
+        else:
+            for entry in p.activity_log:
+                ts = _epoch(entry.get("time"))
+                if ts is not None and ts > after:
+                    yield ts, self._record(dataset, name, entry)
+
+    @staticmethod
+    def _record(dataset: str, name: str, row: Dict) -> Dict:
+        if dataset == "trades":
+            return _trade_record(name, row)
+        if dataset == "equity":
+            return {"portfolio": name, "time": _epoch(row["time"]), "value": row["value"]}
+        return {
+            "portfolio": name,
+            "time": _epoch(row.get("time")),
+            "type": row.get("type"),
+            "message": row.get("message"),
+        }
+
+    # --- Writing ---------------------------------------------------------
+    def export(self, datasets: Sequence[str] = DATASETS) -> Dict:
+        """Append new records of ``datasets``; return rows written per dataset."""
+        try:
+            pa, pq = _pyarrow()
+        except ImportError:
+            logger.error("Parquet export needs the optional pyarrow package")
+            return {"error": "pyarrow_not_installed"}
+        with self._lock:
+            start = time.perf_counter()
+            run_id = f"{int(time.time() * 1000)}"
+            marks = self.watermarks()
+            saved = dict(marks)
+            summary: Dict = {"rows": {}, "files": 0}
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            for dataset in datasets:
+                if dataset not in DATASETS:
+                    raise ValueError(f"unknown dataset {dataset}")
+                new_marks: Dict[str, float] = {}
+                try:
+                    rows, files = self._write(
+                        pa, pq, dataset, self._records(dataset, marks, new_marks), run_id
+                    )
+                except Exception as exc:
+                    logger.error("Parquet export of %s failed: %s", dataset, exc)
+                    summary["error"] = "export_failed"
+                    summary["dataset"] = dataset
+                    break
+                summary["rows"][dataset] = rows
+                summary["files"] += files
+                # published files and their watermarks go together, so a
+                # later failure neither loses nor repeats this dataset
+                saved.update(new_marks)
+                self._save_watermarks(saved)
+            summary["seconds"] = round(time.perf_counter() - start, 3)
+            logger.info("Parquet export %s: %s", run_id, summary)
+            return summary
+
+    def _write(self, pa, pq, dataset: str, records, run_id: str) -> Tuple[int, int]:
+        schema = schemas(pa)[dataset]
+        writers: Dict[str, Tuple] = {}
+        today = datetime.now(timezone.utc).date().isoformat()
+        count = 0
+        batch: List[Dict] = []
+
+        def flush():
+            groups: Dict[str, List[Dict]] = {}
+            for record in batch:
+                ts = record["time"]
+                day = (
+                    datetime.fromtimestamp(ts, timezone.utc).date().isoformat()
+                    if ts is not None
+                    else today
+                )
+                record["time"] = int(ts * 1_000_000) if ts is not None else None
+                groups.setdefault(day, []).append(record)
+            for day, rows in groups.items():
+                if day not in writers:
+                    folder = self.output_dir / dataset / f"date={day}"
+                    folder.mkdir(parents=True, exist_ok=True)
+                    # hidden until complete; dataset readers skip dot files
+                    tmp = folder / f".part-{run_id}.parquet"
+                    writer = pq.ParquetWriter(tmp, schema, compression="zstd")
+                    writers[day] = (writer, tmp, folder / f"part-{run_id}.parquet")
+                table = pa.Table.from_pylist(rows, schema=schema)
+                writers[day][0].write_table(table, row_group_size=self.row_group_rows)
+            batch.clear()
+
+        try:
+            for record in records:
+                batch.append(record)
+                count += 1
+                if len(batch) >= BATCH_ROWS:
+                    flush()
+            flush()
+        except BaseException:
+            # never publish a partial run: drop the hidden files
+            for writer, tmp, _ in writers.values():
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+                tmp.unlink(missing_ok=True)
+            raise
+        for writer, tmp, final in writers.values():
+            writer.close()
+            os.replace(tmp, final)
+        return count, len(writers)
+
+
+def load_dataset(
+    output_dir: str | Path,
+    dataset: str,
+    start: str | date | None = None,
+    end: str | date | None = None,
+    portfolios: Sequence[str] | None = None,
+    columns: Sequence[str] | None = None,
+):
+    """Read an exported dataset into a pandas DataFrame.
+
+    ``start``/``end`` (inclusive dates) prune whole partitions, so loading a
+    few months only opens the files of those days.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([("date", pa.date32())]), flavor="hive")
+    data = ds.dataset(
+        Path(output_dir) / dataset, format="parquet", partitioning=partitioning
+    )
+    condition = None
+
+    def add(expr):
+        nonlocal condition
+        condition = expr if condition is None else condition & expr
+
+    if start:
+        add(ds.field("date") >= date.fromisoformat(str(start)))
+    if end:
+        add(ds.field("date") <= date.fromisoformat(str(end)))
+    if portfolios and dataset != "benchmark":
+        add(ds.field("portfolio").isin(list(portfolios)))
+    table = data.to_table(
+        columns=list(columns) if columns else None, filter=condition
+    )
+    return table.sort_by("time").to_pandas()
@@ -0,0 +1,151 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .benchmark import get_latest_price
+from .timeseries import DEFAULT_CHART_POINTS, to_iso
+
+# seconds a comparison result is reused for the same selection
+COMPARE_TTL = 10.0
+
+
+def align_curves(
+    curves: Sequence[Tuple[np.ndarray, np.ndarray]], points: int = DEFAULT_CHART_POINTS
+) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """Resample ``(times, values)`` curves onto one evenly spaced time grid.
+
+    Each grid point takes the last value observed at or before it, so curves
+    sampled at different moments become directly comparable. Grid points
+    before a curve's first observation are NaN.
+    """
+    starts = [t[0] for t, _ in curves if len(t)]
+    if not starts:
+        return np.empty(0), [np.empty(0) for _ in curves]
+    lo = min(starts)
+    hi = max(t[-1] for t, _ in curves if len(t))
+    grid = np.linspace(lo, hi, points) if hi > lo else np.array([lo])
+    aligned = []
+    for times, values in curves:
+        out = np.full(len(grid), np.nan)
+        if len(times):
+            idx = np.searchsorted(times, grid, side="right") - 1
+            valid = idx >= 0
+            out[valid] = values[idx[valid]]
+        aligned.append(out)
+    return grid, aligned
+
+
+def _normalize(values: np.ndarray, curve: np.ndarray) -> np.ndarray:
+    """Scale ``values`` so the first point of the original ``curve`` is 100."""
+    base = curve[0] if len(curve) and curve[0] else 1.0
+    return values / base * 100
+
+
+def _points(grid: np.ndarray, values: np.ndarray) -> List[Dict]:
+    return [
+        {"time": to_iso(t), "value": None if np.isnan(v) else float(v)}
+        for t, v in zip(grid.tolist(), values.tolist())
+    ]
+
+
+class PortfolioComparer:
+    """Build the portfolio comparison with concurrent broker and quote calls.
+
+    Account states and broker positions of all selected portfolios are
+    fetched in parallel, holdings without broker positions are priced once,
+    and equity curves plus benchmark are aligned on a common time grid.
+    Results are cached for ``ttl`` seconds or until a trade or holding
+    change of a selected portfolio.
+    """
+
+    def __init__(
+        self,
+        manager,
+        ttl: float = COMPARE_TTL,
+        points: int = DEFAULT_CHART_POINTS,
+        workers: int = 8,
+    ):
+        self.manager = manager
+        self.ttl = ttl
+        self.points = points
+        self.workers = workers
+        self._cache: Dict[Tuple, Tuple[float, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, portfolios) -> Tuple:
+        return tuple(
+            (p.name, id(p), p.revision("history", "holdings")) for p in portfolios
+        )
+
+    def compare(self, names: Sequence[str] | None = None) -> Dict:
+        """Return ``{"bench", "grid", "portfolios"}`` for the selected names."""
+        portfolios = [
+            p for p in list(self.manager.portfolios) if not names or p.name in names
+        ]
+        key = self._key(portfolios)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and now - cached[0] < self.ttl:
+                return cached[1]
+        result = self._build(portfolios)
+        with self._lock:
+            self._cache = {
+                k: v for k, v in self._cache.items() if now - v[0] < self.ttl
+            }
+            self._cache[key] = (now, result)
+        return result
+
+    def _build(self, portfolios) -> Dict:
+        workers = max(1, min(self.workers, 2 * len(portfolios)))
+        with ThreadPoolExecutor(workers, thread_name_prefix="compare") as pool:
+            infos = pool.map(lambda p: p.get_account_info(), portfolios)
+            positions = pool.map(lambda p: p.broker_positions(), portfolios)
+            infos, positions = list(infos), list(positions)
+            # quotes are only needed where the broker positions were unavailable
+            symbols = sorted(
+                {
+                    sym
+                    for p, pos in zip(portfolios, positions)
+                    if pos is None
+                    for sym in p.holdings
+                }
+            )
+            quotes = list(
+                pool.map(lambda s: get_latest_price(s).get("value"), symbols)
+            )
+        prices = {s: price for s, price in zip(symbols, quotes) if price is not None}
+
+        curves = [p.equity_curve.arrays() for p in portfolios]
+        curves.append(self.manager.benchmark_curve.arrays())
+        grid, aligned = align_curves(curves, self.points)
+        normalized = [_normalize(a, values) for a, (_, values) in zip(aligned, curves)]
+        bench = normalized.pop()
+
+        result = []
+        for p, info, pos, values in zip(portfolios, infos, positions, normalized):
+            pnl = 0.0
+            if len(p.equity_curve) >= 2:
+                pnl = float(p.equity_curve.values[-1] - p.equity_curve.values[0])
+            result.append(
+                {
+                    "name": p.name,
+                    "portfolio_value": float(info.get("portfolio_value") or 0),
+                    "cash": float(info.get("cash") or 0),
+                    "pnl": pnl,
+                    "allocation": p.get_allocation(
+                        info, prices if pos is None else None
+                    ),
+                    "metrics": p.get_performance(self.manager.benchmark_curve, info),
+                    "equity_norm": _points(grid, values),
+                    "risk_alerts": p.risk_alerts[-5:],
+                }
+            )
+        return {
+            "bench": _points(grid, bench),
+            "grid": [to_iso(t) for t in grid.tolist()],
+            "portfolios": result,
+        }
@@ -1,10 +1,25 @@
 import os
 from pathlib import Path
+from typing import Dict, Optional
+
 from dotenv import load_dotenv
 
+_ENV: Optional[Dict[str, Optional[str]]] = None
+
+
+def load_env(reload: bool = False):
+    """Load environment variables from the project root .env file.
+
+    The file is read once per process; ``reload`` forces reading it again.
+    Each call returns a fresh copy of the settings.
+    """
+    global _ENV
+    if _ENV is None or reload:
+        _ENV = _read_env()
+    return dict(_ENV)
+
 
-def load_env():
-    """Load environment variables from the project root .env file."""
+def _read_env() -> Dict[str, Optional[str]]:
     env_path = Path(__file__).resolve().parent.parent / '.env'
     if env_path.exists():
         load_dotenv(env_path)
@@ -20,4 +35,11 @@ def load_env():
         'FINNHUB_API_KEY': os.getenv('FINNHUB_API_KEY'),
         'NEWS_API_KEY': os.getenv('NEWS_API_KEY'),
         'TRENDING_SOURCE': os.getenv('TRENDING_SOURCE', 'yahoo'),
+        'ACTIVITY_LOG_CAPACITY': os.getenv('ACTIVITY_LOG_CAPACITY', '200'),
+        'ACTIVITY_OVERFLOW': os.getenv('ACTIVITY_OVERFLOW', 'drop'),
+        'ACTIVITY_SPILL_DIR': os.getenv('ACTIVITY_SPILL_DIR', 'logs'),
+        'CASSETTE': os.getenv('CASSETTE'),
+        'CASSETTE_MODE': os.getenv('CASSETTE_MODE', 'replay'),
+        'CASSETTE_SPEED': os.getenv('CASSETTE_SPEED', '1'),
+        'CASSETTE_DIR': os.getenv('CASSETTE_DIR', 'cassettes'),
     }
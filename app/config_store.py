@@ -0,0 +1,106 @@
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .journal import write_atomic
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ConfigStore:
+    """Debounced, atomic persistence of portfolio settings to a JSON file.
+
+    ``mark_dirty`` only flags the configuration as changed; a background
+    thread coalesces all changes made within ``delay`` seconds into a single
+    write through a temp file and rename, so request handlers never block on
+    disk I/O and readers never see a torn file.
+    """
+
+    def __init__(self, path: str | Path, delay: float = 1.0):
+        self.path = Path(path)
+        self.delay = delay
+        self.writes = 0
+        self._provider: Optional[Callable[[], Iterable[Dict]]] = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._cache: Optional[List[Dict]] = None
+        self._cache_mtime: Optional[float] = None
+
+    def bind(self, provider: Callable[[], Iterable[Dict]]) -> None:
+        """Register a callable returning the configuration entries to persist."""
+        self._provider = provider
+
+    def load(self) -> List[Dict]:
+        """Return the stored entries, re-reading the file only when it changed."""
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            return []
+        if self._cache is not None and mtime == self._cache_mtime:
+            return self._cache
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError) as exc:
+            logger.error("Failed to read config %s: %s", self.path, exc)
+            return []
+        self._cache, self._cache_mtime = data, mtime
+        return data
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def mark_dirty(self) -> None:
+        """Schedule a write of the current configuration."""
+        with self._lock:
+            self._dirty = True
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="config-flusher", daemon=True
+                )
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait()
+            if self._stop.is_set():
+                break
+            # give further edits a chance to join this write
+            self._stop.wait(self.delay)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> bool:
+        """Write the configuration now if it changed; return True if written."""
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty or self._provider is None:
+                    return False
+                self._dirty = False
+                data = list(self._provider())
+            try:
+                write_atomic(self.path, json.dumps(data, indent=2))
+            except OSError as exc:
+                logger.error("Failed to write config %s: %s", self.path, exc)
+                with self._lock:
+                    self._dirty = True
+                return False
+            self.writes += 1
+            self._cache, self._cache_mtime = data, self.path.stat().st_mtime
+            return True
+
+    def close(self) -> None:
+        """Stop the background thread and write pending changes."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
@@ -1,12 +1,16 @@
+from __future__ import annotations
+
 import csv
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List
 
-import pandas as pd
 import requests
 
 from .logger import get_logger
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 logger = get_logger(__name__)
 
 _STOOQ_HISTORY_URL = "https://stooq.com/q/d/l/?s={symbol}&i=d"
@@ -14,6 +18,8 @@ _STOOQ_HISTORY_URL = "https://stooq.com/q/d/l/?s={symbol}&i=d"
 
 def fetch_price_history(symbol: str, days: int = 90) -> pd.Series:
     """Return a series of closing prices for the last given days."""
+    import pandas as pd
+
     url = _STOOQ_HISTORY_URL.format(symbol=symbol.lower())
     try:
         resp = requests.get(url, timeout=10)
@@ -38,6 +44,8 @@ def fetch_price_history(symbol: str, days: int = 90) -> pd.Series:
 
 def calculate_correlation(symbols: List[str], days: int = 90) -> pd.DataFrame:
     """Return correlation matrix of daily returns for given symbols."""
+    import pandas as pd
+
     if not symbols:
         return pd.DataFrame()
     prices = {}
@@ -56,10 +64,13 @@ def calculate_correlation(symbols: List[str], days: int = 90) -> pd.DataFrame:
 
 def diversification_score(corr: pd.DataFrame) -> float:
     """Simple diversification score between 0 and 1 (1=perfectly diversified)."""
+    import numpy as np
+    import pandas as pd
+
     if corr.empty:
         return 0.0
     # exclude self-correlation (diagonal)
-    vals = corr.where(~pd.eye(len(corr), dtype=bool)).abs().values.flatten()
+    vals = corr.where(~np.eye(len(corr), dtype=bool)).abs().values.flatten()
     vals = [v for v in vals if pd.notna(v)]
     if not vals:
         return 1.0
@@ -0,0 +1,149 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# characters of an event message sent to clients before it is truncated
+MAX_MESSAGE_CHARS = 500
+
+
+class ActivityBus:
+    """Bounded queue that batches activity events into one emit per interval.
+
+    ``publish`` never blocks: it only appends to an in-memory queue. A
+    dispatcher thread drains the queue every ``flush_interval`` seconds and
+    hands the batch to ``emit``. When the queue is full the oldest event is
+    dropped. Messages longer than ``max_message`` characters are truncated;
+    the full event stays retrievable through ``get_ref`` for the last
+    ``max_refs`` truncated events.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[List[Dict]], None],
+        flush_interval: float = 0.25,
+        max_queue: int = 1000,
+        max_message: int = MAX_MESSAGE_CHARS,
+        max_refs: int = 200,
+    ):
+        self.emit = emit
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_message = max_message
+        self.max_refs = max_refs
+        self._queue: deque = deque()
+        self._refs: OrderedDict = OrderedDict()
+        self._ref_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._emit_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.published = 0
+        self.dropped = 0
+        self.truncated = 0
+        self.emitted = 0
+        self.batches = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+
+    def publish(self, name: str, event: Dict) -> None:
+        """Queue an activity event of portfolio ``name`` for the next batch."""
+        message = event.get("message")
+        if isinstance(message, str) and len(message) > self.max_message:
+            event = self._truncate(name, event, message)
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append({"name": name, "event": event})
+            self.published += 1
+            self.max_depth = max(self.max_depth, len(self._queue))
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="activity-dispatcher", daemon=True
+                )
+                self._thread.start()
+        self._wake.set()
+
+    def _truncate(self, name: str, event: Dict, message: str) -> Dict:
+        ref = str(next(self._ref_ids))
+        with self._lock:
+            self._refs[ref] = {"name": name, "event": event}
+            while len(self._refs) > self.max_refs:
+                self._refs.popitem(last=False)
+            self.truncated += 1
+        return {
+            **event,
+            "message": message[: self.max_message] + "...",
+            "truncated": True,
+            "ref": ref,
+        }
+
+    def get_ref(self, ref: str) -> Optional[Dict]:
+        """Return the full event of a truncated message, if still retained."""
+        with self._lock:
+            return self._refs.get(str(ref))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait()
+            # collect everything published during the interval into one batch
+            self._stop.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Emit all queued events as one batch; return the batch size."""
+        with self._emit_lock:
+            with self._lock:
+                batch = list(self._queue)
+                self._queue.clear()
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            try:
+                self.emit(batch)
+            except Exception as exc:
+                self.errors += 1
+                logger.error("Failed to emit %d activity events: %s", len(batch), exc)
+                return 0
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            self.last_batch_size = len(batch)
+            self.emitted += len(batch)
+            self.batches += 1
+            return len(batch)
+
+    def metrics(self) -> Dict[str, float]:
+        """Return queue depth and counters describing backpressure."""
+        with self._lock:
+            depth = len(self._queue)
+        return {
+            "queued": depth,
+            "max_queue": self.max_queue,
+            "max_depth": self.max_depth,
+            "published": self.published,
+            "dropped": self.dropped,
+            "truncated": self.truncated,
+            "emitted": self.emitted,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+    def close(self) -> None:
+        """Stop the dispatcher and emit what is still queued."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Response, make_response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def project(payload, fields) -> Dict:
+    """Keep only ``fields`` in every record of the list values of ``payload``.
+
+    ``{"trades": [{"id": 1, "qty": 2, ...}]}`` with ``fields=["id"]``
+    becomes ``{"trades": [{"id": 1}]}``; other values are left as they are.
+    """
+    if not isinstance(payload, dict):
+        return payload
+    keep = set(fields)
+    result = {}
+    for key, value in payload.items():
+        if isinstance(value, list) and value and isinstance(value[0], dict):
+            value = [{k: v for k, v in item.items() if k in keep} for item in value]
+        result[key] = value
+    return result
+
+
+def requested_fields() -> Optional[list]:
+    fields = request.args.get("fields", "")
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    return names or None
+
+
+def conditional(
+    state_of: Callable[..., Optional[Tuple[object, Optional[float]]]],
+):
+    """Add ETag/Last-Modified validation and ``fields`` projection to a view.
+
+    ``state_of`` receives the view arguments and returns ``(revision,
+    modified)``: any value that changes whenever the response would change,
+    and the epoch time of that change (or None). When the client already
+    holds the current version the view is not called and 304 is returned.
+    Returning None from ``state_of`` disables validation for the request.
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since``. Since
+    ``Last-Modified`` has one-second resolution, it is only sent (and
+    honoured) once the second of the change is over; another change in
+    the same second would otherwise be hidden behind a stale 304.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            state = state_of(*args, **kwargs)
+            if state is None:
+                return _projected(view(*args, **kwargs))
+            revision, modified = state
+            etag = hashlib.sha1(
+                f"{request.full_path}|{revision}".encode()
+            ).hexdigest()[:24]
+            last_modified = (
+                datetime.fromtimestamp(int(modified), timezone.utc)
+                if modified and int(modified) < int(time.time())
+                else None
+            )
+            if _not_modified(etag, last_modified):
+                response = Response(status=304)
+            else:
+                response = make_response(_projected(view(*args, **kwargs)))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _projected(result):
+    fields = requested_fields()
+    if fields and isinstance(result, dict):
+        return project(result, fields)
+    return result
+
+
+def _not_modified(etag: str, last_modified: Optional[datetime]) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return bool(since and last_modified and last_modified <= since)
+
+
+def compress_response(response: Response) -> Response:
+    """Compress large JSON responses with brotli or gzip (``after_request``)."""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype != "application/json"
+    ):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        body, encoding = brotli.compress(data, quality=BROTLI_QUALITY), "br"
+    elif accepted["gzip"]:
+        body, encoding = gzip.compress(data, compresslevel=GZIP_LEVEL), "gzip"
+    else:
+        return response
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
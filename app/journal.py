@@ -0,0 +1,286 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+SNAPSHOT_FILE = "snapshot.json"
+# trades per portfolio kept in snapshots; older ones live in the trade store
+SNAPSHOT_HISTORY = 500
+
+
+def write_atomic(path: Path, text: str) -> None:
+    """Write ``text`` to ``path`` via a temp file and an atomic rename."""
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class OrderJournal:
+    """Append-only JSONL journal of order activity used for crash recovery.
+
+    Every order produces an ``intent`` before it is sent to the broker, a
+    ``submitted`` or ``rejected`` record afterwards, ``fill`` records when a
+    fill price is known, ``holding`` records with the resulting position and
+    finally the ``trade`` stored in the history. Records are fsynced in
+    batches, segments rotate at ``segment_size`` bytes and every
+    ``checkpoint_every`` records a snapshot is written and older segments
+    are deleted, so replay only ever reads the tail of the journal.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path = "journal",
+        segment_size: int = 4_000_000,
+        fsync_every: int = 20,
+        fsync_interval: float = 1.0,
+        checkpoint_every: int = 1000,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.checkpoint_every = checkpoint_every
+        self._lock = threading.RLock()
+        self._state_provider: Optional[Callable[[], Iterable]] = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._since_checkpoint = 0
+        # intents written since startup that have no trade or rejection yet
+        self._open_intents: Dict[str, Dict[str, Dict]] = {}
+        self.seq = self._last_seq()
+        self._file = None
+        self._open_segment()
+
+    # --- Segments ------------------------------------------------------------
+    def _segments(self) -> List[Path]:
+        return sorted(self.directory.glob("segment-*.jsonl"))
+
+    def _last_seq(self) -> int:
+        seq = self._load_snapshot().get("seq", 0)
+        segments = self._segments()
+        if segments:
+            # segment names carry the sequence number of their first record
+            seq = max(seq, int(segments[-1].stem.split("-")[1]) - 1)
+        for record in self._read(segments[-1:]):
+            seq = max(seq, record["seq"])
+        return seq
+
+    def _open_segment(self) -> None:
+        segments = self._segments()
+        if segments and segments[-1].stat().st_size < self.segment_size:
+            path = segments[-1]
+        else:
+            path = self.directory / f"segment-{self.seq + 1:012d}.jsonl"
+        self._file = path.open("a")
+
+    def rotate(self) -> None:
+        """Close the current segment and start a new one."""
+        with self._lock:
+            self.sync()
+            self._file.close()
+            path = self.directory / f"segment-{self.seq + 1:012d}.jsonl"
+            self._file = path.open("a")
+
+    def sync(self) -> None:
+        """Flush buffered records to disk."""
+        with self._lock:
+            if self._file is None or self._file.closed:
+                return
+            self._file.flush()
+            if self._unsynced:
+                os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            self.sync()
+            if self._file is not None:
+                self._file.close()
+
+    # --- Writing -------------------------------------------------------------
+    def bind(self, state_provider: Callable[[], Iterable]) -> None:
+        """Register a callable returning the portfolios to snapshot."""
+        self._state_provider = state_provider
+
+    def record(self, portfolio: str, kind: str, **data) -> int:
+        """Append a record and return its sequence number."""
+        with self._lock:
+            self.seq += 1
+            line = json.dumps(
+                {
+                    "seq": self.seq,
+                    "time": datetime.utcnow().isoformat(),
+                    "portfolio": portfolio,
+                    "kind": kind,
+                    "data": data,
+                },
+                default=str,
+            )
+            self._file.write(line + "\n")
+            self._track_intent(portfolio, kind, data)
+            self._unsynced += 1
+            self._since_checkpoint += 1
+            if (
+                self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval
+            ):
+                self.sync()
+            if self._file.tell() >= self.segment_size:
+                self.rotate()
+            if self._state_provider and self._since_checkpoint >= self.checkpoint_every:
+                self.checkpoint(self._state_provider())
+            return self.seq
+
+    def _track_intent(self, portfolio: str, kind: str, data: Dict) -> None:
+        intents = self._open_intents.setdefault(portfolio, {})
+        if kind == "intent":
+            intents[str(self.seq)] = {
+                "symbol": data.get("symbol"),
+                "qty": data.get("qty"),
+                "side": data.get("side"),
+                "client_order_id": data.get("client_order_id"),
+                "time": datetime.utcnow().isoformat(),
+            }
+        elif kind in ("rejected", "trade"):
+            intents.pop(str(data.get("intent", "")), None)
+
+    def checkpoint(self, portfolios: Iterable) -> None:
+        """Snapshot portfolio state and drop the segments it covers."""
+        with self._lock:
+            state = {
+                p.name: {
+                    "holdings": dict(p.holdings),
+                    "avg_prices": dict(p.avg_prices),
+                    "history": list(p.history[-SNAPSHOT_HISTORY:]),
+                    "pending": {
+                        **(getattr(p, "unconfirmed_orders", None) or {}),
+                        **self._open_intents.get(p.name, {}),
+                    },
+                }
+                for p in portfolios
+            }
+            self.rotate()
+            snapshot = {"seq": self.seq, "portfolios": state}
+            write_atomic(
+                self.directory / SNAPSHOT_FILE, json.dumps(snapshot, default=str)
+            )
+            current = Path(self._file.name)
+            for segment in self._segments():
+                if segment != current:
+                    segment.unlink()
+            self._since_checkpoint = 0
+
+    # --- Replay --------------------------------------------------------------
+    def _load_snapshot(self) -> Dict:
+        path = self.directory / SNAPSHOT_FILE
+        if not path.exists():
+            return {}
+        try:
+            return json.loads(path.read_text())
+        except ValueError as exc:
+            logger.error("Corrupt journal snapshot %s: %s", path, exc)
+            return {}
+
+    @staticmethod
+    def _read(segments: Iterable[Path]) -> Iterator[Dict]:
+        for segment in segments:
+            with segment.open() as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # a torn last line from a crash is ignored
+                        logger.warning("Skipping corrupt journal line in %s", segment)
+
+    def replay(self, portfolios: Iterable) -> int:
+        """Rebuild holdings, avg_prices and history from snapshot and journal.
+
+        Order intents without a recorded trade are left in
+        ``portfolio.unconfirmed_orders`` for ``Portfolio.reconcile_orders``,
+        which ``MultiPortfolioManager.attach_journal`` runs after replay.
+        Returns the number of journal records applied.
+        """
+        with self._lock:
+            self.sync()
+            by_name = {p.name: p for p in portfolios}
+            snapshot = self._load_snapshot()
+            base_seq = snapshot.get("seq", 0)
+            pending: Dict[str, Dict[str, Dict]] = {}
+            for name, state in snapshot.get("portfolios", {}).items():
+                p = by_name.get(name)
+                if p is None:
+                    continue
+                p.holdings = dict(state.get("holdings", {}))
+                p.avg_prices = dict(state.get("avg_prices", {}))
+                p.history = list(state.get("history", []))
+                pending[name] = dict(state.get("pending", {}))
+            applied = 0
+            for record in self._read(self._segments()):
+                if record["seq"] <= base_seq:
+                    continue
+                p = by_name.get(record["portfolio"])
+                if p is None:
+                    continue
+                _apply(p, record, pending.setdefault(p.name, {}))
+                applied += 1
+            for name, intents in pending.items():
+                p = by_name.get(name)
+                if p is None:
+                    continue
+                p.unconfirmed_orders = intents
+                for intent in intents.values():
+                    logger.warning(
+                        "Unconfirmed %s order for %s: %s %s",
+                        intent.get("side"),
+                        name,
+                        intent.get("qty"),
+                        intent.get("symbol"),
+                    )
+            return applied
+
+
+def _apply(portfolio, record: Dict, pending: Dict[str, Dict]) -> None:
+    kind = record["kind"]
+    data = record["data"]
+    intent = str(data.get("intent", ""))
+    if kind == "intent":
+        pending[str(record["seq"])] = {
+            "symbol": data.get("symbol"),
+            "qty": data.get("qty"),
+            "side": data.get("side"),
+            "client_order_id": data.get("client_order_id"),
+            "time": record.get("time"),
+        }
+    elif kind == "submitted":
+        if intent in pending:
+            pending[intent]["order_id"] = data.get("order_id")
+    elif kind == "fill":
+        if intent in pending:
+            pending[intent]["filled_avg_price"] = data.get("filled_avg_price")
+    elif kind == "rejected":
+        pending.pop(intent, None)
+    elif kind == "holding":
+        symbol = data["symbol"]
+        qty = float(data.get("qty") or 0)
+        if qty > 0:
+            portfolio.holdings[symbol] = qty
+            if data.get("avg_price") is not None:
+                portfolio.avg_prices[symbol] = float(data["avg_price"])
+        else:
+            portfolio.holdings.pop(symbol, None)
+            portfolio.avg_prices.pop(symbol, None)
+    elif kind == "trade":
+        portfolio.history.append(data["trade"])
+        pending.pop(intent, None)
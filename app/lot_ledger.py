@@ -0,0 +1,140 @@
+import heapq
+import itertools
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional
+
+# number of best and worst closing trades kept for ranking
+TOP_K = 20
+# remaining quantities below this are treated as closed
+QTY_EPSILON = 1e-9
+
+
+class LotLedger:
+    """FIFO buy lots per symbol with realized PnL of every closing trade.
+
+    Each buy opens a lot at its fill price; each sell consumes the oldest
+    lots first, so partial closes realize PnL against the right cost basis.
+    Realized PnL is written to the sell as ``pnl`` unless the trade already
+    carries one. The ``k`` best and worst closing trades are kept in heaps,
+    making ``top`` and ``flop`` independent of the history length.
+    """
+
+    def __init__(self, k: int = TOP_K):
+        self.k = k
+        self.lots: Dict[str, Deque[List[float]]] = {}
+        self.realized = 0.0
+        self.closed = 0
+        self.wins = 0
+        # notional of all buys and sells, for turnover
+        self.traded = 0.0
+        self._top: List = []
+        self._flop: List = []
+        self._seq = itertools.count()
+        self._source_id: Optional[int] = None
+        self._last: Optional[Dict] = None
+
+    def add(self, trade: Dict) -> Optional[float]:
+        """Apply a trade and return the realized PnL of a sell."""
+        self._last = trade
+        symbol = trade.get("symbol")
+        qty = float(trade.get("qty") or 0)
+        # "price" is the quote recorded for orders submitted before a fill
+        price = float(trade.get("filled_avg_price") or trade.get("price") or 0)
+        side = str(trade.get("side") or "").lower()
+        if side in ("buy", "sell"):
+            self.traded += abs(qty * price)
+        if side == "buy":
+            if qty > 0:
+                self.lots.setdefault(symbol, deque()).append([qty, price])
+            return None
+        if side != "sell":
+            return None
+        if price <= 0 and trade.get("pnl") is None:
+            # no fill price nor quote: close the lots without realizing
+            # anything rather than counting the whole cost as a loss
+            self._consume(symbol, qty, price)
+            return None
+        pnl = self._consume(symbol, qty, price)
+        if trade.get("pnl") is None:
+            trade["pnl"] = pnl
+        else:
+            pnl = float(trade["pnl"])
+        self._rank({"symbol": symbol, "pnl": pnl})
+        return pnl
+
+    def _consume(self, symbol: str, qty: float, price: float) -> float:
+        """Close ``qty`` of the oldest lots of ``symbol`` and return their PnL."""
+        pnl = 0.0
+        lots = self.lots.get(symbol)
+        remaining = qty
+        while lots and remaining > QTY_EPSILON:
+            lot = lots[0]
+            matched = min(lot[0], remaining)
+            pnl += (price - lot[1]) * matched
+            lot[0] -= matched
+            remaining -= matched
+            if lot[0] <= QTY_EPSILON:
+                lots.popleft()
+        if lots is not None and not lots:
+            del self.lots[symbol]
+        return pnl
+
+    def _rank(self, entry: Dict) -> None:
+        self.realized += entry["pnl"]
+        self.closed += 1
+        if entry["pnl"] > 0:
+            self.wins += 1
+        seq = next(self._seq)
+        top = (entry["pnl"], seq, entry)
+        flop = (-entry["pnl"], -seq, entry)
+        if len(self._top) < self.k:
+            heapq.heappush(self._top, top)
+            heapq.heappush(self._flop, flop)
+            return
+        heapq.heappushpop(self._top, top)
+        heapq.heappushpop(self._flop, flop)
+
+    def top(self, limit: int = 5) -> List[Dict]:
+        """Return up to ``limit`` (at most ``k``) closing trades, best first."""
+        return [e for _, _, e in heapq.nlargest(limit, self._top)]
+
+    def flop(self, limit: int = 5) -> List[Dict]:
+        """Return up to ``limit`` (at most ``k``) closing trades, worst first."""
+        return [e for _, _, e in heapq.nlargest(limit, self._flop)]
+
+    def open_qty(self, symbol: str) -> float:
+        return sum(lot[0] for lot in self.lots.get(symbol, ()))
+
+    # --- Keeping up with a history list ----------------------------------
+    def rebuild(self, history: List[Dict], trades: Iterable[Dict] | None = None):
+        """Reset and replay ``trades`` (defaults to ``history``)."""
+        self.__init__(self.k)
+        for trade in history if trades is None else trades:
+            self.add(trade)
+        self._source_id = id(history)
+        self._last = history[-1] if history else None
+
+    def is_tracking(self, history: List[Dict]) -> bool:
+        return self._source_id == id(history)
+
+    def sync(self, history: List[Dict]) -> bool:
+        """Apply trades appended to ``history`` since the last call.
+
+        Returns False if ``history`` is not the tracked list or the last
+        applied trade is no longer in it, in which case the caller has to
+        ``rebuild``. Trimming old trades off the front is fine.
+        """
+        if not self.is_tracking(history):
+            return False
+        if not history:
+            return self._last is None
+        if history[-1] is self._last:
+            return True
+        start = len(history) - 1
+        while start >= 0 and history[start] is not self._last:
+            start -= 1
+        if start < 0 and self._last is not None:
+            return False
+        for trade in history[start + 1 :]:
+            self.add(trade)
+        return True
@@ -0,0 +1,121 @@
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+BASELINE_FILE = Path("perf_baseline.json")
+# allowed relative slowdown before a metric counts as a regression
+DEFAULT_BUDGET = 0.3
+# differences below these are timer and allocator noise, whatever the ratio
+NOISE_FLOOR = {"ms": 2.0, "mb": 1.0, "per_s": 0.0}
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, warmup: int = 1) -> float:
+    """Return the median wall time of ``fn`` in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def peak_memory(fn: Callable[[], object]) -> float:
+    """Return the peak Python heap allocated while ``fn`` runs, in MiB."""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 2**20, 3)
+
+
+def _unit(metric: str) -> str:
+    for unit in NOISE_FLOOR:
+        if metric.endswith("_" + unit):
+            return unit
+    raise ValueError(f"metric {metric} must end in _ms, _mb or _per_s")
+
+
+def machine() -> Dict[str, object]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(terse=True),
+        "cpus": os.cpu_count(),
+    }
+
+
+def load_baseline(path: str | Path = BASELINE_FILE) -> Dict:
+    """Return the stored baseline, or an empty one if none was saved yet."""
+    try:
+        return json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return {"metrics": {}, "budgets": {}}
+    except (OSError, ValueError) as exc:
+        logger.error("Failed to read perf baseline %s: %s", path, exc)
+        return {"metrics": {}, "budgets": {}}
+
+
+def save_baseline(
+    metrics: Dict[str, float],
+    path: str | Path = BASELINE_FILE,
+    budgets: Optional[Dict[str, float]] = None,
+) -> None:
+    """Write ``metrics`` as the new baseline, keeping per-metric budgets."""
+    if budgets is None:
+        budgets = load_baseline(path).get("budgets", {})
+    data = {
+        "created": datetime.utcnow().isoformat(timespec="seconds"),
+        "machine": machine(),
+        "budgets": budgets,
+        "metrics": dict(sorted(metrics.items())),
+    }
+    Path(path).write_text(json.dumps(data, indent=2) + "\n")
+
+
+def compare(metrics: Dict[str, float], baseline: Dict) -> List[Dict]:
+    """Return one row per metric with its change against ``baseline``.
+
+    Times (``_ms``) and memory (``_mb``) regress when they grow by more than
+    their budget, throughputs (``_per_s``) when they shrink by more. Budgets
+    are relative (0.3 = 30%) and default to ``DEFAULT_BUDGET``. Absolute
+    numbers only compare on the machine that recorded them, so a baseline
+    from another ``machine()`` raises ``ValueError``.
+    """
+    recorded = baseline.get("machine")
+    if recorded is not None and recorded != machine():
+        raise ValueError(f"baseline was recorded on {recorded}, not {machine()}")
+    stored = baseline.get("metrics", {})
+    budgets = baseline.get("budgets", {})
+    rows = []
+    for metric, value in sorted(metrics.items()):
+        unit = _unit(metric)
+        base = stored.get(metric)
+        budget = float(budgets.get(metric, DEFAULT_BUDGET))
+        row = {"metric": metric, "value": value, "baseline": base, "budget": budget}
+        if base:
+            row["change"] = round(value / base - 1, 3)
+            if unit == "per_s":
+                row["regressed"] = value < base * (1 - budget)
+            else:
+                row["regressed"] = (
+                    value > base * (1 + budget)
+                    and value - base > NOISE_FLOOR[unit]
+                )
+        else:
+            row["change"] = None
+            row["regressed"] = False
+        rows.append(row)
+    return rows
@@ -0,0 +1,118 @@
+import calendar
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from .timeseries import TimeSeries, to_iso
+
+DAY = 86400.0
+INTERVALS = ("day", "week", "month")
+
+
+def _day(ts: float) -> float:
+    return ts - ts % DAY
+
+
+def _week(ts: float) -> float:
+    # weeks end on Sunday like pandas "W" (W-SUN); 1970-01-01 was a Thursday
+    day = _day(ts)
+    weekday = (int(day // DAY) + 3) % 7
+    return day + (6 - weekday) * DAY
+
+
+def _month(ts: float) -> float:
+    # labelled with the last day of the month like pandas "ME"
+    d = datetime.fromtimestamp(ts, timezone.utc)
+    last = calendar.monthrange(d.year, d.month)[1]
+    return datetime(d.year, d.month, last, tzinfo=timezone.utc).timestamp()
+
+
+def _next_month(label: float) -> float:
+    return _month(label + DAY)
+
+
+_LABELS = {"day": _day, "week": _week, "month": _month}
+
+
+class _Buckets:
+    __slots__ = ("labels", "values", "label_of")
+
+    def __init__(self, label_of):
+        self.labels = array("d")
+        self.values = array("d")
+        self.label_of = label_of
+
+    def add(self, ts: float, value: float) -> None:
+        label = self.label_of(ts)
+        if self.labels and self.labels[-1] == label:
+            self.values[-1] = value
+        elif not self.labels or label > self.labels[-1]:
+            self.labels.append(label)
+            self.values.append(value)
+        else:
+            # out-of-order point: the latest recorded value wins its bucket
+            i = bisect_left(self.labels, label)
+            if self.labels[i] == label:
+                self.values[i] = value
+            else:
+                self.labels.insert(i, label)
+                self.values.insert(i, value)
+
+
+class PnLBuckets:
+    """Last equity value per day, week and month, updated incrementally.
+
+    ``history`` reproduces ``values.resample(rule).last().diff().fillna(0)``
+    for the rules ``D``, ``W`` and ``ME``: empty buckets between recorded
+    ones report 0 and so does the bucket right after an empty one.
+    """
+
+    def __init__(self):
+        self._buckets = {name: _Buckets(fn) for name, fn in _LABELS.items()}
+        self._source = None
+        self._count = 0
+
+    def add(self, ts: float, value: float) -> None:
+        for buckets in self._buckets.values():
+            buckets.add(ts, value)
+
+    def sync(self, series: TimeSeries) -> None:
+        """Feed the points of ``series`` not seen yet.
+
+        The last seen point is fed again because ``TimeSeries.add`` replaces
+        a point recorded at the same timestamp. A replaced or shortened
+        series is re-read from the start.
+        """
+        size = len(series)
+        if series is not self._source or size < self._count:
+            self.__init__()
+            self._source = series
+        for i in range(max(self._count - 1, 0), size):
+            self.add(series.times[i], series.values[i])
+        self._count = size
+
+    def history(self, interval: str = "day") -> List[Dict]:
+        """Return ``[{"time", "pnl"}]`` per bucket from first to last bucket."""
+        buckets = self._buckets[interval if interval in INTERVALS else "day"]
+        if not buckets.labels:
+            return []
+        width = 7 * DAY if interval == "week" else DAY
+
+        def step(label: float) -> float:
+            return _next_month(label) if interval == "month" else label + width
+
+        present = dict(zip(buckets.labels, buckets.values))
+        result = []
+        previous = None
+        label = buckets.labels[0]
+        last = buckets.labels[-1]
+        while label <= last:
+            value = present.get(label)
+            pnl = 0.0
+            if value is not None and previous is not None:
+                pnl = value - previous
+            result.append({"time": to_iso(label), "pnl": float(pnl)})
+            previous = value
+            label = step(label)
+        return result
@@ -1,35 +1,114 @@
 from __future__ import annotations
 
+import itertools
 import json
+import threading
+import time
+import uuid
 from dataclasses import dataclass, field
 from typing import List, Dict, Callable, Optional, Sequence, Union
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 
-import openai
-
-from alpaca.trading.client import TradingClient
-from alpaca.trading.requests import MarketOrderRequest
-from alpaca.trading.enums import OrderSide, TimeInForce, OrderType
+import requests
 
 from .config import load_env
 from .research_engine import get_ai_research, get_trending_symbols
 from .logger import get_logger
-from .benchmark import (
-    get_latest_benchmark_price,
-    get_latest_price,
-    normalize_curve,
-)
+from .benchmark import get_latest_benchmark_price, get_latest_price
 from .diversification import analyze_portfolio
+from .storage import TradeStore, HOT_TRADES
+from .timeseries import TimeSeries, to_epoch
+from .pnl_buckets import PnLBuckets
+from .lot_ledger import LotLedger, QTY_EPSILON
+from .analytics import PerformanceTracker
+from .trade_index import TradeIndex
+from .journal import OrderJournal
+from .config_store import ConfigStore
+from .ring_buffer import EventLog, RingBuffer, estimate_size, DEFAULT_ALERT_CAPACITY
+from .sim_broker import SIM_SCHEME, SimulatedBroker
 
 logger = get_logger(__name__)
 
 ENV = load_env()
-openai.api_key = ENV.get("OPENAI_API_KEY")
+OPENAI_API_KEY = ENV.get("OPENAI_API_KEY")
+ACTIVITY_LOG_CAPACITY = int(ENV.get("ACTIVITY_LOG_CAPACITY") or 200)
+ACTIVITY_OVERFLOW = ENV.get("ACTIVITY_OVERFLOW") or "drop"
+ACTIVITY_SPILL_DIR = Path(ENV.get("ACTIVITY_SPILL_DIR") or "logs")
+# seconds a broker position snapshot is reused while holdings are unchanged
+POSITIONS_MAX_AGE = 5.0
+# relative difference of average prices reported as drift
+AVG_PRICE_TOLERANCE = 0.01
+# broker order statuses after which an order can no longer fill
+DEAD_ORDER_STATUSES = ("canceled", "expired", "rejected", "replaced")
 
 
 activity_callback: Optional[Callable[[str, Dict], None]] = None
 
+# numeric risk settings, persisted as floats
+RISK_SETTINGS = (
+    "stop_loss_pct",
+    "take_profit_pct",
+    "max_drawdown_pct",
+    "trade_pnl_limit_pct",
+    "risk_level",
+)
+# per-portfolio settings persisted in portfolios.json
+PORTFOLIO_SETTINGS = (
+    "name",
+    "strategy_type",
+    "custom_prompt",
+    "api_key",
+    "secret_key",
+    "base_url",
+    *RISK_SETTINGS,
+)
+
+# attributes whose reassignment bumps a revision section (see Portfolio.touch)
+TRACKED_ATTRIBUTES = {
+    "holdings": "holdings",
+    "avg_prices": "holdings",
+    "history": "history",
+    "equity_curve": "equity",
+    "risk_alerts": "alerts",
+    **{key: "config" for key in PORTFOLIO_SETTINGS},
+}
+
+# revisions come from one counter so they never repeat across portfolios
+_revision_counter = itertools.count(1)
+
+
+# one HTTP session (connection pool) per broker base URL
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def make_trading_client(api_key: str, secret_key: str, base_url: str | None):
+    """Create an Alpaca ``TradingClient`` sharing the session of ``base_url``.
+
+    A ``sim://`` base URL creates a ``SimulatedBroker`` priced by quotes
+    instead. alpaca-py is imported on first use since it pulls in pandas.
+    """
+    base_url = base_url or ""
+    if base_url.startswith(f"{SIM_SCHEME}:"):
+        return SimulatedBroker.from_url(
+            base_url, price_source=lambda symbol: get_latest_price(symbol).get("value")
+        )
+    from alpaca.trading.client import TradingClient
+
+    client = TradingClient(
+        api_key, secret_key, paper="paper" in base_url, url_override=base_url or None
+    )
+    with _sessions_lock:
+        session = _sessions.setdefault(base_url, client._session)
+    client._session = session
+    return client
+
+
+def _enum_value(value) -> str | None:
+    value = getattr(value, "value", value)
+    return str(value).lower() if value is not None else None
+
 
 def set_activity_callback(cb: Optional[Callable[[str, Dict], None]]) -> None:
     """Register a callback for activity log events."""
@@ -48,7 +127,7 @@ class Portfolio:
     strategy_type: str = "default"
     custom_prompt: str = ""
     history: List[Dict] = field(default_factory=list)
-    equity_curve: List[Dict] = field(default_factory=list)
+    equity_curve: TimeSeries = field(default_factory=TimeSeries)
     stop_loss_pct: float = 0.05
     take_profit_pct: float = 0.1
     max_drawdown_pct: float = 0.2
@@ -56,38 +135,254 @@ class Portfolio:
     risk_level: float = 0.02  # fraction of cash to risk per trade
     holdings: Dict[str, float] = field(default_factory=dict)
     avg_prices: Dict[str, float] = field(default_factory=dict)
-    risk_alerts: List[str] = field(default_factory=list)
+    risk_alerts: RingBuffer = field(
+        default_factory=lambda: RingBuffer(DEFAULT_ALERT_CAPACITY)
+    )
     open_orders: List[Dict] = field(default_factory=list)
     correlation_matrix: Dict[str, Dict[str, float]] = field(default_factory=dict)
     diversification_score: float = 0.0
     diversification_warnings: List[str] = field(default_factory=list)
-    activity_log: List[Dict] = field(default_factory=list)
+    activity_log: EventLog | None = None
     initial_value: float | None = None
     high_water: float = 0.0
     last_prompt: str = ""
     last_research: Dict | None = field(default_factory=dict)
     last_response: str = ""
+    store: Optional[TradeStore] = field(default=None, repr=False, compare=False)
+    drawdown_alerted: bool = False
+    unconfirmed_orders: Dict[str, Dict] = field(default_factory=dict)
+    journal: Optional[OrderJournal] = field(default=None, repr=False, compare=False)
+    trade_callback: Optional[Callable[["Portfolio", Dict], None]] = field(
+        default=None, repr=False, compare=False
+    )
+    revisions: Dict[str, int] = field(default_factory=dict, repr=False, compare=False)
+    modified: Dict[str, float] = field(default_factory=dict, repr=False, compare=False)
+    pnl_buckets: PnLBuckets = field(
+        default_factory=PnLBuckets, repr=False, compare=False
+    )
+    ledger: LotLedger = field(default_factory=LotLedger, repr=False, compare=False)
+    performance: PerformanceTracker = field(
+        default_factory=PerformanceTracker, repr=False, compare=False
+    )
+    position_drift: List[Dict] = field(default_factory=list, repr=False, compare=False)
+    # replaces the quote feed for valuation and sizing, e.g. in backtests
+    price_source: Optional[Callable[[str], Optional[float]]] = field(
+        default=None, repr=False, compare=False
+    )
+    # timestamps equity points and activity, e.g. with the bar date in backtests
+    clock: Optional[Callable[[], datetime]] = field(
+        default=None, repr=False, compare=False
+    )
+    # quiet portfolios keep their activity log but do not publish it
+    quiet: bool = field(default=False, repr=False, compare=False)
+    _positions_cache: Optional[tuple] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def __post_init__(self) -> None:
-        paper = "paper" in self.base_url
-        self.client = TradingClient(
-            self.api_key, self.secret_key, paper=paper, url_override=self.base_url
+        if not isinstance(self.activity_log, EventLog):
+            events = self.activity_log or []
+            self.activity_log = EventLog(
+                ACTIVITY_LOG_CAPACITY,
+                overflow=ACTIVITY_OVERFLOW,
+                spill_path=ACTIVITY_SPILL_DIR / f"{self.name}_activity.jsonl",
+            )
+            self.activity_log.extend(events)
+        if not isinstance(self.risk_alerts, RingBuffer):
+            self.risk_alerts = RingBuffer(DEFAULT_ALERT_CAPACITY, self.risk_alerts)
+
+    @property
+    def client(self):
+        """Broker client, created on first use."""
+        client = self.__dict__.get("_client")
+        if client is None:
+            client = make_trading_client(self.api_key, self.secret_key, self.base_url)
+            self.__dict__["_client"] = client
+        return client
+
+    @client.setter
+    def client(self, value) -> None:
+        self.__dict__["_client"] = value
+
+    def __setattr__(self, name: str, value) -> None:
+        # keep equity curves compact even when assigned as a list of dicts
+        if name == "equity_curve" and not isinstance(value, TimeSeries):
+            value = TimeSeries(value or [])
+        super().__setattr__(name, value)
+        if name in TRACKED_ATTRIBUTES and "modified" in self.__dict__:
+            self.touch(TRACKED_ATTRIBUTES[name])
+
+    def touch(self, *sections: str) -> None:
+        """Mark state sections as changed so cached views get rebuilt.
+
+        Sections are ``holdings``, ``history``, ``equity``, ``alerts``,
+        ``activity`` and ``config``; each gets a new, globally increasing
+        revision number and its modification time is recorded.
+        """
+        now = time.time()
+        for section in sections:
+            self.revisions[section] = next(_revision_counter)
+            self.modified[section] = now
+
+    def revision(self, *sections: str) -> int:
+        """Return the latest revision of the given sections (all if none)."""
+        values = (
+            [self.revisions.get(s, 0) for s in sections]
+            if sections
+            else self.revisions.values()
+        )
+        return max(values, default=0)
+
+    def last_modified(self, *sections: str) -> float | None:
+        """Return the epoch time the given sections (all if none) last changed."""
+        values = (
+            [self.modified[s] for s in sections if s in self.modified]
+            if sections
+            else self.modified.values()
+        )
+        return max(values, default=None)
+
+    @classmethod
+    def from_config(cls, item: Dict) -> "Portfolio":
+        """Create a portfolio from a persisted settings dictionary."""
+        p = cls(
+            item.get("name"),
+            item.get("api_key", ""),
+            item.get("secret_key", ""),
+            item.get("base_url", ENV.get("ALPACA_BASE_URL")),
+            item.get("strategy_type", "default"),
+            item.get("custom_prompt", ""),
         )
+        for key in RISK_SETTINGS:
+            if item.get(key) is not None:
+                setattr(p, key, float(item[key]))
+        return p
+
+    def to_config(self) -> Dict:
+        """Return all persisted settings of the portfolio."""
+        return {key: getattr(self, key) for key in PORTFOLIO_SETTINGS}
+
+    def now(self) -> datetime:
+        """Return the current (naive UTC) time, from ``clock`` if set."""
+        return self.clock() if self.clock is not None else datetime.utcnow()
 
     def log_event(self, event_type: str, message: str) -> None:
         """Store an activity log entry and trigger callback."""
         entry = {
-            "time": datetime.utcnow().isoformat(),
+            "time": self.now().isoformat(),
             "type": event_type,
             "message": message,
         }
         self.activity_log.append(entry)
-        if activity_callback:
+        self.touch("activity")
+        if self.store:
+            self.store.add_activity(self.name, entry)
+        if activity_callback and not self.quiet:
             try:
                 activity_callback(self.name, entry)
             except Exception:
                 pass
 
+    def add_alert(self, alert: str) -> None:
+        """Record a risk alert and log it as activity event."""
+        self.risk_alerts.append(alert)
+        self.touch("alerts")
+        if self.store:
+            self.store.add_alert(self.name, alert, datetime.utcnow().isoformat())
+        self.log_event("alert", alert)
+
+    def memory_usage(self) -> Dict[str, object]:
+        """Return approximate in-memory size in bytes of the stored records."""
+        activity = self.activity_log.memory_usage()
+        usage = {
+            "history": estimate_size(self.history),
+            "equity_curve": self.equity_curve.memory_usage(),
+            "activity_log": sum(activity.values()),
+            "risk_alerts": self.risk_alerts.memory_usage(),
+        }
+        usage["total"] = sum(usage.values())
+        usage["activity_by_type"] = activity
+        usage["activity_dropped"] = self.activity_log.dropped
+        usage["activity_spilled"] = self.activity_log.spilled
+        return usage
+
+    def _record_equity(self, value: float) -> None:
+        point = {"time": self.now().isoformat(), "value": value}
+        if not self.equity_curve.append(point):
+            return
+        self.touch("equity")
+        if self.store:
+            self.store.add_equity(self.name, point)
+
+    def _journal(self, kind: str, **data) -> Optional[int]:
+        if not self.journal:
+            return None
+        try:
+            return self.journal.record(self.name, kind, **data)
+        except Exception as exc:
+            logger.error("Failed to journal %s for %s: %s", kind, self.name, exc)
+            return None
+
+    def _journal_holding(self, symbol: str) -> None:
+        self._journal(
+            "holding",
+            symbol=symbol,
+            qty=self.holdings.get(symbol, 0),
+            avg_price=self.avg_prices.get(symbol),
+        )
+
+    def _sync_ledger(self) -> LotLedger:
+        """Bring the lot ledger up to date with the trade history."""
+        if not self.ledger.sync(self.history):
+            trades = None
+            # trades trimmed from memory still hold lots, so replay the store
+            stored = self.store.count("trades", self.name) if self.store else 0
+            if stored > len(self.history):
+                trades = self.store.iter_trades(self.name)
+            self.ledger.rebuild(self.history, trades)
+        return self.ledger
+
+    def _record_trade(self, trade: Dict) -> None:
+        # realized PnL of sells is matched FIFO against open buy lots
+        self._sync_ledger().add(trade)
+        self.history.append(trade)
+        if self.store:
+            self.store.add_trade(self.name, trade)
+            _trim(self.history, HOT_TRADES)
+        self.touch("history", "holdings")
+        if self.trade_callback:
+            self.trade_callback(self, trade)
+
+    def _record_liquidation(self, responses) -> None:
+        """Record the closing orders of ``close_all_positions`` as trades.
+
+        Alpaca wraps each order in a ``ClosePositionResponse`` whose body is
+        the order or the failure details; failed closes are skipped.
+        """
+        for response in responses or []:
+            order = getattr(response, "body", response)
+            if not hasattr(order, "model_dump"):
+                continue
+            trade = order.model_dump()
+            side = getattr(trade.get("side"), "value", trade.get("side"))
+            symbol = trade.get("symbol")
+            if side not in ("buy", "sell") or not symbol:
+                continue
+            trade["side"] = side
+            trade["notes"] = ""
+            trade["tags"] = []
+            trade["source"] = "liquidation"
+            if trade.get("filled_avg_price") is None:
+                price = self.latest_price(symbol)
+                if price:
+                    trade["price"] = price
+            self.holdings.pop(symbol, None)
+            self.avg_prices.pop(symbol, None)
+            self._journal_holding(symbol)
+            self._record_trade(trade)
+            self._journal("trade", trade=trade)
+            self.log_event("trade", f"{side} {trade.get('qty')} {symbol} (liquidation)")
+
     def get_account_info(self):
         """Return basic account information as a dictionary."""
         try:
@@ -95,56 +390,109 @@ class Portfolio:
             info = account.model_dump()
             value = info.get("portfolio_value")
             if value is not None:
-                self.equity_curve.append(
-                    {"time": datetime.utcnow().isoformat(), "value": float(value)}
-                )
+                self._record_equity(float(value))
             return info
         except Exception as exc:
             logger.error("Failed to get account info for %s: %s", self.name, exc)
             return {}
 
-    def place_order(self, symbol: str, qty: float, side: str = "buy"):
+    def _book_order(
+        self,
+        order_dict: Dict,
+        symbol: str,
+        qty: float,
+        side: str,
+        source: str | None = None,
+        intent: int | None = None,
+    ) -> None:
+        """Update holdings for a submitted order and record it as a trade."""
+        order_dict["notes"] = ""
+        order_dict["tags"] = []
+        if source:
+            order_dict["source"] = source
+        if side.lower() == "buy":
+            self.holdings[symbol] = self.holdings.get(symbol, 0) + qty
+            price = self.latest_price(symbol)
+            if price:
+                order_dict["price"] = price
+                prev_qty = self.holdings.get(symbol, 0) - qty
+                if prev_qty > 0 and symbol in self.avg_prices:
+                    avg = (self.avg_prices[symbol] * prev_qty + price * qty) / (
+                        prev_qty + qty
+                    )
+                    self.avg_prices[symbol] = avg
+                else:
+                    self.avg_prices[symbol] = price
+        else:
+            # unfilled sells realize PnL against the quote at submission
+            price = self.latest_price(symbol)
+            if price:
+                order_dict["price"] = price
+            # partial sells keep the rest of the position
+            remaining = self.holdings.get(symbol, 0) - qty
+            if remaining > QTY_EPSILON:
+                self.holdings[symbol] = remaining
+            else:
+                self.holdings.pop(symbol, None)
+                self.avg_prices.pop(symbol, None)
+        self._journal_holding(symbol)
+        self.touch("holdings")
+        order_dict["decision_explainer"] = {
+            "prompt": self.last_prompt,
+            "research": self.last_research,
+            "response": self.last_response,
+        }
+        self._record_trade(order_dict)
+        self._journal("trade", intent=intent, trade=order_dict)
+        self.log_event("trade", f"{side} {qty} {symbol}")
+
+    def place_order(
+        self, symbol: str, qty: float, side: str = "buy", source: str | None = None
+    ):
         """Place a market order and store it in history."""
+        from alpaca.trading.enums import OrderSide, OrderType, TimeInForce
+        from alpaca.trading.requests import MarketOrderRequest
+
         side_enum = OrderSide.BUY if side.lower() == "buy" else OrderSide.SELL
+        # lets replay find the order at the broker if we crash before booking it
+        client_order_id = uuid.uuid4().hex
         order_data = MarketOrderRequest(
             symbol=symbol,
             qty=qty,
             side=side_enum,
             type=OrderType.MARKET,
             time_in_force=TimeInForce.DAY,
+            client_order_id=client_order_id,
+        )
+        intent = self._journal(
+            "intent",
+            symbol=symbol,
+            qty=qty,
+            side=side,
+            client_order_id=client_order_id,
         )
         try:
-            order = self.client.submit_order(order_data)
+            try:
+                order = self.client.submit_order(order_data)
+            except Exception as exc:
+                self._journal("rejected", intent=intent, error=str(exc))
+                raise
             order_dict = order.model_dump()
-            order_dict["notes"] = ""
-            order_dict["tags"] = []
-            if side.lower() == "buy":
-                self.holdings[symbol] = self.holdings.get(symbol, 0) + qty
-                price_info = get_latest_price(symbol)
-                price = price_info.get("value")
-                if price:
-                    prev_qty = self.holdings.get(symbol, 0) - qty
-                    if prev_qty > 0 and symbol in self.avg_prices:
-                        avg = (self.avg_prices[symbol] * prev_qty + price * qty) / (
-                            prev_qty + qty
-                        )
-                        self.avg_prices[symbol] = avg
-                    else:
-                        self.avg_prices[symbol] = price
-            else:
-                avg_price = self.avg_prices.get(symbol, 0)
-                filled = float(order_dict.get("filled_avg_price") or 0)
-                order_dict["pnl"] = (filled - avg_price) * qty
-                if symbol in self.holdings:
-                    self.holdings.pop(symbol, None)
-                    self.avg_prices.pop(symbol, None)
-            order_dict["decision_explainer"] = {
-                "prompt": self.last_prompt,
-                "research": self.last_research,
-                "response": self.last_response,
-            }
-            self.history.append(order_dict)
-            self.log_event("trade", f"{side} {qty} {symbol}")
+            self._journal(
+                "submitted",
+                intent=intent,
+                order_id=order_dict.get("id"),
+                status=order_dict.get("status"),
+            )
+            if order_dict.get("filled_avg_price") is not None:
+                self._journal(
+                    "fill",
+                    intent=intent,
+                    order_id=order_dict.get("id"),
+                    filled_qty=order_dict.get("filled_qty"),
+                    filled_avg_price=order_dict.get("filled_avg_price"),
+                )
+            self._book_order(order_dict, symbol, qty, side, source, intent)
 
             # check realized pnl against limit on sell orders
             if side.lower() == "sell" and "pnl" in order_dict:
@@ -154,32 +502,158 @@ class Portfolio:
                 if value > 0:
                     pnl_pct = abs(pnl) / value
                     if pnl_pct >= self.trade_pnl_limit_pct:
-                        alert = f"Trade PnL {pnl:.2f} exceeded limit"
-                        self.risk_alerts.append(alert)
-                        self.log_event("alert", alert)
+                        self.add_alert(f"Trade PnL {pnl:.2f} exceeded limit")
             return order
         except Exception as exc:
             logger.error("Order failed for %s: %s", self.name, exc)
             raise
 
+    def apply_decision(self, symbol: str, decision: str, sell: bool = True) -> None:
+        """Buy ``smart_allocation`` shares on a buy decision, close on a sell."""
+        decision = decision.lower()
+        if decision.startswith("buy"):
+            qty = self.smart_allocation(symbol)
+        elif sell and decision.startswith("sell"):
+            qty = self.holdings.get(symbol, 0)
+        else:
+            return
+        if qty <= 0:
+            return
+        try:
+            self.place_order(symbol, qty, "buy" if decision.startswith("buy") else "sell")
+        except Exception as exc:
+            logger.error("Failed to place order for %s: %s", self.name, exc)
+
+    def latest_price(self, symbol: str) -> Optional[float]:
+        """Return the latest price of ``symbol`` from ``price_source`` or quotes."""
+        if self.price_source is not None:
+            return self.price_source(symbol)
+        return get_latest_price(symbol).get("value")
+
     def smart_allocation(self, symbol: str) -> float:
         """Determine position size based on risk level and latest price."""
         info = self.get_account_info()
         cash = float(info.get("cash") or 0)
-        price_info = get_latest_price(symbol)
-        price = price_info.get("value", 0)
+        price = self.latest_price(symbol) or 0
         if price == 0:
             return 0.0
         allocation = cash * self.risk_level
         qty = allocation / price
         return round(max(qty, 0), 4)
 
+    def broker_positions(
+        self, max_age: float = POSITIONS_MAX_AGE
+    ) -> Optional[Dict[str, Dict]]:
+        """Return all broker positions by symbol from one ``get_all_positions`` call.
+
+        The result is reused for ``max_age`` seconds unless local holdings
+        change, and drift against ``holdings``/``avg_prices`` is stored in
+        ``position_drift``. Returns None if the broker call fails.
+        """
+        cached = self._positions_cache
+        if (
+            cached is not None
+            and time.monotonic() - cached[0] < max_age
+            and cached[1] == self.revision("holdings")
+        ):
+            return cached[2]
+        try:
+            raw = self.client.get_all_positions()
+        except Exception as exc:
+            logger.warning("Failed to fetch positions for %s: %s", self.name, exc)
+            return None
+        positions = {}
+        for pos in raw:
+            data = pos.model_dump() if hasattr(pos, "model_dump") else dict(pos)
+            positions[data["symbol"]] = {
+                "symbol": data["symbol"],
+                "qty": float(data.get("qty") or 0),
+                "price": float(data.get("current_price") or 0),
+                "avg_price": float(data.get("avg_entry_price") or 0),
+                "market_value": float(data.get("market_value") or 0),
+                "pnl": float(data.get("unrealized_pl") or 0),
+                "pnl_pct": float(data.get("unrealized_plpc") or 0),
+            }
+        self._positions_cache = (
+            time.monotonic(),
+            self.revision("holdings"),
+            positions,
+        )
+        drift = self._position_drift(positions)
+        if drift and drift != self.position_drift:
+            logger.warning("Position drift for %s: %s", self.name, drift)
+        self.position_drift = drift
+        return positions
+
+    def _position_drift(self, positions: Dict[str, Dict]) -> List[Dict]:
+        drift = []
+        for sym in sorted(set(self.holdings) | set(positions)):
+            broker = positions.get(sym)
+            local_qty = float(self.holdings.get(sym, 0))
+            broker_qty = broker["qty"] if broker else 0.0
+            local_avg = self.avg_prices.get(sym)
+            broker_avg = broker["avg_price"] if broker else None
+            avg_off = bool(
+                local_avg
+                and broker_avg
+                and abs(local_avg - broker_avg) > AVG_PRICE_TOLERANCE * broker_avg
+            )
+            if abs(local_qty - broker_qty) > QTY_EPSILON or avg_off:
+                drift.append(
+                    {
+                        "symbol": sym,
+                        "local_qty": local_qty,
+                        "broker_qty": broker_qty,
+                        "local_avg_price": local_avg,
+                        "broker_avg_price": broker_avg,
+                    }
+                )
+        return drift
+
+    def sync_positions(self, adopt: bool = False) -> Dict[str, List[Dict]]:
+        """Fetch broker positions now and report drift from local holdings.
+
+        With ``adopt`` the local holdings and average prices are replaced by
+        the broker's and journaled. Returns ``{"positions", "drift"}``.
+        """
+        positions = self.broker_positions(max_age=0)
+        if positions is None:
+            return {"positions": [], "drift": [], "error": "positions_unavailable"}
+        drift = self.position_drift
+        if adopt and drift:
+            for item in drift:
+                sym = item["symbol"]
+                broker = positions.get(sym)
+                if broker and broker["qty"]:
+                    self.holdings[sym] = broker["qty"]
+                    self.avg_prices[sym] = broker["avg_price"]
+                else:
+                    self.holdings.pop(sym, None)
+                    self.avg_prices.pop(sym, None)
+                self._journal_holding(sym)
+            self.touch("holdings")
+            self.log_event("sync", f"adopted broker positions for {len(drift)} symbols")
+            self.position_drift = []
+            self._positions_cache = (
+                time.monotonic(),
+                self.revision("holdings"),
+                positions,
+            )
+        return {"positions": list(positions.values()), "drift": drift}
+
     def get_positions(self) -> List[Dict]:
-        """Return a list of open positions with live PnL information."""
+        """Return a list of open positions with live PnL information.
+
+        Valuation comes from the broker's positions; per-symbol quotes are
+        only used when they cannot be fetched.
+        """
+        broker = self.broker_positions()
+        if broker is not None:
+            keys = ("symbol", "qty", "price", "avg_price", "pnl", "pnl_pct")
+            return [{k: pos[k] for k in keys} for pos in broker.values()]
         positions = []
         for sym, qty in self.holdings.items():
-            price_info = get_latest_price(sym)
-            price = price_info.get("value")
+            price = self.latest_price(sym)
             avg = self.avg_prices.get(sym, 0)
             if price is None or avg == 0:
                 continue
@@ -206,20 +680,98 @@ class Portfolio:
             logger.error("Failed to fetch orders for %s: %s", self.name, exc)
             return []
 
+    def reconcile_orders(self) -> Dict[str, List[str]]:
+        """Resolve orders the journal replay left in ``unconfirmed_orders``.
+
+        Each intent is looked up among the broker's orders by its
+        ``client_order_id`` (or the order id, if it was journaled). Orders
+        the broker has are booked like a placed order; intents it never
+        received or canceled without a fill are dropped. Both outcomes are
+        journaled so the next replay does not report them again. Entries
+        stay when the broker cannot be reached.
+        """
+        from alpaca.trading.enums import QueryOrderStatus
+        from alpaca.trading.requests import GetOrdersRequest
+
+        result: Dict[str, List[str]] = {"booked": [], "dropped": []}
+        if not self.unconfirmed_orders:
+            return result
+        times = [i["time"] for i in self.unconfirmed_orders.values() if i.get("time")]
+        after = None
+        if times:
+            # intents are journaled before submission; allow for clock skew
+            after = datetime.fromisoformat(min(times)) - timedelta(minutes=1)
+        try:
+            orders = self.client.get_orders(
+                GetOrdersRequest(status=QueryOrderStatus.ALL, after=after, limit=500)
+            )
+        except Exception as exc:
+            logger.error("Failed to reconcile orders for %s: %s", self.name, exc)
+            return result
+        known: Dict[str, Dict] = {}
+        for order in orders:
+            data = order.model_dump()
+            for key in ("client_order_id", "id"):
+                if data.get(key):
+                    known[str(data[key])] = data
+        for key, intent in list(self.unconfirmed_orders.items()):
+            order = known.get(str(intent.get("client_order_id"))) or known.get(
+                str(intent.get("order_id"))
+            )
+            status = _enum_value((order or {}).get("status"))
+            filled = float((order or {}).get("filled_qty") or 0)
+            symbol, qty = intent.get("symbol"), float(intent.get("qty") or 0)
+            if order is None or (status in DEAD_ORDER_STATUSES and not filled):
+                self._journal(
+                    "rejected", intent=int(key), error=f"not at broker ({status})"
+                )
+                result["dropped"].append(key)
+                logger.warning(
+                    "Dropped unconfirmed %s order for %s: %s %s",
+                    intent.get("side"),
+                    self.name,
+                    qty,
+                    symbol,
+                )
+            else:
+                if status in DEAD_ORDER_STATUSES:
+                    qty = filled
+                side = _enum_value(order.get("side")) or intent.get("side")
+                order["side"] = side
+                self._book_order(order, symbol, qty, side, "recovered", int(key))
+                result["booked"].append(key)
+            del self.unconfirmed_orders[key]
+        return result
+
     def refresh_open_orders(self) -> None:
         """Update cached list of open orders."""
         self.open_orders = self.get_orders(status="open")
 
-    def get_allocation(self) -> List[Dict]:
-        """Return current allocation including cash as percentage per asset."""
-        info = self.get_account_info()
+    def get_allocation(
+        self, info: Dict | None = None, prices: Dict[str, float] | None = None
+    ) -> List[Dict]:
+        """Return current allocation including cash as percentage per asset.
+
+        ``info`` may pass already fetched account information and ``prices``
+        already fetched quotes by symbol. Without ``prices`` position values
+        come from the broker, falling back to one quote per holding.
+        """
+        if info is None:
+            info = self.get_account_info()
         cash = float(info.get("cash") or 0)
         total_value = float(info.get("portfolio_value") or 0)
         holdings_data: List[Dict] = []
         total_positions = cash
-        for sym, qty in self.holdings.items():
-            price_info = get_latest_price(sym)
-            price = price_info.get("value")
+        broker = self.broker_positions() if prices is None else None
+        if broker is not None:
+            for sym, pos in broker.items():
+                total_positions += pos["market_value"]
+                holdings_data.append({"symbol": sym, "value": pos["market_value"]})
+        for sym, qty in self.holdings.items() if broker is None else ():
+            if prices is not None:
+                price = prices.get(sym)
+            else:
+                price = self.latest_price(sym)
             if price is None:
                 continue
             value = qty * price
@@ -240,51 +792,61 @@ class Portfolio:
         allocation.sort(key=lambda x: x["percent"], reverse=True)
         return allocation
 
+    def equity_series(self, start=None, end=None) -> TimeSeries:
+        """Return the equity curve covering ``start`` to ``end``.
+
+        With a store attached only recent points are kept in memory; a range
+        starting before them is read from the store.
+        """
+        curve = self.equity_curve
+        if (
+            self.store is None
+            or start is None
+            or (len(curve) and to_epoch(start) >= curve.times[0])
+        ):
+            return curve
+        series = TimeSeries(self.store.query_equity(self.name, start, end))
+        if curve.base is not None:
+            series.base = curve.base
+        return series
+
     def get_pnl_history(self, interval: str = "day") -> List[Dict]:
-        """Return PnL time series aggregated by interval."""
+        """Return PnL time series aggregated by interval (day, week or month).
+
+        Buckets keep the last equity value per period and only consume the
+        points recorded since the previous call.
+        """
         if not self.equity_curve:
             return []
         try:
-            import pandas as pd
-
-            df = pd.DataFrame(self.equity_curve)
-            df["time"] = pd.to_datetime(df["time"])
-            df = df.set_index("time")
-            rule = {"week": "W", "month": "M"}.get(interval, "D")
-            values = df["value"].resample(rule).last()
-            pnl = values.diff().fillna(0)
-            return [{"time": t.isoformat(), "pnl": float(v)} for t, v in pnl.items()]
+            self.pnl_buckets.sync(self.equity_curve)
+            return self.pnl_buckets.history(interval)
         except Exception as exc:
             logger.error("Failed to compute pnl history for %s: %s", self.name, exc)
             return []
 
     def get_top_flop_trades(self, limit: int = 5) -> Dict[str, List[Dict]]:
-        """Return lists of top and flop trades by PnL."""
-        sells = []
-        for trade in self.history:
-            if trade.get("side") == "sell":
-                pnl = trade.get("pnl")
-                if pnl is None:
-                    qty = float(trade.get("qty") or 0)
-                    filled = float(trade.get("filled_avg_price") or 0)
-                    symbol = trade.get("symbol")
-                    buy_avg = 0.0
-                    for t in self.history:
-                        if (
-                            t.get("side") == "buy"
-                            and t.get("symbol") == symbol
-                            and float(t.get("qty") or 0) == qty
-                        ):
-                            buy_avg = float(t.get("filled_avg_price") or 0)
-                            break
-                    pnl = (filled - buy_avg) * qty
-                sells.append({"symbol": trade.get("symbol"), "pnl": pnl})
-        if not sells:
-            return {"top": [], "flop": []}
-        sells.sort(key=lambda x: x["pnl"])
-        flop = sells[:limit]
-        top = sells[-limit:][::-1]
-        return {"top": top, "flop": flop}
+        """Return lists of top and flop trades by realized PnL.
+
+        ``limit`` is capped at the ledger's ranking size (``TOP_K``).
+        """
+        ledger = self._sync_ledger()
+        return {"top": ledger.top(limit), "flop": ledger.flop(limit)}
+
+    def get_performance(
+        self, benchmark: TimeSeries | None = None, info: Dict | None = None
+    ) -> Dict[str, Optional[float]]:
+        """Return Sharpe, Sortino, drawdown, beta/alpha, turnover and more.
+
+        Only equity points and trades added since the previous call are
+        processed; ``benchmark`` is the curve beta and alpha refer to.
+        """
+        try:
+            self.performance.sync(self.equity_curve, benchmark)
+            return self.performance.metrics(self._sync_ledger(), info)
+        except Exception as exc:
+            logger.error("Failed to compute performance for %s: %s", self.name, exc)
+            return {}
 
     def check_risk(
         self, account_value: float | None = None, simulate: bool = False
@@ -302,30 +864,30 @@ class Portfolio:
             return
         self.high_water = max(self.high_water, account_value)
         drawdown = (self.high_water - account_value) / self.high_water
-        if drawdown >= self.max_drawdown_pct:
-            alert = f"Max drawdown {drawdown:.2%} exceeded"
-            self.risk_alerts.append(alert)
-            self.log_event("alert", alert)
+        if drawdown < self.max_drawdown_pct:
+            self.drawdown_alerted = False
+        elif not self.drawdown_alerted:
+            # alert once per breach instead of on every step while exceeded
+            self.drawdown_alerted = True
+            self.add_alert(f"Max drawdown {drawdown:.2%} exceeded")
             if (
                 not simulate
                 and self.api_key
                 and "your_alpaca_api_key" not in self.api_key
             ):
                 try:
-                    self.client.close_all_positions(cancel_orders=True)
+                    closing = self.client.close_all_positions(cancel_orders=True)
+                    self._record_liquidation(closing)
                 except Exception as exc:
                     logger.error("Failed to close positions for %s: %s", self.name, exc)
         for symbol, qty in list(self.holdings.items()):
-            price_info = get_latest_price(symbol)
-            price = price_info.get("value")
+            price = self.latest_price(symbol)
             avg = self.avg_prices.get(symbol)
             if not price or not avg:
                 continue
             change = (price - avg) / avg
             if change <= -self.stop_loss_pct:
-                alert = f"Stop-loss triggered for {symbol}"
-                self.risk_alerts.append(alert)
-                self.log_event("alert", alert)
+                self.add_alert(f"Stop-loss triggered for {symbol}")
                 if not simulate:
                     try:
                         self.place_order(symbol, qty, "sell")
@@ -335,10 +897,10 @@ class Portfolio:
                         )
                 self.holdings.pop(symbol, None)
                 self.avg_prices.pop(symbol, None)
+                self._journal_holding(symbol)
+                self.touch("holdings")
             elif change >= self.take_profit_pct:
-                alert = f"Take-profit triggered for {symbol}"
-                self.risk_alerts.append(alert)
-                self.log_event("alert", alert)
+                self.add_alert(f"Take-profit triggered for {symbol}")
                 if not simulate:
                     try:
                         self.place_order(symbol, qty, "sell")
@@ -348,6 +910,8 @@ class Portfolio:
                         )
                 self.holdings.pop(symbol, None)
                 self.avg_prices.pop(symbol, None)
+                self._journal_holding(symbol)
+                self.touch("holdings")
 
     def find_trade(self, trade_id: str) -> Optional[Dict]:
         """Return trade dictionary matching id or None."""
@@ -355,33 +919,58 @@ class Portfolio:
             tid = str(trade.get("id") or trade.get("client_order_id"))
             if tid == trade_id:
                 return trade
+        if self.store:
+            return self.store.get_trade(self.name, trade_id)
         return None
 
-    def set_trade_notes(self, trade_id: str, notes: str) -> bool:
-        """Set notes for a given trade."""
-        trade = self.find_trade(trade_id)
+    def set_trade_notes(
+        self, trade_id: str, notes: str, trade: Dict | None = None
+    ) -> bool:
+        """Set notes for a given trade (``trade`` skips the id lookup)."""
+        trade = trade or self.find_trade(trade_id)
         if not trade:
             return False
         trade["notes"] = notes
+        self.touch("history")
+        if self.store:
+            self.store.update_trade(self.name, trade)
         return True
 
-    def set_trade_tags(self, trade_id: str, tags: List[str]) -> bool:
-        """Set tags list for a trade."""
-        trade = self.find_trade(trade_id)
+    def set_trade_tags(
+        self, trade_id: str, tags: List[str], trade: Dict | None = None
+    ) -> bool:
+        """Set tags list for a trade (``trade`` skips the id lookup)."""
+        trade = trade or self.find_trade(trade_id)
         if not trade:
             return False
         trade["tags"] = tags
+        self.touch("history")
+        if self.store:
+            self.store.update_trade(self.name, trade)
         return True
 
 
+def _trim(items: List, limit: int) -> None:
+    """Drop the oldest entries once a list grows a quarter beyond ``limit``."""
+    if len(items) > limit + limit // 4:
+        del items[: len(items) - limit]
+
+
 def get_strategy_from_openai(
-    portfolio: Portfolio, research: dict, strategy_type: str = "default"
+    portfolio: Portfolio,
+    research: dict,
+    strategy_type: str = "default",
+    account: Dict | None = None,
 ) -> str:
-    """Return a trading instruction string from OpenAI."""
-    if not openai.api_key or "your_openai_api_key" in openai.api_key:
+    """Return a trading instruction string from OpenAI.
+
+    ``account`` is shown to the model instead of the broker's account info.
+    """
+    if not OPENAI_API_KEY or "your_openai_api_key" in OPENAI_API_KEY:
         return f"no_api_key_for_{strategy_type}"
 
-    account = portfolio.get_account_info()
+    if account is None:
+        account = portfolio.get_account_info()
     if portfolio.custom_prompt:
         try:
             prompt = portfolio.custom_prompt.format(
@@ -404,8 +993,10 @@ def get_strategy_from_openai(
     portfolio.last_prompt = prompt
     portfolio.last_research = research
     portfolio.log_event("prompt", prompt)
+    import openai
+
     try:
-        client = openai.OpenAI(api_key=openai.api_key)
+        client = openai.OpenAI(api_key=OPENAI_API_KEY)
         resp = client.chat.completions.create(
             model="gpt-4.1-mini",
             messages=[{"role": "user", "content": prompt}],
@@ -435,7 +1026,15 @@ class MultiPortfolioManager:
     ):
         self.portfolios: List[Portfolio] = portfolios or []
         self.benchmark_symbol = benchmark_symbol
-        self.benchmark_curve: List[Dict] = []
+        self.benchmark_curve = TimeSeries()
+        self.store: Optional[TradeStore] = None
+        self.trade_index = TradeIndex()
+        self.journal: Optional[OrderJournal] = None
+        self.config_store: Optional[ConfigStore] = None
+        # dashboard/export snapshot cache shared through ``snapshot_cache_for``
+        self.snapshot_cache = None
+        for p in self.portfolios:
+            self._register(p)
 
     # --- Persistence helpers -------------------------------------------------
     def load_from_file(self, path: str | Path) -> None:
@@ -447,38 +1046,69 @@ class MultiPortfolioManager:
             data = json.loads(file_path.read_text())
         except Exception:
             return
+        self._load_entries(data)
 
+    def _load_entries(self, data: List[Dict]) -> None:
         self.portfolios = []
         for item in data:
             try:
-                p = Portfolio(
-                    item.get("name"),
-                    item.get("api_key", ""),
-                    item.get("secret_key", ""),
-                    item.get("base_url", ENV.get("ALPACA_BASE_URL")),
-                    item.get("strategy_type", "default"),
-                    item.get("custom_prompt", ""),
-                )
-                self.add_portfolio(p)
+                self.add_portfolio(Portfolio.from_config(item))
             except Exception:
                 continue
 
     def save_to_file(self, path: str | Path) -> None:
-        """Persist portfolio definitions (name + strategy) to JSON file."""
+        """Persist portfolio settings to JSON file."""
         file_path = Path(path)
-        data = [
-            {
-                "name": p.name,
-                "strategy_type": p.strategy_type,
-                "custom_prompt": p.custom_prompt,
-                "api_key": p.api_key,
-                "secret_key": p.secret_key,
-                "base_url": p.base_url,
-            }
-            for p in self.portfolios
-        ]
+        data = [p.to_config() for p in self.portfolios]
         file_path.write_text(json.dumps(data, indent=2))
 
+    def attach_config_store(self, config_store: ConfigStore) -> None:
+        """Load portfolios from ``config_store`` and persist changes through it."""
+        self._load_entries(config_store.load())
+        config_store.bind(lambda: [p.to_config() for p in list(self.portfolios)])
+        self.config_store = config_store
+
+    def mark_dirty(self) -> None:
+        """Schedule persisting the portfolio configuration."""
+        if self.config_store:
+            self.config_store.mark_dirty()
+
+    def attach_store(self, store: TradeStore) -> None:
+        """Persist all portfolios to ``store`` and restore their recent state.
+
+        The current in-memory state is migrated first so nothing recorded
+        before the store was attached is lost.
+        """
+        self.store = store
+        for p in self.portfolios:
+            self._attach(p)
+            self.trade_index.rebuild(p)
+
+    def attach_journal(self, journal: OrderJournal) -> None:
+        """Replay ``journal`` into the portfolios and journal all new orders.
+
+        Holdings, average prices and history are rebuilt from the latest
+        snapshot plus the records written after it. Orders whose outcome
+        was not journaled before a crash are then reconciled with the broker.
+        """
+        applied = journal.replay(self.portfolios)
+        logger.info("Replayed %d journal records", applied)
+        self.journal = journal
+        journal.bind(lambda: list(self.portfolios))
+        for p in self.portfolios:
+            p.journal = journal
+            if p.unconfirmed_orders:
+                result = p.reconcile_orders()
+                logger.info("Reconciled orders of %s: %s", p.name, result)
+            self.trade_index.rebuild(p)
+
+    def _attach(self, portfolio: Portfolio) -> None:
+        if not self.store or portfolio.store is self.store:
+            return
+        self.store.migrate_portfolio(portfolio)
+        self.store.load_hot_set(portfolio)
+        portfolio.store = self.store
+
     # -------------------------------------------------------------------------
 
     def add_portfolio(self, portfolio: Portfolio) -> None:
@@ -493,11 +1123,42 @@ class MultiPortfolioManager:
         for p in self.portfolios:
             if p.api_key == portfolio.api_key and p.secret_key == portfolio.secret_key:
                 raise ValueError("duplicate_api_credentials")
+        self._attach(portfolio)
+        if self.journal:
+            portfolio.journal = self.journal
         self.portfolios.append(portfolio)
+        self._register(portfolio)
 
     def remove_portfolio(self, name: str) -> None:
         """Remove a portfolio by name."""
         self.portfolios = [p for p in self.portfolios if p.name != name]
+        self.trade_index.sync(self.portfolios)
+
+    # --- Trade lookup --------------------------------------------------------
+    def _register(self, portfolio: Portfolio) -> None:
+        portfolio.trade_callback = self.trade_index.add
+        self.trade_index.rebuild(portfolio)
+
+    def find_trade(self, trade_id: str):
+        """Return ``(portfolio, trade)`` for a trade id or ``(None, None)``."""
+        self.trade_index.sync(self.portfolios)
+        portfolio, trade = self.trade_index.get(trade_id)
+        if trade is not None:
+            return portfolio, trade
+        # trades trimmed from memory are still available in the store
+        if self.store:
+            name, trade = self.store.find_trade(trade_id)
+            for p in self.portfolios:
+                if p.name == name:
+                    return p, trade
+        return None, None
+
+    def filter_trades(
+        self, portfolio: Portfolio, symbol: str | None = None, side: str | None = None
+    ) -> List[Dict]:
+        """Return in-memory trades of a portfolio filtered by symbol and side."""
+        self.trade_index.sync(self.portfolios)
+        return self.trade_index.filter(portfolio, symbol, side)
 
     # --- Benchmark helpers ---------------------------------------------------
     def update_benchmark(self) -> None:
@@ -506,11 +1167,18 @@ class MultiPortfolioManager:
         if data:
             self.benchmark_curve.append(data)
 
-    def get_normalized_benchmark(self) -> List[Dict]:
-        return normalize_curve(self.benchmark_curve)
+    def get_normalized_benchmark(
+        self, points: int | None = None, start=None, end=None
+    ) -> List[Dict]:
+        """Return the benchmark normalized to 100, downsampled to ``points``."""
+        return self.benchmark_curve.downsample(points, start, end, normalize=True)
 
-    def get_normalized_equity(self, portfolio: Portfolio) -> List[Dict]:
-        return normalize_curve(portfolio.equity_curve)
+    def get_normalized_equity(
+        self, portfolio: Portfolio, points: int | None = None, start=None, end=None
+    ) -> List[Dict]:
+        """Return the equity curve normalized to 100, downsampled to ``points``."""
+        series = portfolio.equity_series(start, end)
+        return series.downsample(points, start, end, normalize=True)
 
     def step_all(self, symbols: Union[str, Sequence[str], None] = None):
         """Get research and ask OpenAI for trade decisions for each portfolio."""
@@ -529,24 +1197,7 @@ class MultiPortfolioManager:
                 decision = get_strategy_from_openai(p, research, p.strategy_type)
                 p.log_event("decision", decision)
                 logger.info("%s decision %s", p.name, decision)
-                if decision.lower().startswith("buy"):
-                    qty = p.smart_allocation(symbol)
-                    if qty > 0:
-                        try:
-                            p.place_order(symbol, qty, "buy")
-                        except Exception as exc:
-                            logger.error(
-                                "Failed to place order for %s: %s", p.name, exc
-                            )
-                elif decision.lower().startswith("sell"):
-                    qty = p.holdings.get(symbol, 0)
-                    if qty > 0:
-                        try:
-                            p.place_order(symbol, qty, "sell")
-                        except Exception as exc:
-                            logger.error(
-                                "Failed to place order for %s: %s", p.name, exc
-                            )
+                p.apply_decision(symbol, decision)
                 # record latest account value
                 try:
                     info = p.get_account_info()
@@ -573,13 +1224,7 @@ class MultiPortfolioManager:
                 decision = get_strategy_from_openai(p, research, p.strategy_type)
                 p.log_event("decision", decision)
                 logger.info("%s decision %s", p.name, decision)
-                if decision.lower().startswith("buy"):
-                    qty = p.smart_allocation(symbol)
-                    if qty > 0:
-                        try:
-                            p.place_order(symbol, qty, "buy")
-                        except Exception as exc:
-                            logger.error("Failed to place order for %s: %s", p.name, exc)
+                p.apply_decision(symbol, decision, sell=False)
                 try:
                     info = p.get_account_info()
                     value = info.get("portfolio_value")
@@ -0,0 +1,246 @@
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .logger import get_logger
+from .reporting import (
+    calculate_stats,
+    dashboard_snapshot,
+    pdf_sections,
+    render_dashboard_pdf,
+    write_report_csv,
+)
+from .snapshot_cache import snapshot_cache_for
+
+logger = get_logger(__name__)
+
+# report kinds: file name suffix, renderer, the portfolio revision and
+# snapshot cache sections their content depends on and whether rendering is
+# expensive enough for a worker process
+REPORT_KINDS: Dict[
+    str, Tuple[str, Callable, Tuple[str, ...], Tuple[str, ...], bool]
+] = {
+    "report": ("report.csv", write_report_csv, ("history", "equity"), (), False),
+    "pdf": (
+        "dashboard.pdf",
+        render_dashboard_pdf,
+        ("holdings", "history", "equity", "alerts", "config"),
+        ("account", "orders", "positions", "allocation", "diversification"),
+        True,
+    ),
+}
+# attempts to collect report data without its version changing meanwhile
+CONSISTENT_READ_ATTEMPTS = 3
+# finished jobs kept for status and download requests
+MAX_JOBS = 20
+
+
+class ReportBuilder:
+    """Render reports of many portfolios in a process pool and cache them.
+
+    Portfolio data is collected in the calling process (broker calls run in
+    threads) and reduced to plain values; layout and file writing run in
+    worker processes when there is more than one CPU. ``warm`` starts the
+    workers ahead of the first build. A rendered file is reused until a
+    portfolio revision, snapshot cache section or the benchmark it depends
+    on changes. ``start_job`` builds in the background and records the
+    resulting files for download.
+    """
+
+    def __init__(
+        self,
+        manager,
+        output_dir: str | Path = "reports",
+        workers: Optional[int] = None,
+    ):
+        self.manager = manager
+        self.output_dir = Path(output_dir)
+        self.workers = workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cache: Dict[Tuple[str, str], Tuple[Tuple, Path]] = {}
+        self._jobs: Dict[str, Dict] = {}
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.rendered = 0
+        self.cached = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a process with running server threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def warm(self) -> None:
+        """Start the worker processes now so the first build does not wait."""
+        if self.workers < 2:
+            return
+        executor = self._executor()
+        for _ in range(self.workers):
+            executor.submit(_warm_worker)
+
+    def _version(self, p, kind: str) -> Tuple:
+        _, _, sections, cached, _ = REPORT_KINDS[kind]
+        cache = snapshot_cache_for(self.manager)
+        return (
+            id(p),
+            p.revision(*sections),
+            cache.benchmark_key(),
+            *(cache.version(p, section) for section in cached),
+        )
+
+    def _collect(self, p, kind: str, fresh: bool) -> Tuple[Tuple, Tuple]:
+        # the version is read before the data, so a change landing meanwhile
+        # causes another render later rather than a stale cache entry
+        for _ in range(CONSISTENT_READ_ATTEMPTS):
+            version = self._version(p, kind)
+            payload = self._payload(p, kind, fresh)
+            fresh = False
+            if self._version(p, kind) == version:
+                break
+        return version, payload
+
+    def _payload(self, p, kind: str, fresh: bool = False) -> Tuple:
+        if kind == "report":
+            return (p.name, calculate_stats(p, self.manager.benchmark_curve))
+        return (p.name, pdf_sections(dashboard_snapshot(p, self.manager, fresh)))
+
+    def path(self, name: str, kind: str) -> Path:
+        return self.output_dir / f"{name}_{REPORT_KINDS[kind][0]}"
+
+    def build(
+        self, portfolios: Sequence, kind: str = "report", fresh: bool = False
+    ) -> List[Path]:
+        """Return report files for ``portfolios``, rendering outdated ones.
+
+        ``fresh`` re-renders from freshly fetched broker data.
+        """
+        if kind not in REPORT_KINDS:
+            raise ValueError("unknown report kind")
+        _, render, _, _, in_pool = REPORT_KINDS[kind]
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        paths: Dict[str, Path] = {}
+        todo = []
+        for p in portfolios:
+            version = self._version(p, kind)
+            with self._lock:
+                cached = self._cache.get((p.name, kind))
+            if not fresh and cached and cached[0] == version and cached[1].exists():
+                paths[p.name] = cached[1]
+                self.cached += 1
+            else:
+                todo.append(p)
+        if todo:
+            workers = max(1, min(8, len(todo)))
+            with ThreadPoolExecutor(workers, thread_name_prefix="report-data") as pool:
+                collected = list(
+                    pool.map(lambda p: self._collect(p, kind, fresh), todo)
+                )
+            if not in_pool or len(todo) == 1 or self.workers < 2:
+                # cheap or single reports are not worth the round trip to a
+                # worker, and with one CPU a worker cannot render in parallel
+                futures = [
+                    _run_inline(render, name, data, self.path(name, kind))
+                    for _, (name, data) in collected
+                ]
+            else:
+                executor = self._executor()
+                futures = [
+                    executor.submit(render, name, data, self.path(name, kind))
+                    for _, (name, data) in collected
+                ]
+            for p, (version, _), future in zip(todo, collected, futures):
+                try:
+                    path = future.result()
+                except Exception as exc:
+                    logger.error("Failed to render %s for %s: %s", kind, p.name, exc)
+                    continue
+                with self._lock:
+                    self._cache[(p.name, kind)] = (version, path)
+                paths[p.name] = path
+                self.rendered += 1
+        return [paths[p.name] for p in portfolios if p.name in paths]
+
+    # --- Background jobs -------------------------------------------------
+    def start_job(self, names: Sequence[str] | None = None, kind: str = "report") -> str:
+        """Build reports of the named (or all) portfolios in the background."""
+        if kind not in REPORT_KINDS:
+            raise ValueError("unknown report kind")
+        portfolios = [
+            p for p in list(self.manager.portfolios) if not names or p.name in names
+        ]
+        job_id = str(next(self._job_ids))
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "status": "running",
+            "total": len(portfolios),
+            "files": [],
+            "started": time.time(),
+            "finished": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            for old in list(self._jobs)[:-MAX_JOBS]:
+                del self._jobs[old]
+        threading.Thread(
+            target=self._run_job,
+            args=(job, portfolios),
+            name=f"report-job-{job_id}",
+            daemon=True,
+        ).start()
+        return job_id
+
+    def _run_job(self, job: Dict, portfolios) -> None:
+        try:
+            paths = self.build(portfolios, job["kind"])
+            job["files"] = [path.name for path in paths]
+            job["status"] = "done"
+        except Exception as exc:
+            logger.error("Report job %s failed: %s", job["id"], exc)
+            job["status"] = "failed"
+            job["error"] = str(exc)
+        job["finished"] = time.time()
+
+    def job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def file(self, filename: str) -> Optional[Path]:
+        """Return a rendered file by name if this builder produced it."""
+        with self._lock:
+            entries = list(self._cache.values())
+        for _, path in entries:
+            if path.name == filename and path.exists():
+                return path
+        return None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+def _warm_worker() -> int:
+    # importing the renderer is most of a worker's start-up cost
+    import fpdf  # noqa: F401
+
+    return os.getpid()
+
+
+def _run_inline(fn, *args) -> Future:
+    future: Future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
@@ -1,50 +1,206 @@
 import csv
+import io
 import json
+import zipfile
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any
-
-from fpdf import FPDF
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional
 
 from .portfolio_manager import Portfolio, MultiPortfolioManager
-from .diversification import analyze_portfolio
+from .snapshot_cache import snapshot_cache_for
+
+# CSV columns of exported trades; all other keys go to the "extra" column
+TRADE_COLUMNS = [
+    "id",
+    "client_order_id",
+    "symbol",
+    "side",
+    "qty",
+    "filled_qty",
+    "price",
+    "filled_avg_price",
+    "pnl",
+    "status",
+    "order_type",
+    "time_in_force",
+    "created_at",
+    "submitted_at",
+    "filled_at",
+    "source",
+    "notes",
+    "tags",
+    "extra",
+]
+# rows written between two chunks of a streamed export
+EXPORT_CHUNK_ROWS = 500
+
+
+def _trade_time(trade: Dict) -> str:
+    value = trade.get("submitted_at") or trade.get("created_at") or ""
+    return str(value).replace(" ", "T")
+
+
+def _cell(value) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def iter_trades(
+    portfolio: Portfolio,
+    start: str | None = None,
+    end: str | None = None,
+    symbols: Collection[str] | None = None,
+) -> Iterator[Dict]:
+    """Yield trades of ``portfolio`` oldest first, optionally filtered.
+
+    ``start`` and ``end`` are inclusive ISO dates or timestamps compared
+    with the trade's submission time. Trades are read from the store when
+    one is attached, so trades trimmed from memory are included.
+    """
+    if portfolio.store is not None:
+        trades: Iterable[Dict] = portfolio.store.iter_trades(portfolio.name)
+    else:
+        trades = list(portfolio.history)
+    wanted = {s.upper() for s in symbols} if symbols else None
+    for trade in trades:
+        if wanted is not None and str(trade.get("symbol") or "").upper() not in wanted:
+            continue
+        if start or end:
+            when = _trade_time(trade)
+            if start and when[: len(start)] < start:
+                continue
+            if end and when[: len(end)] > end:
+                continue
+        yield trade
+
+
+def trade_row(trade: Dict) -> List:
+    """Return the ``TRADE_COLUMNS`` values of a trade."""
+    extra = {k: v for k, v in trade.items() if k not in TRADE_COLUMNS}
+    row = [_cell(trade.get(col)) for col in TRADE_COLUMNS[:-1]]
+    row.append(json.dumps(extra, default=str) if extra else "")
+    return row
+
+
+def stream_trades_csv(trades: Iterable[Dict]) -> Iterator[str]:
+    """Yield a CSV document of ``trades`` in chunks of ``EXPORT_CHUNK_ROWS``."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(TRADE_COLUMNS)
+    for i, trade in enumerate(trades, 1):
+        writer.writerow(trade_row(trade))
+        if i % EXPORT_CHUNK_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable sink collecting what a ``ZipFile`` writes until drained."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_trades_zip(
+    portfolios: List[Portfolio],
+    start: str | None = None,
+    end: str | None = None,
+    symbols: Collection[str] | None = None,
+) -> Iterator[bytes]:
+    """Yield a zip archive with one ``<name>_trades.csv`` per portfolio.
 
+    The archive is produced while it is sent; nothing is written to disk.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for p in portfolios:
+            with archive.open(f"{p.name}_trades.csv", "w") as entry:
+                for chunk in stream_trades_csv(iter_trades(p, start, end, symbols)):
+                    entry.write(chunk.encode())
+                    data = sink.drain()
+                    if data:
+                        yield data
+    yield sink.drain()
 
-def export_trades_csv(portfolios: List[Portfolio], output_dir: str | Path = "reports") -> List[Path]:
+
+def export_trades_csv(
+    portfolios: List[Portfolio],
+    output_dir: str | Path = "reports",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    symbols: Collection[str] | None = None,
+) -> List[Path]:
     """Export trade history of each portfolio to a CSV file."""
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     paths: List[Path] = []
     for p in portfolios:
-        if not p.history:
+        if not p.history and p.store is None:
             continue
         file_path = output_dir / f"{p.name}_trades.csv"
         with file_path.open("w", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=p.history[0].keys())
-            writer.writeheader()
-            for item in p.history:
-                writer.writerow(item)
+            for chunk in stream_trades_csv(iter_trades(p, start, end, symbols)):
+                f.write(chunk)
         paths.append(file_path)
     return paths
 
 
-def calculate_stats(portfolio: Portfolio) -> dict:
-    """Return simple performance statistics for a portfolio."""
+# performance metrics added as report columns after profit and winrate
+REPORT_METRICS = [
+    "total_return",
+    "volatility",
+    "sharpe",
+    "sortino",
+    "max_drawdown",
+    "beta",
+    "alpha",
+    "turnover",
+    "exposure",
+]
+
+
+def calculate_stats(portfolio: Portfolio, benchmark=None) -> dict:
+    """Return profit, winrate and performance metrics for a portfolio.
+
+    The winrate is the share of sells closing FIFO lots at a profit.
+    """
     profit = 0.0
     if portfolio.equity_curve:
         profit = portfolio.equity_curve[-1]["value"] - portfolio.equity_curve[0]["value"]
-    wins = 0
-    trades = 0
-    for order in portfolio.history:
-        if order.get("side", "").lower() == "sell":
-            trades += 1
-            filled = float(order.get("filled_avg_price") or 0)
-            symbol = order.get("symbol")
-            avg = portfolio.avg_prices.get(symbol)
-            if avg and filled > avg:
-                wins += 1
-    winrate = (wins / trades * 100) if trades else 0.0
-    return {"profit": profit, "winrate": winrate}
+    metrics = portfolio.get_performance(benchmark)
+    stats = {"profit": profit, "winrate": metrics.get("winrate") or 0.0}
+    stats.update({key: metrics.get(key) for key in REPORT_METRICS})
+    return stats
+
+
+def write_report_csv(name: str, stats: Dict[str, Any], file_path: Path) -> Path:
+    """Write the profit/winrate and metrics report of one portfolio."""
+    metrics = [stats.get(key) for key in REPORT_METRICS]
+    with Path(file_path).open("w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["portfolio", "profit", "winrate", *REPORT_METRICS])
+        writer.writerow(
+            [name, f"{stats['profit']:.2f}", f"{stats['winrate']:.2f}"]
+            + ["" if value is None else f"{value:.4f}" for value in metrics]
+        )
+    return Path(file_path)
 
 
 def generate_reports(portfolios: List[Portfolio], output_dir: str | Path = "reports") -> List[Path]:
@@ -54,46 +210,57 @@ def generate_reports(portfolios: List[Portfolio], output_dir: str | Path = "repo
     paths: List[Path] = []
     for p in portfolios:
         stats = calculate_stats(p)
-        file_path = output_dir / f"{p.name}_report.csv"
-        with file_path.open("w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(["portfolio", "profit", "winrate"])
-            writer.writerow([p.name, f"{stats['profit']:.2f}", f"{stats['winrate']:.2f}"])
-        paths.append(file_path)
+        paths.append(write_report_csv(p.name, stats, output_dir / f"{p.name}_report.csv"))
     return paths
 
 
-def dashboard_snapshot(portfolio: Portfolio, manager: MultiPortfolioManager) -> Dict[str, Any]:
-    """Return a data dictionary similar to the dashboard view."""
-    manager.update_benchmark()
-    bench = manager.get_normalized_benchmark()
-    info = portfolio.get_account_info()
-    portfolio.refresh_open_orders()
-    divers = analyze_portfolio(portfolio)
-    portfolio.correlation_matrix = divers["matrix"]
-    portfolio.diversification_score = divers["score"]
-    portfolio.diversification_warnings = divers["warnings"]
-    return {
-        "name": portfolio.name,
-        "cash": info.get("cash"),
-        "portfolio_value": info.get("portfolio_value"),
-        "positions": portfolio.get_positions(),
-        "history": portfolio.history,
-        "open_orders": portfolio.open_orders,
-        "allocation": portfolio.get_allocation(),
-        "equity": portfolio.equity_curve,
-        "equity_norm": manager.get_normalized_equity(portfolio),
-        "benchmark": bench,
-        "strategy_type": portfolio.strategy_type,
-        "custom_prompt": portfolio.custom_prompt,
-        "risk_alerts": portfolio.risk_alerts,
-        "stop_loss_pct": portfolio.stop_loss_pct,
-        "take_profit_pct": portfolio.take_profit_pct,
-        "max_drawdown_pct": portfolio.max_drawdown_pct,
-        "trade_pnl_limit_pct": portfolio.trade_pnl_limit_pct,
-        "diversification_score": portfolio.diversification_score,
-        "correlation": portfolio.correlation_matrix,
-    }
+def dashboard_snapshot(
+    portfolio: Portfolio, manager: MultiPortfolioManager, fresh: bool = False
+) -> Dict[str, Any]:
+    """Return a data dictionary similar to the dashboard view.
+
+    Sections come from the snapshot cache shared with the dashboard, so an
+    export does not refetch the account, orders or benchmark unless
+    ``fresh`` is set. History, equity, the normalized curves and risk
+    alerts are included in full rather than trimmed for the dashboard.
+    """
+    cache = snapshot_cache_for(manager)
+    data = cache.portfolio(portfolio, fresh=fresh)
+    # full lists come from memory; keep them at the revision of the sections
+    if portfolio.revision() != data["revision"]:
+        data = cache.portfolio(portfolio)
+    data["history"] = list(portfolio.history)
+    data["equity"] = list(portfolio.equity_curve)
+    data["equity_norm"] = manager.get_normalized_equity(portfolio)
+    data["benchmark"] = manager.get_normalized_benchmark()
+    data["risk_alerts"] = list(portfolio.risk_alerts)
+    return data
+
+
+def pdf_sections(data: Dict[str, Any], limit: int = 1000) -> Dict[str, str]:
+    """Return the text printed per dashboard section in the PDF export."""
+    return {key: json.dumps(val, default=str)[:limit] for key, val in data.items()}
+
+
+def render_dashboard_pdf(name: str, sections: Dict[str, str], file_path: Path) -> Path:
+    """Lay out the dashboard PDF from ``pdf_sections`` text.
+
+    Only takes plain data so it can run in a worker process.
+    """
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.cell(0, 10, f"Dashboard Export: {name}", ln=True)
+    for key, txt in sections.items():
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(0, 10, key, ln=True)
+        pdf.set_font("Arial", size=10)
+        for line in txt.splitlines():
+            pdf.multi_cell(0, 5, line)
+    pdf.output(str(file_path))
+    return Path(file_path)
 
 
 def export_dashboard_data(
@@ -101,9 +268,10 @@ def export_dashboard_data(
     manager: MultiPortfolioManager,
     fmt: str = "json",
     output_dir: str | Path = "reports",
+    fresh: bool = False,
 ) -> Path | Dict[str, Any]:
     """Export dashboard data in the given format and return path or dict."""
-    data = dashboard_snapshot(portfolio, manager)
+    data = dashboard_snapshot(portfolio, manager, fresh)
     if fmt == "json":
         return data
 
@@ -118,17 +286,5 @@ def export_dashboard_data(
         return file_path
     if fmt == "pdf":
         file_path = output_dir / f"{portfolio.name}_dashboard.pdf"
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.cell(0, 10, f"Dashboard Export: {portfolio.name}", ln=True)
-        for key, val in data.items():
-            pdf.set_font("Arial", "B", 12)
-            pdf.cell(0, 10, key, ln=True)
-            pdf.set_font("Arial", size=10)
-            txt = json.dumps(val, default=str)[:1000]
-            for line in txt.splitlines():
-                pdf.multi_cell(0, 5, line)
-        pdf.output(str(file_path))
-        return file_path
+        return render_dashboard_pdf(portfolio.name, pdf_sections(data), file_path)
     raise ValueError("unknown format")
@@ -1,7 +1,5 @@
 import os
 import requests
-import openai
-from textblob import TextBlob
 
 from .config import load_env
 from .logger import get_logger
@@ -12,7 +10,7 @@ logger = get_logger(__name__)
 ENV = load_env()
 FINNHUB_API_KEY = ENV.get("FINNHUB_API_KEY")
 NEWS_API_KEY = ENV.get("NEWS_API_KEY")
-openai.api_key = ENV.get("OPENAI_API_KEY")
+OPENAI_API_KEY = ENV.get("OPENAI_API_KEY")
 TRENDING_SOURCE = ENV.get("TRENDING_SOURCE", "yahoo").lower()
 
 
@@ -69,6 +67,8 @@ def analyze_sentiment(news_items: list) -> float:
     """Very basic sentiment score based on news headlines."""
     if not news_items:
         return 0.0
+    from textblob import TextBlob
+
     scores = []
     for item in news_items:
         text = item.get("headline") or item.get("title") or ""
@@ -92,7 +92,7 @@ def get_research(symbol: str) -> dict:
 
 def select_research_topics(symbol: str) -> list[str]:
     """Use OpenAI to determine which research types to fetch."""
-    if not openai.api_key or "your_openai_api_key" in openai.api_key:
+    if not OPENAI_API_KEY or "your_openai_api_key" in OPENAI_API_KEY:
         return ["fundamentals", "news", "sentiment"]
     prompt = (
         "For analyzing the stock {symbol}, which of the following research types "
@@ -100,7 +100,9 @@ def select_research_topics(symbol: str) -> list[str]:
         "Respond with a comma separated list of the chosen types only."
     ).format(symbol=symbol)
     try:
-        client = openai.OpenAI(api_key=openai.api_key)
+        import openai
+
+        client = openai.OpenAI(api_key=OPENAI_API_KEY)
         resp = client.chat.completions.create(
             model="gpt-4.1-mini",
             messages=[{"role": "user", "content": prompt}],
@@ -147,7 +149,9 @@ def _get_trending_from_openai(limit: int) -> list[str]:
         "with high trading volume and media coverage. Respond with a comma "
         "separated list of tickers only."
     )
-    client = openai.OpenAI(api_key=openai.api_key)
+    import openai
+
+    client = openai.OpenAI(api_key=OPENAI_API_KEY)
     resp = client.chat.completions.create(
         model="gpt-4.1-mini",
         messages=[{"role": "user", "content": prompt}],
@@ -161,7 +165,7 @@ def get_trending_symbols(limit: int = 5) -> list[str]:
     """Return a list of trending tickers from Yahoo or OpenAI."""
     try:
         if TRENDING_SOURCE == "openai":
-            if not openai.api_key or "your_openai_api_key" in openai.api_key:
+            if not OPENAI_API_KEY or "your_openai_api_key" in OPENAI_API_KEY:
                 return ["AAPL"]
             return _get_trending_from_openai(limit)
         return _get_trending_from_yahoo(limit)
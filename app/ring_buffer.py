@@ -0,0 +1,192 @@
+import json
+import sys
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_EVENT_CAPACITY = 200
+DEFAULT_ALERT_CAPACITY = 100
+
+
+def estimate_size(obj: Any) -> int:
+    """Return an approximate deep size in bytes of nested lists/dicts/strings."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, val in obj.items():
+            size += estimate_size(key) + estimate_size(val)
+    elif isinstance(obj, (list, tuple, deque)):
+        for item in obj:
+            size += estimate_size(item)
+    return size
+
+
+class RingBuffer:
+    """Fixed-capacity buffer that evicts its oldest item when full.
+
+    Appends are O(1) and ``last(k)`` is O(k). Slicing and indexing behave
+    like on a list of the buffered items.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_ALERT_CAPACITY,
+        items: Iterable = (),
+        on_evict: Optional[Callable[[Any], None]] = None,
+    ):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.on_evict = on_evict
+        self.evicted = 0
+        self._items: deque = deque(maxlen=capacity)
+        for item in items:
+            self.append(item)
+
+    def append(self, item: Any) -> None:
+        if len(self._items) == self.capacity:
+            self.evicted += 1
+            if self.on_evict:
+                self.on_evict(self._items[0])
+        self._items.append(item)
+
+    def extend(self, items: Iterable) -> None:
+        for item in items:
+            self.append(item)
+
+    def last(self, k: int) -> List:
+        """Return the newest ``k`` items in insertion order."""
+        if k <= 0:
+            return []
+        items = list(islice(reversed(self._items), k))
+        items.reverse()
+        return items
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def memory_usage(self) -> int:
+        return estimate_size(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator:
+        return iter(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._items))
+            if step == 1 and stop == len(self._items):
+                return self.last(stop - start)
+            return list(self._items)[index]
+        return self._items[index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, RingBuffer):
+            return list(self._items) == list(other._items)
+        if isinstance(other, list):
+            return list(self._items) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self._items))
+
+
+class EventLog:
+    """Activity log with one ring buffer per event type.
+
+    Every event type keeps at most ``capacity`` entries (overridable per type
+    through ``capacities``). Entries pushed out of a full buffer are dropped
+    or, with ``overflow="spill"``, appended as JSON lines to ``spill_path``.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_EVENT_CAPACITY,
+        capacities: Dict[str, int] | None = None,
+        overflow: str = "drop",
+        spill_path: str | Path | None = None,
+    ):
+        if overflow not in ("drop", "spill"):
+            raise ValueError("overflow must be 'drop' or 'spill'")
+        self.capacity = capacity
+        self.capacities = capacities or {}
+        self.overflow = overflow
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.dropped = 0
+        self.spilled = 0
+        self._seq = 0
+        self._buffers: Dict[str, RingBuffer] = {}
+
+    def _buffer(self, event_type: str) -> RingBuffer:
+        buf = self._buffers.get(event_type)
+        if buf is None:
+            cap = self.capacities.get(event_type, self.capacity)
+            buf = RingBuffer(cap, on_evict=self._evict)
+            self._buffers[event_type] = buf
+        return buf
+
+    def _evict(self, item) -> None:
+        _, entry = item
+        if self.overflow == "spill" and self.spill_path:
+            try:
+                self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+                with self.spill_path.open("a") as f:
+                    f.write(json.dumps(entry, default=str) + "\n")
+                self.spilled += 1
+                return
+            except OSError as exc:
+                logger.error("Failed to spill activity to %s: %s", self.spill_path, exc)
+        self.dropped += 1
+
+    def append(self, entry: Dict) -> None:
+        self._seq += 1
+        self._buffer(entry.get("type", "")).append((self._seq, entry))
+
+    def extend(self, entries: Iterable[Dict]) -> None:
+        for entry in entries:
+            self.append(entry)
+
+    def last(self, k: int, types: Sequence[str] | None = None) -> List[Dict]:
+        """Return the newest ``k`` entries, optionally limited to ``types``."""
+        if types is None:
+            buffers = list(self._buffers.values())
+        else:
+            buffers = [self._buffers[t] for t in types if t in self._buffers]
+        if len(buffers) == 1:
+            return [entry for _, entry in buffers[0].last(k)]
+        items: List = []
+        for buf in buffers:
+            items.extend(buf.last(k))
+        items.sort(key=lambda item: item[0])
+        return [entry for _, entry in items[-k:]] if k > 0 else []
+
+    def types(self) -> List[str]:
+        return list(self._buffers)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Return approximate bytes used per event type."""
+        return {t: buf.memory_usage() for t, buf in self._buffers.items()}
+
+    def __len__(self) -> int:
+        return sum(len(buf) for buf in self._buffers.values())
+
+    def __iter__(self) -> Iterator[Dict]:
+        items = [item for buf in self._buffers.values() for item in buf]
+        items.sort(key=lambda item: item[0])
+        return iter([entry for _, entry in items])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1 and stop == len(self):
+                return self.last(stop - start)
+        return list(self)[index]
+
+    def __repr__(self) -> str:
+        return f"EventLog({len(self)} events, types={self.types()})"
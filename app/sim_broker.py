@@ -0,0 +1,439 @@
+import math
+import threading
+import time
+import uuid
+from array import array
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from .logger import get_logger
+from .timeseries import to_epoch, to_iso
+
+logger = get_logger(__name__)
+
+# base URL selecting the simulated broker, e.g. "sim://?cash=50000&latency=0.2"
+SIM_SCHEME = "sim"
+DEFAULT_CASH = 100_000.0
+# remaining quantities below this count as filled
+QTY_EPSILON = 1e-9
+
+_SIDES = ("buy", "sell")
+_STATUSES = ("accepted", "partially_filled", "filled", "canceled")
+_OPEN, _PARTIAL, _FILLED, _CANCELED = range(4)
+
+
+class SimRecord:
+    """Attribute bag with ``model_dump`` like the broker's response models."""
+
+    def __init__(self, **data):
+        self.__dict__.update(data)
+
+    def model_dump(self) -> Dict:
+        return dict(self.__dict__)
+
+    def __repr__(self) -> str:
+        return f"SimRecord({self.__dict__})"
+
+
+def _value(enum_or_str) -> str:
+    return str(getattr(enum_or_str, "value", enum_or_str)).lower()
+
+
+class SimulatedBroker:
+    """In-process stand-in for the part of alpaca's ``TradingClient`` we use.
+
+    Supports ``get_account``, ``submit_order``, ``get_orders``,
+    ``get_all_positions``, ``close_all_positions`` and ``cancel_orders``.
+    Market orders fill at the last price set for their symbol (or returned
+    by ``price_source``) moved by ``slippage_bps`` against the order. With
+    ``latency`` orders stay open for that many seconds of ``clock``; each
+    matching pass then fills ``fill_ratio`` of the order quantity, so
+    ratios below 1 produce partial fills. Matching runs whenever the broker
+    is called.
+
+    Positions and prices are numpy vectors indexed by symbol and orders are
+    columns of typed arrays, so an account holds millions of orders in a
+    few dozen bytes each and valuation is one dot product.
+    """
+
+    def __init__(
+        self,
+        cash: float = DEFAULT_CASH,
+        prices: Mapping[str, float] | None = None,
+        price_source: Callable[[str], Optional[float]] | None = None,
+        latency: float = 0.0,
+        slippage_bps: float = 0.0,
+        fill_ratio: float = 1.0,
+        allow_short: bool = False,
+        symbols: Sequence[str] = (),
+        clock: Callable[[], float] = time.monotonic,
+        now: Callable[[], datetime] | None = None,
+    ):
+        if not 0 < fill_ratio <= 1:
+            raise ValueError("fill_ratio must be in (0, 1]")
+        self.cash = float(cash)
+        self.price_source = price_source
+        self.latency = float(latency)
+        self.slippage = float(slippage_bps) / 10_000
+        self.fill_ratio = float(fill_ratio)
+        self.allow_short = allow_short
+        self.clock = clock
+        self.now = now or datetime.utcnow
+        self._system_time = now is None
+        self.account_id = uuid.uuid4().hex[:8]
+        self.liquidations = 0
+        self._lock = threading.RLock()
+        # per symbol
+        self.symbols: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.qty = np.zeros(0)
+        self.avg = np.zeros(0)
+        self.prices = np.zeros(0)
+        # per order; submitted/updated are wall times, due is a clock reading
+        self._symbol = array("l")
+        self._side = array("b")
+        self._status = array("b")
+        self._qty = array("d")
+        self._filled = array("d")
+        self._fill_price = array("d")
+        self._submitted = array("d")
+        self._updated = array("d")
+        self._due = array("d")
+        self._open: List[int] = []
+        # client order ids given on submission, by order index
+        self._client_ids: Dict[int, str] = {}
+        for symbol in symbols:
+            self._symbol_index(symbol)
+        if prices:
+            self.set_prices(prices)
+
+    @classmethod
+    def from_url(
+        cls, url: str, price_source: Callable[[str], Optional[float]] | None = None
+    ) -> "SimulatedBroker":
+        """Create a broker from ``sim://?cash=..&latency=..&slippage_bps=..``."""
+        query = parse_qs(urlsplit(url).query)
+        options = {}
+        for key in ("cash", "latency", "slippage_bps", "fill_ratio"):
+            if key in query:
+                options[key] = float(query[key][0])
+        if "allow_short" in query:
+            options["allow_short"] = query["allow_short"][0].lower() in ("1", "true")
+        return cls(price_source=price_source, **options)
+
+    # --- Prices ----------------------------------------------------------
+    def _symbol_index(self, symbol: str) -> int:
+        j = self.index.get(symbol)
+        if j is None:
+            j = self.index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            if j >= len(self.qty):
+                size = max(8, 2 * len(self.qty))
+                for name in ("qty", "avg", "prices"):
+                    grown = np.zeros(size)
+                    grown[: j] = getattr(self, name)[: j]
+                    setattr(self, name, grown)
+        return j
+
+    def set_prices(self, prices: Mapping[str, float] | Sequence[float]) -> None:
+        """Set last prices by symbol, or for all ``symbols`` in order from a
+        sequence, then match open orders."""
+        with self._lock:
+            if isinstance(prices, Mapping):
+                for symbol, price in prices.items():
+                    j = self._symbol_index(symbol)
+                    self.prices[j] = float(price)
+            else:
+                values = np.asarray(prices, dtype=np.float64)
+                self.prices[: len(values)] = np.nan_to_num(values)
+            self._match()
+
+    def price(self, symbol: str) -> Optional[float]:
+        """Return the last price of ``symbol``, asking ``price_source`` if unset."""
+        with self._lock:
+            j = self.index.get(symbol)
+            if j is not None and self.prices[j]:
+                return float(self.prices[j])
+        if self.price_source is None:
+            return None
+        value = self.price_source(symbol)
+        if not value:
+            return None
+        with self._lock:
+            j = self._symbol_index(symbol)
+            # keep a price set while the source was asked
+            if not self.prices[j]:
+                self.prices[j] = float(value)
+            return float(self.prices[j])
+
+    # --- Matching --------------------------------------------------------
+    def _wall(self) -> float:
+        return time.time() if self._system_time else to_epoch(self.now())
+
+    def _fill(self, i: int, tick: float, wall: float | None = None) -> None:
+        j = self._symbol[i]
+        remaining = self._qty[i] - self._filled[i]
+        qty = min(remaining, self._qty[i] * self.fill_ratio)
+        if remaining - qty <= QTY_EPSILON:
+            qty = remaining
+        side = self._side[i]
+        # slippage moves the fill against the order
+        slip = self.slippage if side == 0 else -self.slippage
+        price = float(self.prices[j]) * (1 + slip)
+        held = self.qty[j]
+        if side == 0:
+            total = held + qty
+            if held >= 0:
+                self.avg[j] = (self.avg[j] * held + price * qty) / total
+            elif total > 0:
+                # a buy covering a short opens a long at the fill price
+                self.avg[j] = price
+            self.qty[j] = total
+            self.cash -= qty * price
+        else:
+            total = held - qty
+            if held <= 0:
+                self.avg[j] = (self.avg[j] * -held + price * qty) / -total
+            elif total < 0:
+                self.avg[j] = price
+            self.qty[j] = total
+            self.cash += qty * price
+        if abs(self.qty[j]) <= QTY_EPSILON:
+            self.qty[j] = 0.0
+            self.avg[j] = 0.0
+        filled = self._filled[i]
+        total_filled = filled + qty
+        paid = self._fill_price[i] * filled + price * qty
+        self._fill_price[i] = paid / total_filled
+        self._filled[i] = total_filled
+        self._status[i] = _FILLED if qty == remaining else _PARTIAL
+        self._updated[i] = self._wall() if wall is None else wall
+        self._due[i] = tick + self.latency
+
+    def _match(self) -> None:
+        if not self._open:
+            return
+        tick = self.clock()
+        still_open = []
+        for i in self._open:
+            # catch up on every matching pass due since the last call
+            while (
+                self._status[i] in (_OPEN, _PARTIAL)
+                and self._due[i] <= tick
+                and self.prices[self._symbol[i]]
+            ):
+                self._fill(i, self._due[i])
+            if self._status[i] in (_OPEN, _PARTIAL):
+                still_open.append(i)
+        self._open = still_open
+
+    def _buying_power(self) -> float:
+        """Cash less the notional reserved by unfilled buys at current prices."""
+        reserved = sum(
+            (self._qty[i] - self._filled[i]) * self.prices[self._symbol[i]]
+            for i in self._open
+            if self._side[i] == 0
+        )
+        return self.cash - reserved * (1 + self.slippage)
+
+    # --- TradingClient surface -------------------------------------------
+    def submit_order(self, order_data) -> SimRecord:
+        """Accept a market order; it fills now unless ``latency`` is set."""
+        symbol = order_data.symbol
+        qty = float(order_data.qty)
+        side = _value(order_data.side)
+        if qty <= 0 or side not in _SIDES:
+            raise ValueError("invalid order quantity or side")
+        with self._lock:
+            self._match()
+            price = self.price(symbol)
+            if not price:
+                raise ValueError(f"no price for {symbol}")
+            j = self._symbol_index(symbol)
+            cost = qty * price * (1 + self.slippage)
+            if side == "buy" and cost > self._buying_power() + QTY_EPSILON:
+                raise ValueError("insufficient buying power")
+            if side == "sell" and not self.allow_short:
+                pending = sum(
+                    self._qty[i] - self._filled[i]
+                    for i in self._open
+                    if self._symbol[i] == j and self._side[i] == 1
+                )
+                if qty > self.qty[j] - pending + QTY_EPSILON:
+                    raise ValueError(f"insufficient qty for {symbol}")
+            tick = self.clock()
+            wall = self._wall()
+            i = len(self._qty)
+            self._symbol.append(j)
+            self._side.append(_SIDES.index(side))
+            self._status.append(_OPEN)
+            self._qty.append(qty)
+            self._filled.append(0.0)
+            self._fill_price.append(0.0)
+            self._submitted.append(wall)
+            self._updated.append(wall)
+            self._due.append(tick + self.latency)
+            client_id = getattr(order_data, "client_order_id", None)
+            if client_id:
+                self._client_ids[i] = str(client_id)
+            if self.latency > 0:
+                self._open.append(i)
+            else:
+                self._fill(i, tick, wall)
+                if self._status[i] == _PARTIAL:
+                    self._open.append(i)
+            return self._order(i)
+
+    def _order(self, i: int) -> SimRecord:
+        status = self._status[i]
+        filled = self._filled[i]
+        submitted_at = to_iso(self._submitted[i])
+        filled_at = None
+        if filled:
+            updated = self._updated[i]
+            same = updated == self._submitted[i]
+            filled_at = submitted_at if same else to_iso(updated)
+        order_id = f"sim-{self.account_id}-{i + 1}"
+        return SimRecord(
+            id=order_id,
+            client_order_id=self._client_ids.get(i, order_id),
+            symbol=self.symbols[self._symbol[i]],
+            qty=self._qty[i],
+            side=_SIDES[self._side[i]],
+            type="market",
+            time_in_force="day",
+            status=_STATUSES[status],
+            submitted_at=submitted_at,
+            filled_at=filled_at,
+            filled_qty=filled,
+            filled_avg_price=self._fill_price[i] if filled else None,
+        )
+
+    def get_orders(self, filter=None, status: str | None = None) -> List[SimRecord]:
+        """Return orders by ``status`` (open, closed or all), newest first."""
+        status = _value(getattr(filter, "status", None) or status or "open")
+        limit = getattr(filter, "limit", None)
+        with self._lock:
+            self._match()
+            if status == "open":
+                indices: Iterable[int] = reversed(self._open)
+            else:
+                open_set = set(self._open)
+                indices = (
+                    i
+                    for i in range(len(self._qty) - 1, -1, -1)
+                    if status == "all" or i not in open_set
+                )
+            orders = []
+            for i in indices:
+                orders.append(self._order(i))
+                if limit and len(orders) >= limit:
+                    break
+            return orders
+
+    def cancel_orders(self) -> List[SimRecord]:
+        with self._lock:
+            canceled = []
+            for i in self._open:
+                self._status[i] = _CANCELED
+                canceled.append(self._order(i))
+            self._open = []
+            return canceled
+
+    def get_account(self) -> SimRecord:
+        with self._lock:
+            self._match()
+            values = self.qty * self.prices
+            long_value = float(values[values > 0].sum())
+            short_value = float(values[values < 0].sum())
+            equity = self.cash + long_value + short_value
+            return SimRecord(
+                id=self.account_id,
+                status="ACTIVE",
+                currency="USD",
+                cash=self.cash,
+                buying_power=self._buying_power(),
+                portfolio_value=equity,
+                equity=equity,
+                long_market_value=long_value,
+                short_market_value=short_value,
+            )
+
+    def get_all_positions(self) -> List[SimRecord]:
+        with self._lock:
+            self._match()
+            positions = []
+            for j in np.flatnonzero(self.qty):
+                qty, avg = float(self.qty[j]), float(self.avg[j])
+                price = float(self.prices[j])
+                positions.append(
+                    SimRecord(
+                        symbol=self.symbols[j],
+                        qty=qty,
+                        side="long" if qty > 0 else "short",
+                        avg_entry_price=avg,
+                        current_price=price,
+                        market_value=qty * price,
+                        cost_basis=qty * avg,
+                        unrealized_pl=(price - avg) * qty,
+                        unrealized_plpc=(price / avg - 1) * math.copysign(1, qty)
+                        if avg
+                        else 0.0,
+                    )
+                )
+            return positions
+
+    def close_all_positions(self, cancel_orders: bool = False) -> List[SimRecord]:
+        """Submit market orders flattening every position.
+
+        Like Alpaca, one response per position is returned with an HTTP
+        ``status`` and a ``body`` holding the closing order, or the error if
+        it was rejected (e.g. because open orders hold the quantity).
+        """
+        with self._lock:
+            if cancel_orders:
+                self.cancel_orders()
+            self._match()
+            self.liquidations += 1
+            # positions before any closing order fills
+            held = [
+                (self.symbols[j], float(self.qty[j])) for j in np.flatnonzero(self.qty)
+            ]
+            responses = []
+            for symbol, qty in held:
+                order = SimRecord(
+                    symbol=symbol, qty=abs(qty), side="sell" if qty > 0 else "buy"
+                )
+                try:
+                    closing = self.submit_order(order)
+                except ValueError as exc:
+                    error = SimRecord(code=40310000, message=str(exc), symbol=symbol)
+                    responses.append(
+                        SimRecord(order_id=None, status=403, symbol=symbol, body=error)
+                    )
+                    continue
+                responses.append(
+                    SimRecord(
+                        order_id=closing.id, status=200, symbol=symbol, body=closing
+                    )
+                )
+            return responses
+
+    def memory_usage(self) -> int:
+        """Return the bytes held by position and order state."""
+        columns = (
+            self._symbol,
+            self._side,
+            self._status,
+            self._qty,
+            self._filled,
+            self._fill_price,
+            self._submitted,
+            self._updated,
+            self._due,
+        )
+        arrays = sum(c.itemsize * len(c) for c in columns)
+        return arrays + self.qty.nbytes + self.avg.nbytes + self.prices.nbytes
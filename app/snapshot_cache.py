@@ -0,0 +1,300 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .diversification import analyze_portfolio
+from .logger import get_logger
+from .timeseries import DEFAULT_CHART_POINTS
+
+logger = get_logger(__name__)
+
+# seconds after which a section is refreshed in the background; sections
+# without a TTL only change through the portfolio revisions they depend on
+SECTION_TTLS: Dict[str, float] = {
+    "account": 15.0,
+    "orders": 15.0,
+    "positions": 30.0,
+    "allocation": 30.0,
+    "diversification": 600.0,
+}
+BENCHMARK_TTL = 60.0
+
+# attempts to assemble a portfolio snapshot without a revision change in between
+CONSISTENT_READ_ATTEMPTS = 3
+
+# portfolio revision sections each cached section depends on
+SECTION_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    "account": ("history", "holdings"),
+    "orders": ("history",),
+    "positions": ("holdings",),
+    "allocation": ("history", "holdings"),
+    "diversification": ("holdings",),
+    "equity": ("equity",),
+}
+
+
+class _Entry:
+    __slots__ = ("owner", "key", "value", "built", "version")
+
+    def __init__(self, owner, key, value, version: int):
+        self.owner = owner
+        self.key = key
+        self.value = value
+        self.built = time.monotonic()
+        self.version = version
+
+
+class SnapshotCache:
+    """Per-portfolio, per-section cache of the dashboard snapshot.
+
+    A section is rebuilt on the next read once a portfolio revision it
+    depends on changed (trade placed, fill, holdings or config change).
+    Sections older than their TTL are still served and refreshed in the
+    background, so page loads never wait for the broker or quote feeds
+    unless a section was never built or was invalidated by an event.
+    """
+
+    def __init__(
+        self,
+        manager,
+        ttls: Dict[str, float] | None = None,
+        points: int = DEFAULT_CHART_POINTS,
+        workers: int = 4,
+    ):
+        self.manager = manager
+        self.ttls = {**SECTION_TTLS, **(ttls or {})}
+        self.points = points
+        self.workers = workers
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._entries: Dict[Tuple[str, str], _Entry] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._benchmark: Optional[_Entry] = None
+        self._benchmark_fetched: Optional[float] = None
+        self._builders: Dict[str, Callable] = {
+            "account": self._build_account,
+            "orders": self._build_orders,
+            "positions": lambda p: p.get_positions(),
+            "allocation": lambda p: p.get_allocation(self.section(p, "account")),
+            "diversification": self._build_diversification,
+            "equity": self._build_equity,
+        }
+
+    # --- Builders ------------------------------------------------------------
+    def _build_account(self, p) -> Dict:
+        try:
+            info = p.get_account_info()
+            return {
+                "cash": info.get("cash"),
+                "portfolio_value": info.get("portfolio_value"),
+            }
+        except Exception as exc:
+            logger.error("Failed to get info for %s: %s", p.name, exc)
+            return {"cash": "N/A", "portfolio_value": "N/A"}
+
+    def _build_orders(self, p) -> List[Dict]:
+        p.refresh_open_orders()
+        return p.open_orders
+
+    def _build_diversification(self, p) -> Dict:
+        divers = analyze_portfolio(p)
+        p.correlation_matrix = divers["matrix"]
+        p.diversification_score = divers["score"]
+        p.diversification_warnings = divers["warnings"]
+        return divers
+
+    def _build_equity(self, p) -> Dict:
+        return {
+            "equity": p.equity_curve.downsample(self.points),
+            "equity_norm": self.manager.get_normalized_equity(p, self.points),
+        }
+
+    # --- Cache ---------------------------------------------------------------
+    def _key(self, p, section: str) -> Tuple[int, ...]:
+        return tuple(p.revisions.get(s, 0) for s in SECTION_DEPENDENCIES[section])
+
+    def section(self, p, section: str):
+        """Return a cached section of a portfolio, building it if needed."""
+        key = self._key(p, section)
+        with self._lock:
+            entry = self._entries.get((p.name, section))
+            if entry is not None and entry.owner is p and entry.key == key:
+                self.hits += 1
+                ttl = self.ttls.get(section)
+                if ttl is not None and time.monotonic() - entry.built >= ttl:
+                    self._schedule((p.name, section), self._refresh, p, section)
+                return entry.value
+            self.misses += 1
+        return self._build(p, section, key)
+
+    def _build(self, p, section: str, key: Tuple[int, ...]):
+        value = self._builders[section](p)
+        with self._lock:
+            old = self._entries.get((p.name, section))
+            version = old.version if old is not None and old.owner is p else 0
+            if old is None or old.owner is not p or old.value != value:
+                version += 1
+            self._entries[(p.name, section)] = _Entry(p, key, value, version)
+        return value
+
+    def _schedule(self, task_key, fn, *args) -> None:
+        # called with self._lock held
+        if task_key in self._refreshing:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.workers, thread_name_prefix="snapshot-refresh"
+            )
+        self._refreshing.add(task_key)
+        self._executor.submit(self._run_refresh, task_key, fn, *args)
+
+    def _run_refresh(self, task_key, fn, *args) -> None:
+        try:
+            fn(*args)
+            self.refreshes += 1
+        except Exception as exc:
+            logger.error("Snapshot refresh %s failed: %s", task_key, exc)
+        finally:
+            with self._lock:
+                self._refreshing.discard(task_key)
+
+    def _refresh(self, p, section: str) -> None:
+        self._build(p, section, self._key(p, section))
+
+    def version(self, p, section: str) -> int:
+        """Return how often the cached value of a section changed."""
+        entry = self._entries.get((p.name, section))
+        return entry.version if entry is not None and entry.owner is p else 0
+
+    def invalidate(self, name: str | None = None, sections=None) -> None:
+        """Drop cached sections of one portfolio (or all) so they get rebuilt."""
+        with self._lock:
+            for key in list(self._entries):
+                if (name is None or key[0] == name) and (
+                    sections is None or key[1] in sections
+                ):
+                    del self._entries[key]
+
+    def prune(self) -> None:
+        """Forget entries of portfolios no longer managed."""
+        current = {id(p) for p in self.manager.portfolios}
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if id(entry.owner) not in current:
+                    del self._entries[key]
+
+    # --- Benchmark -----------------------------------------------------------
+    def _fetch_benchmark(self) -> None:
+        self.manager.update_benchmark()
+        self._benchmark_fetched = time.monotonic()
+
+    def benchmark_key(self) -> Tuple:
+        """Return a key that changes whenever the benchmark curve does."""
+        curve = self.manager.benchmark_curve
+        return (len(curve), curve.values[-1] if len(curve) else None)
+
+    def benchmark(self) -> List[Dict]:
+        """Return the normalized benchmark, fetching new prices in the background."""
+        if self._benchmark_fetched is None:
+            self._fetch_benchmark()
+        elif time.monotonic() - self._benchmark_fetched >= BENCHMARK_TTL:
+            with self._lock:
+                self._schedule("benchmark", self._fetch_benchmark)
+        key = self.benchmark_key()
+        entry = self._benchmark
+        if entry is not None and entry.key == key:
+            return entry.value
+        value = self.manager.get_normalized_benchmark(self.points)
+        version = entry.version + 1 if entry is not None else 1
+        self._benchmark = _Entry(self.manager, key, value, version)
+        return value
+
+    def refresh(self, p) -> None:
+        """Rebuild every section of a portfolio now."""
+        for section in self._builders:
+            self._build(p, section, self._key(p, section))
+
+    # --- Snapshot ------------------------------------------------------------
+    def portfolio(
+        self, p, bench: List[Dict] | None = None, fresh: bool = False
+    ) -> Dict:
+        """Return the dashboard data of one portfolio.
+
+        Sections are read from the cache unless ``fresh`` is set, which
+        rebuilds them from the broker first. The result reflects a single
+        portfolio revision: if a trade or equity point lands while sections
+        are read, they are read again (at most ``CONSISTENT_READ_ATTEMPTS``
+        times). ``revision`` and ``as_of`` describe that point in time.
+        """
+        if fresh:
+            if bench is None:
+                self._fetch_benchmark()
+            self.refresh(p)
+        for _ in range(CONSISTENT_READ_ATTEMPTS):
+            revision = p.revision()
+            as_of = time.time()
+            data = self._portfolio(p, bench)
+            if p.revision() == revision:
+                break
+        data["revision"] = revision
+        data["as_of"] = as_of
+        return data
+
+    def _portfolio(self, p, bench: List[Dict] | None) -> Dict:
+        account = self.section(p, "account")
+        divers = self.section(p, "diversification")
+        equity = self.section(p, "equity")
+        return {
+            "name": p.name,
+            "key_hint": (p.api_key[:4] + "***") if p.api_key else "",
+            "cash": account["cash"],
+            "portfolio_value": account["portfolio_value"],
+            "positions": self.section(p, "positions"),
+            "history": p.history[-5:],
+            "open_orders": self.section(p, "orders"),
+            "allocation": self.section(p, "allocation"),
+            "equity": equity["equity"],
+            "equity_norm": equity["equity_norm"],
+            "benchmark": bench if bench is not None else self.benchmark(),
+            "strategy_type": p.strategy_type,
+            "custom_prompt": p.custom_prompt,
+            "risk_alerts": p.risk_alerts[-5:] + divers["warnings"],
+            "stop_loss_pct": p.stop_loss_pct,
+            "take_profit_pct": p.take_profit_pct,
+            "max_drawdown_pct": p.max_drawdown_pct,
+            "trade_pnl_limit_pct": p.trade_pnl_limit_pct,
+            "diversification_score": divers["score"],
+            "correlation": divers["matrix"],
+        }
+
+    def snapshot(self, fresh: bool = False) -> List[Dict]:
+        """Return the dashboard data of all managed portfolios."""
+        self.prune()
+        if fresh:
+            self._fetch_benchmark()
+        bench = self.benchmark()
+        return [
+            self.portfolio(p, bench, fresh) for p in list(self.manager.portfolios)
+        ]
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+_shared_lock = threading.Lock()
+
+
+def snapshot_cache_for(manager, **options) -> SnapshotCache:
+    """Return the cache shared by the dashboard, exports and reports of ``manager``.
+
+    It is created with ``options`` on first use and kept on the manager.
+    """
+    with _shared_lock:
+        if getattr(manager, "snapshot_cache", None) is None:
+            manager.snapshot_cache = SnapshotCache(manager, **options)
+        return manager.snapshot_cache
@@ -0,0 +1,113 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# snapshot fields grouped into the sections sent to clients
+STATE_SECTIONS: Dict[str, Tuple[str, ...]] = {
+    "account": ("cash", "portfolio_value"),
+    "positions": ("positions",),
+    "history": ("history",),
+    "orders": ("open_orders",),
+    "allocation": ("allocation",),
+    "equity": ("equity", "equity_norm"),
+    "benchmark": ("benchmark",),
+    "alerts": ("risk_alerts",),
+    "diversification": ("diversification_score", "correlation"),
+    "config": (
+        "key_hint",
+        "strategy_type",
+        "custom_prompt",
+        "stop_loss_pct",
+        "take_profit_pct",
+        "max_drawdown_pct",
+        "trade_pnl_limit_pct",
+    ),
+}
+
+
+def split_sections(portfolio: Dict) -> Dict[str, Dict]:
+    """Split a dashboard snapshot of one portfolio into its sections."""
+    return {
+        section: {key: portfolio.get(key) for key in keys}
+        for section, keys in STATE_SECTIONS.items()
+    }
+
+
+class StateTracker:
+    """Track a revision per portfolio section of the dashboard state.
+
+    ``update`` compares a new snapshot with the last published one and
+    returns a delta holding only the sections that changed. Every section
+    remembers the revision it last changed at, so ``since`` can bring a
+    client that missed deltas up to date without keeping old payloads.
+    Deltas look like ``{"rev", "base", "portfolios": {name: {section:
+    fields}}, "removed": [names]}``; a client at revision ``base`` reaches
+    ``rev`` by applying it. ``epoch`` changes on every restart so clients
+    holding revisions of a previous server process resync fully.
+    """
+
+    def __init__(self):
+        self.epoch = str(time.time_ns())
+        self.rev = 0
+        self._sections: Dict[str, Dict[str, Tuple[int, Dict]]] = {}
+        self._removed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def update(self, snapshot: List[Dict]) -> Optional[Dict]:
+        """Record a snapshot and return the delta to broadcast, if any."""
+        with self._lock:
+            rev = self.rev + 1
+            changed: Dict[str, Dict[str, Dict]] = {}
+            names = set()
+            for portfolio in snapshot:
+                name = portfolio["name"]
+                names.add(name)
+                self._removed.pop(name, None)
+                known = self._sections.setdefault(name, {})
+                for section, fields in split_sections(portfolio).items():
+                    previous = known.get(section)
+                    if previous is None or previous[1] != fields:
+                        known[section] = (rev, fields)
+                        changed.setdefault(name, {})[section] = fields
+            removed = [name for name in self._sections if name not in names]
+            for name in removed:
+                del self._sections[name]
+                self._removed[name] = rev
+            if not changed and not removed:
+                return None
+            base, self.rev = self.rev, rev
+            return {
+                "epoch": self.epoch,
+                "rev": rev,
+                "base": base,
+                "portfolios": changed,
+                "removed": removed,
+            }
+
+    def since(self, rev: int = 0, epoch: str | None = None) -> Dict:
+        """Return a delta with every section changed after revision ``rev``.
+
+        A revision from another ``epoch`` or beyond the current one yields
+        the full state.
+        """
+        with self._lock:
+            if (epoch is not None and epoch != self.epoch) or not 0 <= rev <= self.rev:
+                rev = 0
+            portfolios = {}
+            for name, sections in self._sections.items():
+                changed = {
+                    section: fields
+                    for section, (changed_rev, fields) in sections.items()
+                    if changed_rev > rev
+                }
+                if changed:
+                    portfolios[name] = changed
+            removed = [name for name, at in self._removed.items() if at > rev]
+            return {
+                "epoch": self.epoch,
+                "rev": self.rev,
+                "base": rev,
+                "portfolios": portfolios,
+                "removed": removed,
+                "full": rev == 0,
+            }
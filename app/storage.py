@@ -0,0 +1,437 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# number of records kept in memory once a store is attached
+HOT_TRADES = 500
+HOT_EQUITY = 10_000
+HOT_ACTIVITY = 500
+HOT_ALERTS = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    portfolio TEXT NOT NULL,
+    trade_id TEXT,
+    symbol TEXT,
+    side TEXT,
+    time TEXT,
+    data TEXT NOT NULL,
+    UNIQUE (portfolio, trade_id)
+);
+CREATE INDEX IF NOT EXISTS idx_trades_portfolio ON trades (portfolio, id);
+CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades (portfolio, symbol, id);
+CREATE INDEX IF NOT EXISTS idx_trades_side ON trades (portfolio, side, id);
+CREATE INDEX IF NOT EXISTS idx_trades_time ON trades (portfolio, time);
+CREATE INDEX IF NOT EXISTS idx_trades_trade_id ON trades (trade_id);
+
+CREATE TABLE IF NOT EXISTS equity (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    portfolio TEXT NOT NULL,
+    time TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_equity_time ON equity (portfolio, time);
+
+CREATE TABLE IF NOT EXISTS activity (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    portfolio TEXT NOT NULL,
+    time TEXT NOT NULL,
+    type TEXT NOT NULL,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_activity_portfolio ON activity (portfolio, id);
+CREATE INDEX IF NOT EXISTS idx_activity_type ON activity (portfolio, type, id);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    portfolio TEXT NOT NULL,
+    time TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_portfolio ON alerts (portfolio, id);
+"""
+
+_INSERT_TRADE = (
+    "INSERT INTO trades (portfolio, trade_id, symbol, side, time, data) "
+    "VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (portfolio, trade_id) DO UPDATE SET "
+    "symbol = excluded.symbol, side = excluded.side, "
+    "time = excluded.time, data = excluded.data"
+)
+_INSERT_EQUITY = "INSERT INTO equity (portfolio, time, value) VALUES (?, ?, ?)"
+_INSERT_ACTIVITY = (
+    "INSERT INTO activity (portfolio, time, type, message) VALUES (?, ?, ?, ?)"
+)
+_INSERT_ALERT = "INSERT INTO alerts (portfolio, time, message) VALUES (?, ?, ?)"
+# record columns read by ``iter_rows``
+_TABLE_COLUMNS = {
+    "trades": ("data",),
+    "equity": ("time", "value"),
+    "activity": ("time", "type", "message"),
+    "alerts": ("time", "message"),
+}
+
+
+def _trade_time(trade: Dict) -> str:
+    return str(trade.get("submitted_at") or trade.get("created_at") or "")
+
+
+def trade_key(trade: Dict) -> str:
+    """Return the identifier used to look up a trade.
+
+    Trades without an order id (manual entries, imported history) are keyed
+    by a hash of symbol, side, time and quantity, so importing them again
+    updates their row instead of adding another one.
+    """
+    tid = trade.get("id") or trade.get("client_order_id")
+    if tid:
+        return str(tid)
+    fields = [trade.get(k) for k in ("symbol", "side", "qty")] + [_trade_time(trade)]
+    digest = hashlib.sha1(json.dumps(fields, default=str).encode()).hexdigest()
+    return f"h:{digest[:20]}"
+
+
+def _trade_row(portfolio: str, trade: Dict) -> Tuple:
+    return (
+        portfolio,
+        trade_key(trade),
+        trade.get("symbol"),
+        trade.get("side"),
+        _trade_time(trade),
+        json.dumps(trade, default=str),
+    )
+
+
+class TradeStore:
+    """Embedded SQLite store for trades, equity points, activity and alerts.
+
+    Writes are buffered and committed in batches, at the latest
+    ``flush_interval`` seconds after the first buffered write; any read
+    flushes pending writes first so callers always see their own data.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = "trading.db",
+        batch_size: int = 100,
+        flush_interval: float = 2.0,
+    ):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._pending: List[Tuple[str, Tuple]] = []
+        self._last_flush = time.monotonic()
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    # --- Writes --------------------------------------------------------------
+    def _enqueue(self, sql: str, params: Tuple) -> None:
+        with self._lock:
+            self._pending.append((sql, params))
+            if (
+                len(self._pending) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            ):
+                self.flush()
+            elif self._timer is None:
+                # an idle process still commits its last batch
+                self._timer = threading.Timer(self.flush_interval, self._timed_flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_flush(self) -> None:
+        with self._lock:
+            self._timer = None
+            if not self._closed:
+                self.flush()
+
+    def flush(self) -> None:
+        """Commit all buffered writes in a single transaction."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending or self._closed:
+                return
+            pending, self._pending = self._pending, []
+            try:
+                with self._conn:
+                    for sql, params in pending:
+                        self._conn.execute(sql, params)
+            except sqlite3.Error as exc:
+                logger.error("Failed to flush %d writes: %s", len(pending), exc)
+
+    def close(self) -> None:
+        """Flush pending writes and close the connection."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self.flush()
+            self._closed = True
+            self._conn.close()
+
+    def add_trade(self, portfolio: str, trade: Dict) -> None:
+        """Insert or update a trade (keyed by its order id)."""
+        self._enqueue(_INSERT_TRADE, _trade_row(portfolio, trade))
+
+    update_trade = add_trade
+
+    def add_equity(self, portfolio: str, point: Dict) -> None:
+        self._enqueue(
+            _INSERT_EQUITY, (portfolio, str(point["time"]), float(point["value"]))
+        )
+
+    def add_activity(self, portfolio: str, entry: Dict) -> None:
+        self._enqueue(
+            _INSERT_ACTIVITY,
+            (portfolio, entry["time"], entry["type"], entry.get("message")),
+        )
+
+    def add_alert(self, portfolio: str, message: str, time_str: str) -> None:
+        self._enqueue(_INSERT_ALERT, (portfolio, time_str, message))
+
+    # --- Reads ---------------------------------------------------------------
+    def _query(self, sql: str, params: Sequence = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            self.flush()
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _page(
+        rows: List[sqlite3.Row], limit: Optional[int]
+    ) -> Tuple[List[sqlite3.Row], Optional[int]]:
+        """Return rows in chronological order plus the cursor for older rows."""
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1]["id"]
+        return rows[::-1], next_cursor
+
+    def query_trades(
+        self,
+        portfolio: str,
+        symbol: str | None = None,
+        side: str | None = None,
+        limit: int | None = None,
+        before: int | None = None,
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """Return the newest matching trades and a keyset cursor for the next page.
+
+        ``before`` is the cursor returned by a previous call; rows with a lower
+        internal id are returned.
+        """
+        sql = "SELECT id, data FROM trades WHERE portfolio = ?"
+        params: List = [portfolio]
+        if symbol:
+            sql += " AND symbol = ?"
+            params.append(symbol)
+        if side:
+            sql += " AND side = ?"
+            params.append(side)
+        if before:
+            sql += " AND id < ?"
+            params.append(before)
+        sql += " ORDER BY id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        rows, cursor = self._page(self._query(sql, params), limit)
+        return [json.loads(r["data"]) for r in rows], cursor
+
+    def get_trade(self, portfolio: str, trade_id: str) -> Optional[Dict]:
+        rows = self._query(
+            "SELECT data FROM trades WHERE portfolio = ? AND trade_id = ?",
+            (portfolio, trade_id),
+        )
+        return json.loads(rows[0]["data"]) if rows else None
+
+    def find_trade(self, trade_id: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """Return ``(portfolio name, trade)`` for a trade id in any portfolio."""
+        rows = self._query(
+            "SELECT portfolio, data FROM trades WHERE trade_id = ? LIMIT 1",
+            (trade_id,),
+        )
+        if not rows:
+            return None, None
+        return rows[0]["portfolio"], json.loads(rows[0]["data"])
+
+    def iter_trades(self, portfolio: str, chunk: int = 1000) -> Iterable[Dict]:
+        """Yield all trades of a portfolio in insertion order."""
+        last = 0
+        while True:
+            rows = self._query(
+                "SELECT id, data FROM trades WHERE portfolio = ? AND id > ? "
+                "ORDER BY id LIMIT ?",
+                (portfolio, last, chunk),
+            )
+            if not rows:
+                return
+            for r in rows:
+                yield json.loads(r["data"])
+            last = rows[-1]["id"]
+
+    def iter_rows(
+        self, table: str, portfolio: str, after: int = 0, chunk: int = 1000
+    ) -> Iterable[Tuple[int, Dict]]:
+        """Yield ``(row id, record)`` of a table after row id ``after``, oldest first."""
+        columns = _TABLE_COLUMNS.get(table)
+        if columns is None:
+            raise ValueError("unknown table")
+        while True:
+            rows = self._query(
+                f"SELECT id, {', '.join(columns)} FROM {table} "
+                "WHERE portfolio = ? AND id > ? ORDER BY id LIMIT ?",
+                (portfolio, after, chunk),
+            )
+            if not rows:
+                return
+            for r in rows:
+                if table == "trades":
+                    yield r["id"], json.loads(r["data"])
+                else:
+                    yield r["id"], {c: r[c] for c in columns}
+            after = rows[-1]["id"]
+
+    def query_equity(
+        self,
+        portfolio: str,
+        start: str | None = None,
+        end: str | None = None,
+        limit: int | None = None,
+    ) -> List[Dict]:
+        """Return equity points between ISO timestamps (newest ``limit`` if set)."""
+        sql = "SELECT id, time, value FROM equity WHERE portfolio = ?"
+        params: List = [portfolio]
+        if start:
+            sql += " AND time >= ?"
+            params.append(start)
+        if end:
+            sql += " AND time <= ?"
+            params.append(end)
+        sql += " ORDER BY time DESC, id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._query(sql, params)[::-1]
+        return [{"time": r["time"], "value": r["value"]} for r in rows]
+
+    def first_equity(self, portfolio: str) -> Optional[float]:
+        """Return the value of the oldest stored equity point."""
+        rows = self._query(
+            "SELECT value FROM equity WHERE portfolio = ? ORDER BY time, id LIMIT 1",
+            (portfolio,),
+        )
+        return rows[0]["value"] if rows else None
+
+    def query_activity(
+        self,
+        portfolio: str,
+        types: Sequence[str] | None = None,
+        limit: int | None = 100,
+        before: int | None = None,
+    ) -> Tuple[List[Dict], Optional[int]]:
+        sql = "SELECT id, time, type, message FROM activity WHERE portfolio = ?"
+        params: List = [portfolio]
+        if types:
+            sql += f" AND type IN ({','.join('?' for _ in types)})"
+            params.extend(types)
+        if before:
+            sql += " AND id < ?"
+            params.append(before)
+        sql += " ORDER BY id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        rows, cursor = self._page(self._query(sql, params), limit)
+        events = [
+            {"time": r["time"], "type": r["type"], "message": r["message"]}
+            for r in rows
+        ]
+        return events, cursor
+
+    def query_alerts(
+        self, portfolio: str, limit: int | None = None, before: int | None = None
+    ) -> Tuple[List[str], Optional[int]]:
+        sql = "SELECT id, message FROM alerts WHERE portfolio = ?"
+        params: List = [portfolio]
+        if before:
+            sql += " AND id < ?"
+            params.append(before)
+        sql += " ORDER BY id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        rows, cursor = self._page(self._query(sql, params), limit)
+        return [r["message"] for r in rows], cursor
+
+    def count(self, table: str, portfolio: str) -> int:
+        if table not in ("trades", "equity", "activity", "alerts"):
+            raise ValueError("unknown table")
+        rows = self._query(
+            f"SELECT COUNT(*) AS n FROM {table} WHERE portfolio = ?", (portfolio,)
+        )
+        return int(rows[0]["n"])
+
+    # --- Migration -----------------------------------------------------------
+    def migrate_portfolio(self, portfolio) -> None:
+        """Import the in-memory state of a portfolio into the store.
+
+        Trades are upserted by ``trade_key`` so the import is idempotent.
+        Equity points, activity and alerts are only imported when the store
+        holds none for the portfolio yet.
+        """
+        name = portfolio.name
+        with self._lock:
+            for trade in portfolio.history:
+                self._pending.append((_INSERT_TRADE, _trade_row(name, trade)))
+            if not self.count("equity", name):
+                for point in portfolio.equity_curve:
+                    self._pending.append(
+                        (
+                            _INSERT_EQUITY,
+                            (name, str(point["time"]), float(point["value"])),
+                        )
+                    )
+            if not self.count("activity", name):
+                for entry in portfolio.activity_log:
+                    self._pending.append(
+                        (
+                            _INSERT_ACTIVITY,
+                            (name, entry["time"], entry["type"], entry.get("message")),
+                        )
+                    )
+            if not self.count("alerts", name):
+                for alert in portfolio.risk_alerts:
+                    self._pending.append((_INSERT_ALERT, (name, "", alert)))
+            self.flush()
+
+    def load_hot_set(self, portfolio) -> None:
+        """Populate empty in-memory lists of a portfolio with recent records."""
+        name = portfolio.name
+        if not portfolio.history:
+            portfolio.history, _ = self.query_trades(name, limit=HOT_TRADES)
+        if not portfolio.equity_curve:
+            # older points are read from the store by ``Portfolio.equity_series``
+            portfolio.equity_curve = self.query_equity(name, limit=HOT_EQUITY)
+            portfolio.equity_curve.base = self.first_equity(name)
+        if not portfolio.activity_log:
+            events, _ = self.query_activity(name, limit=HOT_ACTIVITY)
+            portfolio.activity_log.extend(events)
+        if not portfolio.risk_alerts:
+            alerts, _ = self.query_alerts(name, limit=HOT_ALERTS)
+            portfolio.risk_alerts.extend(alerts)
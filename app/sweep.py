@@ -0,0 +1,386 @@
+import itertools
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .backtest import (
+    BACKTEST_SETTINGS,
+    DEFAULT_CASH,
+    Backtester,
+    CachedReplay,
+    PriceBars,
+    decision_source,
+)
+from .logger import get_logger
+from .timeseries import TimeSeries
+
+logger = get_logger(__name__)
+
+# risk settings a sweep may vary
+SWEEP_PARAMS = (
+    "stop_loss_pct",
+    "take_profit_pct",
+    "max_drawdown_pct",
+    "trade_pnl_limit_pct",
+    "risk_level",
+)
+# metrics copied into the results table
+SWEEP_METRICS = (
+    "total_return",
+    "sharpe",
+    "sortino",
+    "max_drawdown",
+    "volatility",
+    "turnover",
+    "winrate",
+)
+# metrics where smaller is better
+_ASCENDING = {"max_drawdown", "volatility", "turnover"}
+# finished sweep jobs kept for status requests
+MAX_JOBS = 20
+
+
+def parameter_grid(space: Mapping[str, Sequence[float]]) -> List[Dict[str, float]]:
+    """Return every combination of the values listed per parameter."""
+    _check(space)
+    keys = list(space)
+    values = [[float(v) for v in space[key]] for key in keys]
+    combos = itertools.product(*values)
+    return [dict(zip(keys, combo)) for combo in combos]
+
+
+def random_sample(
+    space: Mapping[str, Sequence[float]], samples: int, seed: int | None = None
+) -> List[Dict[str, float]]:
+    """Draw ``samples`` settings uniformly from ``[low, high]`` per parameter."""
+    _check(space)
+    rng = random.Random(seed)
+    return [
+        {key: round(rng.uniform(*bounds), 4) for key, bounds in space.items()}
+        for _ in range(samples)
+    ]
+
+
+def _check(space: Mapping) -> None:
+    unknown = set(space) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError(f"unknown parameters {', '.join(sorted(unknown))}")
+
+
+def check_metric(metric: str) -> None:
+    """Raise ``ValueError`` unless results can be ranked by ``metric``."""
+    if metric not in SWEEP_METRICS:
+        raise ValueError(f"unknown metric {metric}")
+
+
+def rank(results: List[Dict], metric: str = "sharpe") -> List[Dict]:
+    """Sort results best first by ``metric``; runs without a value go last."""
+    check_metric(metric)
+    sign = 1 if metric in _ASCENDING else -1
+    return sorted(
+        results,
+        key=lambda r: (r[metric] is None, sign * (r[metric] or 0)),
+    )
+
+
+# --- Workers --------------------------------------------------------------
+# Worker processes attach the price arrays of a sweep from shared memory
+# once and keep the bars and run options in these globals until they are
+# given a chunk of another sweep.
+_worker: Dict = {}
+
+
+def _share(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, Tuple]:
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach(spec: Tuple) -> np.ndarray:
+    name, shape, dtype = spec
+    # spawned workers report to the parent's resource tracker, which
+    # unlinks the block once when the parent does
+    shm = shared_memory.SharedMemory(name=name)
+    _worker.setdefault("segments", []).append(shm)
+    view = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+    view.flags.writeable = False
+    return view
+
+
+def _load_sweep(sweep: Tuple) -> None:
+    times, closes, symbols, options = sweep
+    if _worker.get("sweep") == closes[0]:
+        return
+    # views of the previous sweep's arrays must go before its blocks close
+    _worker.pop("bars", None)
+    for shm in _worker.pop("segments", []):
+        try:
+            shm.close()
+        except BufferError:
+            pass
+    _worker["bars"] = PriceBars(_attach(times), symbols, _attach(closes))
+    _worker["options"] = options
+    _worker["sweep"] = closes[0]
+
+
+def _evaluate(bars: PriceBars, options: Dict, settings: Dict[str, float]) -> Dict:
+    result = Backtester(
+        bars,
+        options["decisions"],
+        cash=options["cash"],
+        benchmark=options["benchmark"],
+        overrides={**options["base"], **settings},
+    ).run()
+    metrics = result["metrics"] or {}
+    row = dict(settings)
+    row.update({key: metrics.get(key) for key in SWEEP_METRICS})
+    row["final_value"] = result["final_value"]
+    row["trades"] = result["trades"]
+    return row
+
+
+def _evaluate_chunk(sweep: Tuple, configs: List[Dict[str, float]]) -> List[Dict]:
+    _load_sweep(sweep)
+    return [_evaluate(_worker["bars"], _worker["options"], c) for c in configs]
+
+
+class SweepRunner:
+    """Backtest many risk settings on the same bars in a process pool.
+
+    The closes and dates are copied once into shared memory; workers map
+    them as read-only numpy arrays, so the pool never pickles price data.
+    Every setting replays the same decision source, so differences in the
+    results come from sizing and the risk limits alone. ``executor`` is a
+    pool kept between sweeps (see ``SweepJobs``); without one a pool is
+    started for the run.
+    """
+
+    def __init__(
+        self,
+        bars: PriceBars,
+        decisions,
+        base=None,
+        cash: float = DEFAULT_CASH,
+        benchmark: PriceBars | TimeSeries | None = None,
+        workers: Optional[int] = None,
+        executor: Optional[ProcessPoolExecutor] = None,
+    ):
+        if isinstance(decisions, CachedReplay):
+            # workers would query the model and write the cache concurrently
+            raise ValueError("sweeps need rule or recorded decisions")
+        self.bars = bars
+        self.options = {
+            "decisions": decisions,
+            # plain settings: a live portfolio does not pickle
+            "base": (
+                {key: getattr(base, key) for key in BACKTEST_SETTINGS}
+                if base is not None
+                else {}
+            ),
+            "cash": cash,
+            "benchmark": benchmark,
+        }
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+
+    def run(
+        self, configs: Sequence[Dict[str, float]], metric: str = "sharpe"
+    ) -> Dict:
+        """Evaluate ``configs`` and return them ranked by ``metric``."""
+        start = time.perf_counter()
+        check_metric(metric)
+        configs = list(configs)
+        for config in configs:
+            _check(config)
+        workers = min(self.workers, len(configs))
+        if workers <= 1:
+            rows = self._run_inline(configs)
+        else:
+            rows = self._run_pool(configs, workers)
+        ranked = rank(rows, metric)
+        summary = {
+            "metric": metric,
+            "runs": len(ranked),
+            "workers": max(workers, 1),
+            "results": ranked,
+            "best": ranked[0] if ranked else None,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        logger.info(
+            "Sweep of %d settings in %.2fs with %d workers",
+            len(ranked),
+            summary["seconds"],
+            summary["workers"],
+        )
+        return summary
+
+    def _run_inline(self, configs: List[Dict]) -> List[Dict]:
+        return [_evaluate(self.bars, self.options, config) for config in configs]
+
+    def _run_pool(self, configs: List[Dict], workers: int) -> List[Dict]:
+        segments = []
+        try:
+            times_shm, times = _share(self.bars.times)
+            segments.append(times_shm)
+            closes_shm, closes = _share(np.ascontiguousarray(self.bars.closes))
+            segments.append(closes_shm)
+            sweep = (times, closes, self.bars.symbols, self.options)
+            pool = self.executor or _spawn_pool(workers)
+            try:
+                size = max(1, len(configs) // (workers * 4))
+                chunks = [
+                    pool.submit(_evaluate_chunk, sweep, configs[i : i + size])
+                    for i in range(0, len(configs), size)
+                ]
+                return [row for chunk in chunks for row in chunk.result()]
+            finally:
+                if pool is not self.executor:
+                    pool.shutdown()
+        finally:
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+
+
+def _spawn_pool(workers: int) -> ProcessPoolExecutor:
+    # spawn: forking a process with running server threads is unsafe
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def sweep_portfolio(
+    portfolio,
+    symbols: Sequence[str],
+    start: datetime,
+    end: datetime | None = None,
+    configs: Sequence[Dict[str, float]] = (),
+    metric: str = "sharpe",
+    source: str = "rule",
+    benchmark: str | None = None,
+    cash: float = DEFAULT_CASH,
+    fast: int = 10,
+    slow: int = 30,
+    workers: Optional[int] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+) -> Dict:
+    """Rank risk settings ``configs`` for ``portfolio`` on ``symbols``' history.
+
+    Settings not in a config keep the portfolio's values; beta and alpha
+    refer to the daily history of the ``benchmark`` symbol.
+    """
+    check_metric(metric)
+    decisions = decision_source(portfolio, source, fast, slow)
+    end = end or datetime.utcnow()
+    bars = PriceBars.load(symbols, start, end)
+    if not len(bars):
+        return {"error": "no_price_history"}
+    if benchmark:
+        benchmark = PriceBars.load([benchmark], start, end)
+    runner = SweepRunner(
+        bars, decisions, portfolio, cash, benchmark, workers, executor
+    )
+    return runner.run(configs, metric)
+
+
+class SweepJobs:
+    """Run sweeps in the background on one process pool kept between them.
+
+    ``start_job`` returns a job id right away; ``job`` reports its state and,
+    once done, the ranked results. The pool is started by the first sweep
+    that needs it (or ``warm``) and reused by later ones, so only that
+    sweep waits for workers to spawn. With a single CPU sweeps run in the
+    job thread. The last finished result per portfolio is kept in
+    ``results`` for applying its best settings.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.results: Dict[str, Dict] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[str, Dict] = {}
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers < 2:
+            return None
+        with self._lock:
+            if self._pool is None:
+                self._pool = _spawn_pool(self.workers)
+            return self._pool
+
+    def warm(self) -> None:
+        """Start the worker processes now so the first sweep does not wait."""
+        executor = self._executor()
+        if executor is not None:
+            for _ in range(self.workers):
+                executor.submit(os.getpid)
+
+    def start_job(
+        self, portfolio, symbols: Sequence[str], start: datetime, end=None, **options
+    ) -> str:
+        """Run ``sweep_portfolio`` with ``options`` in the background."""
+        job_id = str(next(self._job_ids))
+        job = {
+            "id": job_id,
+            "portfolio": portfolio.name,
+            "status": "running",
+            "runs": len(options.get("configs") or ()),
+            "result": None,
+            "started": time.time(),
+            "finished": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            for old in list(self._jobs)[:-MAX_JOBS]:
+                del self._jobs[old]
+        threading.Thread(
+            target=self._run_job,
+            args=(job, portfolio, symbols, start, end, options),
+            name=f"sweep-job-{job_id}",
+            daemon=True,
+        ).start()
+        return job_id
+
+    def _run_job(self, job: Dict, portfolio, symbols, start, end, options) -> None:
+        try:
+            executor = self._executor()
+            result = sweep_portfolio(
+                portfolio,
+                symbols,
+                start,
+                end,
+                workers=self.workers,
+                executor=executor,
+                **options,
+            )
+            if "error" in result:
+                job["status"] = "failed"
+                job["error"] = result["error"]
+            else:
+                self.results[portfolio.name] = result
+                job["result"] = result
+                job["status"] = "done"
+        except Exception as exc:
+            logger.error("Sweep job %s failed: %s", job["id"], exc)
+            job["status"] = "failed"
+            job["error"] = str(exc)
+        job["finished"] = time.time()
+
+    def job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
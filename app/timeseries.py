@@ -0,0 +1,177 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# number of points returned to charts regardless of the covered time range
+DEFAULT_CHART_POINTS = 200
+
+
+def to_epoch(value) -> float:
+    """Convert an ISO string, datetime or number to epoch seconds (UTC)."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def to_iso(ts: float) -> str:
+    """Convert epoch seconds to a naive UTC ISO string like ``utcnow().isoformat()``."""
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Return indices selected by the largest-triangle-three-buckets algorithm.
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    selected point and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    # bucket edges for the n - 2 inner points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        bx = x[start:end]
+        by = y[start:end]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+class TimeSeries:
+    """Compact time series stored as epoch seconds and float64 values.
+
+    It reads like the former list of ``{"time": iso, "value": float}`` dicts:
+    iteration, indexing and slicing yield such dicts, and ``append`` accepts
+    them. Times are kept in ascending order so ranges can be bisected; only
+    the last point can change after it was added. ``base`` is the value normalized curves are scaled against when
+    older points of the series are kept elsewhere (in the trade store).
+    """
+
+    __slots__ = ("times", "values", "base")
+
+    def __init__(self, points: Iterable[Dict] = ()):
+        self.times = array("d")
+        self.values = array("d")
+        self.base: float | None = None
+        # loaded points may come in any order; among equal times the last wins
+        loaded = [(to_epoch(p["time"]), float(p["value"])) for p in points]
+        loaded.sort(key=lambda point: point[0])
+        for ts, value in loaded:
+            self.add(ts, value)
+
+    def add(self, ts: float, value: float) -> bool:
+        """Append a point and return whether it was stored.
+
+        A point at the timestamp of the last point replaces its value (a
+        daily close updated during the day). A point older than the last one
+        is rejected: incremental readers only look at the end of the series.
+        """
+        if self.times and ts <= self.times[-1]:
+            if ts == self.times[-1]:
+                self.values[-1] = value
+                return True
+            logger.warning(
+                "Rejected point at %s before the last point at %s",
+                to_iso(ts),
+                to_iso(self.times[-1]),
+            )
+            return False
+        self.times.append(ts)
+        self.values.append(value)
+        return True
+
+    def append(self, point: Dict) -> bool:
+        return self.add(to_epoch(point["time"]), float(point["value"]))
+
+    def extend(self, points: Iterable[Dict]) -> None:
+        for point in points:
+            self.append(point)
+
+    def arrays(self, start=None, end=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return copies of the times and values between ``start`` and ``end``."""
+        size = min(len(self.times), len(self.values))
+        lo = bisect_left(self.times, to_epoch(start), 0, size) if start is not None else 0
+        hi = (
+            bisect_right(self.times, to_epoch(end), 0, size)
+            if end is not None
+            else size
+        )
+        # slicing copies the arrays so appends never hit an exported buffer
+        times = np.frombuffer(self.times[lo:hi], dtype=np.float64)
+        values = np.frombuffer(self.values[lo:hi], dtype=np.float64)
+        return times, values
+
+    def downsample(
+        self,
+        points: int | None = DEFAULT_CHART_POINTS,
+        start=None,
+        end=None,
+        normalize: bool = False,
+    ) -> List[Dict]:
+        """Return at most ``points`` visually representative points as dicts.
+
+        With ``normalize`` values are scaled so the first point of the whole
+        series (or ``base``) equals 100, matching ``normalize_curve``.
+        """
+        if not self.times:
+            return []
+        times, values = self.arrays(start, end)
+        if points:
+            idx = lttb(times, values, points)
+            times, values = times[idx], values[idx]
+        if normalize:
+            base = (self.values[0] if self.base is None else self.base) or 1
+            values = values / base * 100
+        return [
+            {"time": to_iso(t), "value": float(v)}
+            for t, v in zip(times.tolist(), values.tolist())
+        ]
+
+    def memory_usage(self) -> int:
+        return self.times.buffer_info()[1] * 8 + self.values.buffer_info()[1] * 8
+
+    def _point(self, i: int) -> Dict:
+        return {"time": to_iso(self.times[i]), "value": self.values[i]}
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self.times)):
+            yield self._point(i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._point(i) for i in range(*index.indices(len(self.times)))]
+        if index < 0:
+            index += len(self.times)
+        if not 0 <= index < len(self.times):
+            raise IndexError("TimeSeries index out of range")
+        return self._point(index)
+
+    def __repr__(self) -> str:
+        return f"TimeSeries({len(self)} points)"
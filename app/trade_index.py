@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class _PortfolioEntries:
+    """Secondary indexes for the in-memory history of one portfolio."""
+
+    __slots__ = ("portfolio", "history_id", "count", "last", "by_symbol", "by_side")
+
+    def __init__(self, portfolio):
+        self.portfolio = portfolio
+        self.history_id = id(portfolio.history)
+        self.count = 0
+        self.last = None
+        self.by_symbol: Dict[str, List[Dict]] = {}
+        self.by_side: Dict[str, List[Dict]] = {}
+
+    def is_current(self) -> bool:
+        history = self.portfolio.history
+        return (
+            self.history_id == id(history)
+            and self.count == len(history)
+            and (not history or history[-1] is self.last)
+        )
+
+    def can_extend(self) -> bool:
+        """Return True if only new trades were appended since the last update."""
+        history = self.portfolio.history
+        return (
+            self.history_id == id(history)
+            and self.count < len(history)
+            and (self.count == 0 or history[self.count - 1] is self.last)
+        )
+
+
+class TradeIndex:
+    """Map trade ids and client order ids to ``(portfolio, trade)`` pairs.
+
+    The index is updated on every recorded trade. Histories that were
+    replaced or trimmed outside of ``add`` are detected on lookup and
+    re-indexed, so callers never see stale results.
+    """
+
+    def __init__(self):
+        self._by_id: Dict[str, Tuple[object, Dict]] = {}
+        self._entries: Dict[int, _PortfolioEntries] = {}
+
+    def add(self, portfolio, trade: Dict) -> None:
+        """Index a trade that was just appended to ``portfolio.history``."""
+        entries = self._entries.get(id(portfolio))
+        if entries is None or not entries.can_extend():
+            self.rebuild(portfolio)
+            return
+        self._index(entries, trade)
+
+    def _index(self, entries: _PortfolioEntries, trade: Dict) -> None:
+        for key in (trade.get("id"), trade.get("client_order_id")):
+            if key:
+                self._by_id[str(key)] = (entries.portfolio, trade)
+        entries.by_symbol.setdefault(trade.get("symbol"), []).append(trade)
+        entries.by_side.setdefault(trade.get("side"), []).append(trade)
+        entries.count += 1
+        entries.last = trade
+
+    def rebuild(self, portfolio) -> None:
+        """Re-index the full in-memory history of a portfolio."""
+        self._drop(portfolio)
+        entries = _PortfolioEntries(portfolio)
+        self._entries[id(portfolio)] = entries
+        for trade in portfolio.history:
+            self._index(entries, trade)
+
+    def _drop(self, portfolio) -> None:
+        if self._entries.pop(id(portfolio), None) is None:
+            return
+        self._by_id = {
+            key: val for key, val in self._by_id.items() if val[0] is not portfolio
+        }
+
+    def sync(self, portfolios: Sequence) -> None:
+        """Bring the index in line with the given portfolios in O(portfolios)."""
+        current = {id(p) for p in portfolios}
+        for key in [k for k in self._entries if k not in current]:
+            self._drop(self._entries[key].portfolio)
+        for p in portfolios:
+            entries = self._entries.get(id(p))
+            if entries is not None and entries.is_current():
+                continue
+            if entries is not None and entries.can_extend():
+                for trade in p.history[entries.count :]:
+                    self._index(entries, trade)
+            else:
+                self.rebuild(p)
+
+    def get(self, trade_id: str) -> Tuple[Optional[object], Optional[Dict]]:
+        return self._by_id.get(str(trade_id), (None, None))
+
+    def filter(
+        self, portfolio, symbol: str | None = None, side: str | None = None
+    ) -> List[Dict]:
+        """Return trades of a portfolio matching symbol and/or side in order."""
+        entries = self._entries.get(id(portfolio))
+        if entries is None:
+            return []
+        if symbol and side:
+            by_symbol = entries.by_symbol.get(symbol, [])
+            by_side = entries.by_side.get(side, [])
+            if len(by_symbol) <= len(by_side):
+                return [t for t in by_symbol if t.get("side") == side]
+            return [t for t in by_side if t.get("symbol") == symbol]
+        if symbol:
+            return list(entries.by_symbol.get(symbol, []))
+        if side:
+            return list(entries.by_side.get(side, []))
+        return list(portfolio.history)
@@ -0,0 +1,154 @@
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.backtest import (
+    Backtester,
+    CachedReplay,
+    MovingAverageRule,
+    PriceBars,
+    RecordedDecisions,
+)
+from app import portfolio_manager
+from app.portfolio_manager import Portfolio
+
+
+def synthetic_bars(days: int, symbols: int, seed: int = 3) -> PriceBars:
+    rng = np.random.default_rng(seed)
+    times = 1577836800.0 + np.arange(days) * 86400.0
+    closes = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, (days, symbols)), axis=0))
+    return PriceBars(times, [f"S{i}" for i in range(symbols)], closes)
+
+
+def main():
+    bars = PriceBars.from_series(
+        {
+            "AAA": [
+                {"time": "2024-01-01T00:00:00", "close": 10.0},
+                {"time": "2024-01-03T00:00:00", "close": 12.0},
+            ],
+            "BBB": [{"time": "2024-01-02T00:00:00", "close": 50.0}],
+        }
+    )
+    print("calendar days", len(bars), "forward filled", bars.closes[:, 0].tolist())
+    print("missing before first bar", np.isnan(bars.closes[0, 1]))
+
+    template = Portfolio("Live", "key", "secret", "url", risk_level=0.5)
+    records = RecordedDecisions(
+        [
+            {"time": "2024-01-01T15:30:00", "symbol": "AAA", "decision": "Buy now"},
+            {"time": "2024-01-03T10:00:00", "symbol": "AAA", "decision": "sell all"},
+            {"time": "2024-01-02T10:00:00", "symbol": "ZZZ", "decision": "buy"},
+        ]
+    )
+    tester = Backtester(bars, records, template, cash=1000)
+    result = tester.run()
+    p = tester.portfolio
+    print("trades", result["trades"], "final value", result["final_value"])
+    print("realized pnl", p.ledger.realized, "holdings", p.holdings)
+    print("trade dates", [t["submitted_at"][:10] for t in p.history])
+    print("equity points", len(p.equity_curve), "quiet", p.quiet)
+    print("store", p.store, "journal", p.journal, "spill", p.activity_log.spill_path)
+
+    events = [
+        {"time": "2024-01-01T09:00:00", "type": "research", "message": "fetched news for AAA"},
+        {"time": "2024-01-01T09:00:01", "type": "decision", "message": "buy"},
+        {"time": "2024-01-02T09:00:00", "type": "research", "message": "fetched news for BBB"},
+        {"time": "2024-01-02T09:00:01", "type": "prompt", "message": "..."},
+        {"time": "2024-01-02T09:00:02", "type": "decision", "message": "hold"},
+    ]
+    print("recorded from activity", RecordedDecisions.from_activity(events).records)
+
+    calls = []
+
+    def decide(portfolio, symbol, day, bars):
+        calls.append((symbol, day))
+        return "buy" if day == 0 else "hold"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "decisions.json"
+        replay = CachedReplay(decide, path, key="default")
+        Backtester(bars, replay, template, cash=1000).run()
+        first = len(calls)
+        replay = CachedReplay(decide, path, key="default")
+        again = Backtester(bars, replay, template, cash=1000).run()
+        print("llm calls", first, "on replay", len(calls) - first, "hits", replay.hits)
+        print("replayed trades", again["trades"])
+
+    # risk limits act on simulated prices: a crash hits the stop-loss
+    crash = PriceBars(
+        1704067200.0 + np.arange(4) * 86400.0, ["AAA"], [[100.0], [100.0], [90.0], [95.0]]
+    )
+    rule = RecordedDecisions([{"time": "2024-01-01", "symbol": "AAA", "decision": "buy"}])
+    tester = Backtester(crash, rule, Portfolio("R", "k", "s", "u", risk_level=0.5), 1000)
+    result = tester.run()
+    print("alerts", result["alerts"], "holdings", tester.portfolio.holdings)
+
+    # a drawdown liquidation closes the lots, so later trades match new ones
+    crash = PriceBars(
+        1704067200.0 + np.arange(4) * 86400.0, ["AAA"], [[100.0], [50.0], [60.0], [70.0]]
+    )
+    rule = RecordedDecisions(
+        [
+            {"time": "2024-01-01", "symbol": "AAA", "decision": "buy"},
+            {"time": "2024-01-03", "symbol": "AAA", "decision": "buy"},
+            {"time": "2024-01-04", "symbol": "AAA", "decision": "sell"},
+        ]
+    )
+    base = Portfolio(
+        "L", "k", "s", "u", risk_level=0.5, max_drawdown_pct=0.2, stop_loss_pct=0.9
+    )
+    tester = Backtester(crash, rule, base, 1000)
+    result = tester.run()
+    p = tester.portfolio
+    print("liquidation pnl", [(t["side"], t.get("source"), t.get("pnl")) for t in p.history])
+    print("open lots", p.ledger.lots, "exposure", result["metrics"]["exposure"])
+
+    # activity of a backtest never spills to the live log directory
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = (
+            portfolio_manager.ACTIVITY_LOG_CAPACITY,
+            portfolio_manager.ACTIVITY_OVERFLOW,
+            portfolio_manager.ACTIVITY_SPILL_DIR,
+        )
+        (
+            portfolio_manager.ACTIVITY_LOG_CAPACITY,
+            portfolio_manager.ACTIVITY_OVERFLOW,
+            portfolio_manager.ACTIVITY_SPILL_DIR,
+        ) = (2, "spill", Path(tmp))
+        rule = RecordedDecisions(
+            [{"time": f"2020-01-{d:02d}", "symbol": "S0", "decision": "buy"} for d in range(1, 30)]
+        )
+        Backtester(synthetic_bars(30, 1), rule, template, cash=1_000_000).run()
+        (
+            portfolio_manager.ACTIVITY_LOG_CAPACITY,
+            portfolio_manager.ACTIVITY_OVERFLOW,
+            portfolio_manager.ACTIVITY_SPILL_DIR,
+        ) = saved
+        print("spilled files", list(Path(tmp).iterdir()))
+
+    bars = synthetic_bars(252 * 5, 20)
+    # the benchmark trades on its own calendar and starts before the replay
+    bench_times = np.arange(bars.times[0] - 10 * 86400.0, bars.times[-1], 2 * 86400.0)
+    index = np.clip(np.searchsorted(bars.times, bench_times), 0, len(bars) - 1)
+    benchmark = PriceBars(bench_times, ["^spx"], bars.closes.mean(axis=1)[index])
+    aligned = benchmark.series("^spx", bars.times)
+    print("benchmark aligned", len(aligned), "of", len(bars), aligned.times[0] == bars.times[0])
+    start = time.perf_counter()
+    result = Backtester(bars, MovingAverageRule(10, 30), benchmark=benchmark).run()
+    elapsed = time.perf_counter() - start
+    metrics = result["metrics"]
+    print(
+        f"{result['days']} days x {len(result['symbols'])} symbols:",
+        result["trades"],
+        "trades in",
+        f"{elapsed:.2f}s",
+    )
+    print("metrics present", all(metrics[k] is not None for k in ("sharpe", "beta", "turnover")))
+    print("equity points", len(result["equity"]), "under 5s", elapsed < 5)
+
+
+if __name__ == "__main__":
+    main()
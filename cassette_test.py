@@ -0,0 +1,113 @@
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+from app import cassette
+from app.price_history import get_price_history
+
+DELAY = 0.2
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        SlowHandler.hits += 1
+        time.sleep(DELAY)
+        body = f"Date,Close\n2024-01-02,{100 + SlowHandler.hits}\n2024-01-03,101.5\n".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b'{"echo": %d}' % len(body))
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    directory = Path(tempfile.mkdtemp())
+
+    with cassette.use_cassette("local", "record", directory=directory) as tape:
+        first = requests.get(f"{base}/q?s=aapl&apikey=SECRET").text
+        second = requests.get(f"{base}/q?s=aapl&apikey=SECRET").text
+        posted = requests.post(f"{base}/chat", json={"prompt": "hi"}).json()
+        session = requests.Session()
+        orders = {
+            status: session.get(f"{base}/orders", params={"status": status}).text
+            for status in ("open", "closed")
+        }
+    print("recorded", tape.stats(), "upstream hits", SlowHandler.hits)
+    saved = (directory / "local.json").read_text()
+    print("api key redacted", "SECRET" not in saved)
+    print("transport restored", requests.Session.request is not cassette._session_request)
+    server.shutdown()
+
+    # replay with the server gone: same bodies, in order, then the last repeats
+    with cassette.use_cassette("local", directory=directory, speed=0) as tape:
+        start = time.perf_counter()
+        replayed = [requests.get(f"{base}/q?s=aapl&apikey=OTHER").text for _ in range(3)]
+        instant = time.perf_counter() - start
+        print("replayed in order", replayed[:2] == [first, second], replayed[2] == second)
+        print("post", requests.post(f"{base}/chat", json={"prompt": "hi"}).json() == posted)
+        session = requests.Session()
+        print("params matched", all(
+            session.get(f"{base}/orders", params={"status": status}).text == body
+            for status, body in orders.items()
+        ), orders["open"] != orders["closed"])
+        try:
+            requests.get(f"{base}/unknown")
+        except requests.ConnectionError as exc:
+            print("miss", type(exc).__name__)
+        print("stats", tape.stats(), "instant", instant < DELAY)
+
+    for speed in (1, 4):
+        with cassette.use_cassette("local", directory=directory, speed=speed):
+            start = time.perf_counter()
+            requests.get(f"{base}/q?s=aapl")
+            elapsed = time.perf_counter() - start
+        print(f"speed {speed} latency {elapsed:.2f}s", abs(elapsed - DELAY / speed) < 0.1)
+
+    # openai's HTTP client goes through the same cassette
+    import httpx2
+
+    with cassette.use_cassette("local", directory=directory, speed=0):
+        resp = httpx2.Client().post(f"{base}/chat", json={"prompt": "hi"})
+        print("httpx2", resp.status_code, resp.json() == posted)
+
+    # a hand-written Stooq cassette makes price history deterministic offline
+    stooq = cassette.Cassette("stooq", "record", directory=directory)
+    stooq.record(
+        "GET",
+        "https://stooq.com/q/d/l/?s=aapl&i=d",
+        None,
+        200,
+        {"Content-Type": "text/csv"},
+        b"Date,Open,Close\n2024-01-02,1,185.6\n2024-01-03,1,184.2\n2024-02-01,1,186.9\n",
+        0.05,
+    )
+    stooq.save()
+    with cassette.use_cassette("stooq", directory=directory, speed=0):
+        prices = get_price_history("AAPL", datetime(2024, 1, 1), datetime(2024, 1, 31))
+        missing = get_price_history("MSFT", datetime(2024, 1, 1), datetime(2024, 1, 31))
+    print("stooq", [p["close"] for p in prices], "miss returns", missing)
+
+
+if __name__ == "__main__":
+    main()
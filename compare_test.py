@@ -0,0 +1,44 @@
+import importlib.util
+
+import numpy as np
+
+from app.compare import align_curves
+from app.portfolio_manager import Portfolio
+from snapshot_cache_test import CountingClient
+
+spec = importlib.util.spec_from_file_location("flask_app", "app.py")
+flask_app = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(flask_app)
+
+
+def main():
+    curves = [
+        (np.array([0.0, 10.0]), np.array([1.0, 2.0])),
+        (np.array([5.0]), np.array([3.0])),
+    ]
+    grid, (a, b) = align_curves(curves, points=5)
+    print("grid", grid.tolist())
+    print("aligned", a.tolist(), b.tolist())
+
+    portfolios = []
+    for i in range(3):
+        p = Portfolio(f"Cmp{i}", f"key{i}", "secret", "https://paper-api.alpaca.markets")
+        p.client = CountingClient()
+        p.equity_curve = [
+            {"time": f"2024-01-0{d + 1}T00:00:00", "value": 100.0 + d * (i + 1)}
+            for d in range(i + 2)
+        ]
+        portfolios.append(p)
+    flask_app.manager.portfolios = portfolios
+    client = flask_app.app.test_client()
+    data = client.get("/api/portfolios/compare").json
+    print("portfolios", [p["name"] for p in data["portfolios"]])
+    print("grid points", len(data["grid"]))
+    print("Cmp0 last", data["portfolios"][0]["equity_norm"][-1]["value"])
+    print("Cmp2 metrics", data["portfolios"][2]["metrics"])
+    client.get("/api/portfolios/compare")
+    print("account calls", [p.client.account_calls for p in portfolios])
+
+
+if __name__ == "__main__":
+    main()
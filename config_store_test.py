@@ -0,0 +1,54 @@
+import importlib.util
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from app.config_store import ConfigStore
+from app.portfolio_manager import RISK_SETTINGS, Portfolio, MultiPortfolioManager
+
+
+def main():
+    path = Path(tempfile.mkdtemp()) / "portfolios.json"
+    store = ConfigStore(path, delay=0.2)
+    manager = MultiPortfolioManager()
+    manager.attach_config_store(store)
+    manager.add_portfolio(Portfolio("Cfg", "key", "secret", "https://paper-api.alpaca.markets"))
+    p = manager.portfolios[0]
+    for i in range(100):
+        p.stop_loss_pct = 0.01 * (i + 1)
+        manager.mark_dirty()
+    time.sleep(0.5)
+    print("writes", store.writes)
+    print("stop_loss", json.loads(path.read_text())[0]["stop_loss_pct"])
+
+    p.take_profit_pct = 0.3
+    manager.mark_dirty()
+    store.close()
+
+    restored = MultiPortfolioManager()
+    restored.attach_config_store(ConfigStore(path))
+    print("take_profit", restored.portfolios[0].take_profit_pct)
+
+    # every risk setting survives a round trip, whatever its position
+    for i, key in enumerate(RISK_SETTINGS):
+        setattr(p, key, 0.5 + i)
+    copy = Portfolio.from_config(json.loads(json.dumps(p.to_config())))
+    print("risk settings", all(getattr(copy, k) == getattr(p, k) for k in RISK_SETTINGS))
+
+    # trades change no settings, so they do not rewrite the config file
+    spec = importlib.util.spec_from_file_location("flask_app", "app.py")
+    flask_app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(flask_app)
+    sim = Portfolio("CfgSim", "key", "secret", "sim://?cash=10000")
+    sim.client.set_prices({"AAPL": 100.0})
+    flask_app.manager.portfolios = [sim]
+    dirty = []
+    flask_app.manager.mark_dirty = lambda: dirty.append(1)
+    client = flask_app.app.test_client()
+    client.post("/portfolio/CfgSim/manual_trade", data={"symbol": "AAPL", "qty": 2, "side": "buy"})
+    print("manual trade", sim.holdings, "config writes requested", len(dirty))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import importlib.util
 from app.portfolio_manager import Portfolio
+from snapshot_cache_test import CountingClient
 
 spec = importlib.util.spec_from_file_location("flask_app", "app.py")
 flask_app = importlib.util.module_from_spec(spec)
@@ -9,13 +10,38 @@ manager = flask_app.manager
 
 def main():
     p = Portfolio("ExportTest", "key", "secret", "https://paper-api.alpaca.markets")
+    p.client = CountingClient()
     p.history = [{"id": "1", "symbol": "AAPL", "side": "buy", "qty": 1}]
     manager.portfolios = [p]
+    benchmark_updates = []
+    manager.update_benchmark = lambda: benchmark_updates.append(1)
     client = flask_app.app.test_client()
     resp = client.get("/api/portfolio/ExportTest/export?format=json")
     print("status", resp.status_code)
     if resp.is_json:
         print("name", resp.json.get("name"))
+        print("history", len(resp.json["history"]), "revision", resp.json["revision"] == p.revision())
+
+    # the dashboard and further exports reuse the cached sections
+    client.get("/")
+    client.get("/api/portfolio/ExportTest/export?format=json")
+    print("account calls", p.client.account_calls, "order calls", p.client.order_calls)
+    print("benchmark updates", len(benchmark_updates))
+    client.get("/api/portfolio/ExportTest/export?format=json&fresh=1")
+    print("after fresh: account calls", p.client.account_calls, "order calls", p.client.order_calls)
+    print("benchmark updates", len(benchmark_updates))
+
+    # exports keep every alert and curve point the dashboard trims
+    for i in range(8):
+        p.add_alert(f"alert {i}")
+    for i in range(1000):
+        p.equity_curve.add(1_700_000_000.0 + i * 60, 1000.0 + i)
+    p.touch("equity")
+    data = client.get("/api/portfolio/ExportTest/export?format=json").json
+    dashboard = flask_app._portfolio_snapshot()[0]
+    print("alerts", len(data["risk_alerts"]), "dashboard", len(dashboard["risk_alerts"]))
+    print("equity_norm", len(data["equity_norm"]), "dashboard", len(dashboard["equity_norm"]))
+
 
 if __name__ == "__main__":
     main()
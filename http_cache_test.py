@@ -0,0 +1,64 @@
+import gzip
+import importlib.util
+import time
+
+from flask import Flask
+
+from app.http_cache import conditional
+from app.portfolio_manager import Portfolio
+
+spec = importlib.util.spec_from_file_location("flask_app", "app.py")
+flask_app = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(flask_app)
+
+
+def main():
+    p = Portfolio("Etag", "key", "secret", "https://paper-api.alpaca.markets")
+    p.history = [
+        {"id": str(i), "symbol": "AAPL", "side": "buy", "qty": 1, "notes": "x" * 50}
+        for i in range(100)
+    ]
+    flask_app.manager.portfolios = [p]
+    client = flask_app.app.test_client()
+    url = "/api/portfolio/Etag/trade_history?limit=100"
+
+    first = client.get(url, headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["ETag"]
+    print("status", first.status_code, first.headers.get("Content-Encoding"))
+    print("compressed", len(first.data), "raw", len(gzip.decompress(first.data)))
+
+    second = client.get(url, headers={"If-None-Match": etag})
+    print("unchanged", second.status_code, len(second.data))
+
+    p.set_trade_notes("1", "changed")
+    third = client.get(url, headers={"If-None-Match": etag})
+    print("after change", third.status_code)
+
+    small = client.get(url + "&fields=id,side")
+    print("projected keys", sorted(small.json["trades"][0]))
+
+    # Last-Modified only covers changes whose second is over
+    state = {"revision": 1, "modified": time.time() - 5}
+    demo = Flask("demo")
+    demo.add_url_rule(
+        "/item",
+        "item",
+        conditional(lambda: (state["revision"], state["modified"]))(
+            lambda: {"revision": state["revision"]}
+        ),
+    )
+    demo_client = demo.test_client()
+    first = demo_client.get("/item")
+    since = {"If-Modified-Since": first.headers["Last-Modified"]}
+    print("if-modified-since", demo_client.get("/item", headers=since).status_code)
+    state.update(revision=2, modified=time.time())
+    fresh = demo_client.get("/item", headers=since)
+    print("changed this second", fresh.status_code, "last-modified", fresh.headers.get("Last-Modified"))
+    headers = {"If-None-Match": fresh.headers["ETag"], **since}
+    # a stale ETag beats a date that would still validate
+    state.update(revision=3, modified=state["modified"] - 10)
+    print("etag wins", demo_client.get("/item", headers=headers).status_code)
+
+
+if __name__ == "__main__":
+    main()
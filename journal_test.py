@@ -0,0 +1,110 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from app.journal import OrderJournal
+from app.portfolio_manager import Portfolio, MultiPortfolioManager
+
+
+class _Order:
+    def __init__(self, data):
+        self.data = data
+
+    def model_dump(self):
+        return dict(self.data)
+
+
+class FakeClient:
+    """Minimal broker double returning filled market orders."""
+
+    def __init__(self, orders=()):
+        self.count = 0
+        self.orders = [_Order(o) for o in orders]
+        self.crash = None
+
+    def submit_order(self, order_data):
+        self.count += 1
+        order = {
+            "id": f"o{self.count}",
+            "client_order_id": order_data.client_order_id,
+            "symbol": order_data.symbol,
+            "side": order_data.side.value,
+            "qty": order_data.qty,
+            "status": "filled",
+            "filled_qty": order_data.qty,
+            "filled_avg_price": 100.0,
+        }
+        if self.crash:
+            self.crash(order)
+        return _Order(order)
+
+    def get_orders(self, filter=None):
+        self.queried = True
+        return self.orders
+
+
+def write_and_crash(directory):
+    """Trade, then die after the broker accepted an order we did not book."""
+    p = Portfolio("Journal", "key", "secret", "https://paper-api.alpaca.markets")
+    p.client = FakeClient()
+    manager = MultiPortfolioManager([p])
+    manager.attach_journal(OrderJournal(directory, checkpoint_every=50))
+    for i in range(40):
+        p.place_order(f"SYM{i % 5}", 1, "buy")
+    p.place_order("SYM0", 8, "sell")
+    # an intent whose order never reached the broker
+    p.journal.record(p.name, "intent", symbol="SYM1", qty=2, side="sell", client_order_id="lost")
+
+    def crash(order):
+        state = {"holdings": p.holdings, "history": len(p.history), "order": order}
+        print(json.dumps(state), flush=True)
+        p.journal.sync()
+        # no close or atexit handlers: the process is killed here
+        os._exit(1)
+
+    p.client.crash = crash
+    p.place_order("SYM2", 3, "buy")
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    child = subprocess.run(
+        [sys.executable, __file__, "--crash", directory],
+        capture_output=True,
+        text=True,
+    )
+    expected = json.loads(child.stdout.strip().splitlines()[-1])
+    print("writer exit code", child.returncode)
+
+    restored = Portfolio("Journal", "key", "secret", "https://paper-api.alpaca.markets")
+    # the broker has the order the writer died on, but not the lost intent
+    restored.client = FakeClient([expected["order"]])
+    journal = OrderJournal(directory)
+    start = time.perf_counter()
+    MultiPortfolioManager([restored]).attach_journal(journal)
+    elapsed = time.perf_counter() - start
+    journal.close()
+    holdings = dict(expected["holdings"])
+    holdings["SYM2"] += 3
+    print("holdings match", restored.holdings == holdings)
+    print("history", len(restored.history), "of", expected["history"] + 1)
+    print("recovered", restored.history[-1]["client_order_id"] == expected["order"]["client_order_id"])
+    print("unconfirmed after reconcile", restored.unconfirmed_orders)
+    print(f"replay and reconcile {elapsed * 1000:.1f} ms")
+
+    # reconciled outcomes are journaled: the next start has nothing to resolve
+    again = Portfolio("Journal", "key", "secret", "https://paper-api.alpaca.markets")
+    again.client = FakeClient()
+    MultiPortfolioManager([again]).attach_journal(OrderJournal(directory))
+    print("next start", again.unconfirmed_orders, "broker queried", hasattr(again.client, "queried"))
+    print("holdings still match", again.holdings == holdings, len(again.history))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--crash"]:
+        write_and_crash(sys.argv[2])
+    else:
+        main()
@@ -0,0 +1,85 @@
+import random
+import time
+
+from app.lot_ledger import LotLedger
+from app.portfolio_manager import Portfolio
+from journal_test import _Order
+
+
+class PricedClient:
+    """Broker double filling market orders at a settable price."""
+
+    def __init__(self):
+        self.price = 100.0
+        self.filled = True
+        self.count = 0
+
+    def submit_order(self, order_data):
+        self.count += 1
+        return _Order(
+            {
+                "id": f"o{self.count}",
+                "symbol": order_data.symbol,
+                "side": order_data.side.value,
+                "qty": order_data.qty,
+                # Alpaca answers a market order before it fills
+                "filled_avg_price": self.price if self.filled else None,
+            }
+        )
+
+    def get_account(self):
+        raise RuntimeError("offline")
+
+
+def main():
+    p = Portfolio("Lots", "key", "secret", "https://paper-api.alpaca.markets")
+    p.client = PricedClient()
+    p.place_order("AAPL", 10, "buy")
+    p.client.price = 110.0
+    p.place_order("AAPL", 5, "buy")
+    p.client.price = 120.0
+    p.place_order("AAPL", 12, "sell")
+    print("partial close pnl", p.history[-1]["pnl"])  # 10*20 + 2*10
+    print("holding left", p.holdings.get("AAPL"))
+    p.client.price = 100.0
+    p.place_order("AAPL", 3, "sell")
+    print("closing pnl", p.history[-1]["pnl"], "holding", p.holdings.get("AAPL"))
+    print(p.get_top_flop_trades(limit=2))
+
+    # a sell submitted without a fill price realizes against the quote
+    p = Portfolio("Pending", "key", "secret", "https://paper-api.alpaca.markets")
+    p.client = PricedClient()
+    quotes = {"AAPL": 100.0}
+    p.price_source = quotes.get
+    p.place_order("AAPL", 10, "buy")
+    p.client.filled = False
+    quotes["AAPL"] = 105.0
+    p.place_order("AAPL", 10, "sell")
+    print("unfilled sell pnl", p.history[-1]["pnl"], "realized", p.ledger.realized)
+    ledger = LotLedger()
+    ledger.add({"symbol": "X", "side": "buy", "qty": 10, "price": 100.0})
+    print("no price pnl", ledger.add({"symbol": "X", "side": "sell", "qty": 10}),
+          "closed", ledger.closed, "lots", ledger.lots)
+
+    random.seed(3)
+    trades = []
+    for i in range(100_000):
+        side = "buy" if i % 2 == 0 else "sell"
+        trades.append(
+            {"id": str(i), "symbol": f"S{i % 50}", "side": side, "qty": 1,
+             "filled_avg_price": random.uniform(50, 150)}
+        )
+    ledger = LotLedger()
+    start = time.perf_counter()
+    ledger.rebuild(trades)
+    build = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    top = ledger.top(5)
+    query = (time.perf_counter() - start) * 1000
+    expected = sorted(t["pnl"] for t in trades if t["side"] == "sell")[-5:][::-1]
+    print("top matches sort", [e["pnl"] for e in top] == expected)
+    print(f"rebuild {build:.0f} ms, top-5 {query:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import tempfile
+import time
+from pathlib import Path
+
+from app import columnar_export
+from app.columnar_export import ParquetExporter, load_dataset
+from app.portfolio_manager import MultiPortfolioManager, Portfolio
+from app.storage import TradeStore
+
+DAY = 86400
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / "parquet"
+        store = TradeStore(Path(tmp) / "pq.db", batch_size=5000)
+        p = Portfolio("Pq", "key", "secret", "https://paper-api.alpaca.markets")
+        mem = Portfolio("Mem", "key", "secret", "https://paper-api.alpaca.markets")
+        manager = MultiPortfolioManager([p, mem])
+        start = 1_704_067_200  # 2024-01-01
+        for i in range(200_000):
+            ts = start + i * 60
+            store.add_trade(
+                p.name,
+                {
+                    "id": f"t{i}",
+                    "symbol": "AAPL" if i % 2 else "MSFT",
+                    "side": "sell" if i % 3 == 0 else "buy",
+                    "qty": 1,
+                    "filled_avg_price": 100 + i % 7,
+                    "submitted_at": f"{time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts))}+00:00",
+                    "tags": ["x"] if i % 10 == 0 else [],
+                    "pnl": 1.0 if i % 3 == 0 else None,
+                },
+            )
+        p.store = store
+        mem.history = [
+            {"id": "m1", "symbol": "TSLA", "side": "buy", "qty": 2, "submitted_at": "2024-02-01T10:00:00"}
+        ]
+        mem.log_event("trade", "buy 2 TSLA")
+        for d in range(90):
+            mem.equity_curve.add(start + d * DAY, 1000.0 + d)
+            manager.benchmark_curve.add(start + d * DAY, 400.0 + d)
+
+        exporter = ParquetExporter(manager, out)
+        first = exporter.export()
+        print("first run", first["rows"], "files", first["files"], f"{first['seconds']:.1f}s")
+        print("second run", exporter.export()["rows"])
+
+        store.add_trade(p.name, {"id": "new", "symbol": "NVDA", "side": "buy", "qty": 3, "submitted_at": "2024-06-01T09:30:00"})
+        mem.equity_curve.add(start + 91 * DAY, 2000.0)
+        print("after new records", exporter.export()["rows"])
+
+        # a failing dataset publishes nothing; earlier ones keep their marks
+        store.add_trade(p.name, {"id": "late", "symbol": "AMD", "side": "buy", "qty": 1, "submitted_at": "2024-06-02T09:30:00"})
+        mem.equity_curve.add(start + 92 * DAY, 2100.0)
+        records = exporter._records
+
+        def failing(dataset, marks, new_marks):
+            for i, record in enumerate(records(dataset, marks, new_marks)):
+                if dataset == "equity" and i == 1:
+                    raise OSError("disk full")
+                yield record
+
+        exporter._records = failing
+        # flush every record so the failure happens with a part file open
+        columnar_export.BATCH_ROWS, batch_rows = 1, columnar_export.BATCH_ROWS
+        mem.equity_curve.add(start + 93 * DAY, 2200.0)
+        failed = exporter.export(["trades", "equity"])
+        columnar_export.BATCH_ROWS = batch_rows
+        hidden = list(out.rglob(".part-*"))
+        print("failed run", failed.get("error"), failed.get("dataset"), failed["rows"], "leftover tmp", hidden)
+        exporter._records = records
+        print("retry", exporter.export(["trades", "equity"])["rows"])
+        print("equity rows after retry", len(load_dataset(out, "equity")))
+
+        # the latest point is only exported once it can no longer be replaced
+        mem.equity_curve.add(start + 93 * DAY, 2250.0)
+        exporter.export(["equity"])
+        mem.equity_curve.add(start + 94 * DAY, 2300.0)
+        exporter.export(["equity"])
+        equity = load_dataset(out, "equity", portfolios=["Mem"])
+        print("replaced value exported", equity["value"].tolist()[-3:])
+
+        # activity logged out of time order is not exported twice
+        mem.activity_log.extend([
+            {"time": "2099-03-02T10:00:00", "type": "alert", "message": "late"},
+            {"time": "2099-03-01T10:00:00", "type": "trade", "message": "early"},
+        ])
+        print("activity", exporter.export(["activity"])["rows"], exporter.export(["activity"])["rows"])
+
+        begin = time.perf_counter()
+        trades = load_dataset(out, "trades")
+        print(f"loaded {len(trades)} trades in {time.perf_counter() - begin:.2f}s")
+        print("dtypes", dict(trades.dtypes.astype(str)[["time", "qty", "tags", "date"]]))
+        jan = load_dataset(out, "trades", start="2024-01-10", end="2024-01-11", columns=["symbol", "time"])
+        print("two days", len(jan))
+        print("memory portfolio", load_dataset(out, "trades", portfolios=["Mem"])["symbol"].tolist())
+        print("equity rows", len(load_dataset(out, "equity")), "benchmark rows", len(load_dataset(out, "benchmark")))
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Offline performance suite with JSON baselines and regression budgets.
+
+    python perf_test.py            compare against perf_baseline.json
+    python perf_test.py --update   store the current numbers as the baseline
+
+Upstream APIs are served from a synthetic cassette without latency and
+portfolios trade against the simulated broker, so the numbers measure this
+code only. Exits with status 1 when a metric regresses beyond its budget.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from app import perf, portfolio_manager, research_engine
+from app.cassette import Cassette, use_cassette
+from app.diversification import calculate_correlation
+from app.portfolio_manager import MultiPortfolioManager, Portfolio
+from app.reporting import iter_trades, stream_trades_csv
+from app.storage import TradeStore
+
+ROOT = Path(__file__).resolve().parent
+STEP_GRID = [(1, 1), (1, 5), (4, 5), (16, 5)]
+SNAPSHOT_PORTFOLIOS = 20
+CORRELATION_SYMBOLS = 200
+TRADES = 100_000
+SYMBOLS = [f"S{i:03d}" for i in range(CORRELATION_SYMBOLS)]
+
+
+def upstream_cassette(directory: Path) -> None:
+    """Record synthetic Stooq, Yahoo, Finnhub and OpenAI responses."""
+    tape = Cassette("perf", "record", directory=directory)
+    csv = {"Content-Type": "text/csv"}
+    as_json = {"Content-Type": "application/json"}
+    tape.record(
+        "GET",
+        "https://stooq.com/q/l/?s=^spx&f=sd2t2ohlcv&h&e=csv",
+        None, 200, csv,
+        b"Symbol,Date,Time,Open,High,Low,Close,Volume\n"
+        b"^SPX,2024-01-02,22:00:00,4700,4750,4690,4742.8,0\n",
+        0.0,
+    )
+    rng = np.random.default_rng(7)
+    today = datetime.utcnow().date()
+    dates = [today - timedelta(days=d) for d in range(120, 0, -1)]
+    for symbol in SYMBOLS:
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+        rows = "".join(f"{d},1,1,1,{c:.4f},0\n" for d, c in zip(dates, closes))
+        tape.record(
+            "GET",
+            f"https://stooq.com/q/d/l/?s={symbol.lower()}&i=d",
+            None, 200, csv,
+            ("Date,Open,High,Low,Close,Volume\n" + rows).encode(),
+            0.0,
+        )
+        quote = {"quoteResponse": {"result": [{"symbol": symbol, "trailingPE": 20.5}]}}
+        tape.record(
+            "GET",
+            f"https://query1.finance.yahoo.com/v7/finance/quote?symbols={symbol}",
+            None, 200, as_json, json.dumps(quote).encode(), 0.0,
+        )
+        news = [{"headline": f"{symbol} beats estimates on strong demand"}] * 5
+        tape.record(
+            "GET",
+            f"https://finnhub.io/api/v1/company-news?symbol={symbol}"
+            "&from=2020-01-01&to=2020-12-31",
+            None, 200, as_json, json.dumps(news).encode(), 0.0,
+        )
+    completion = {
+        "id": "chatcmpl-perf",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4.1-mini",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "buy"},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+    tape.record(
+        "POST",
+        "https://api.openai.com/v1/chat/completions",
+        None, 200, as_json, json.dumps(completion).encode(), 0.0,
+    )
+    tape.save()
+
+
+def sim_portfolio(name: str, symbols=SYMBOLS[:20]) -> Portfolio:
+    p = Portfolio(name, "key", "secret", "sim://?cash=1e9")
+    p.client.set_prices({s: 10.0 + i for i, s in enumerate(symbols)})
+    p.price_source = p.client.price
+    return p
+
+
+def bench_step_all(metrics: dict) -> None:
+    for portfolios, symbols in STEP_GRID:
+        manager = MultiPortfolioManager(
+            [sim_portfolio(f"Step{i}") for i in range(portfolios)]
+        )
+        run = lambda: manager.step_all(SYMBOLS[:symbols])
+        metrics[f"step_all.p{portfolios}_s{symbols}_ms"] = perf.measure(run, repeat=3)
+    manager = MultiPortfolioManager([sim_portfolio(f"Step{i}") for i in range(4)])
+    metrics["step_all.p4_s5_mb"] = perf.peak_memory(
+        lambda: manager.step_all(SYMBOLS[:5])
+    )
+
+
+def bench_snapshot(flask_app, metrics: dict) -> None:
+    portfolios = []
+    for i in range(SNAPSHOT_PORTFOLIOS):
+        p = sim_portfolio(f"Snap{i}")
+        for k in range(50):
+            p.place_order(SYMBOLS[k % 20], 1, "buy")
+        portfolios.append(p)
+    flask_app.manager.portfolios = portfolios
+    run = lambda: flask_app._portfolio_snapshot(fresh=True)
+    metrics[f"snapshot.fresh_p{SNAPSHOT_PORTFOLIOS}_ms"] = perf.measure(run)
+    metrics[f"snapshot.cached_p{SNAPSHOT_PORTFOLIOS}_ms"] = perf.measure(
+        lambda: flask_app._portfolio_snapshot()
+    )
+    metrics[f"snapshot.fresh_p{SNAPSHOT_PORTFOLIOS}_mb"] = perf.peak_memory(run)
+
+
+def bench_correlation(metrics: dict) -> None:
+    for n in (20, CORRELATION_SYMBOLS):
+        run = lambda: calculate_correlation(SYMBOLS[:n])
+        metrics[f"correlation.s{n}_ms"] = perf.measure(run, repeat=3)
+    metrics[f"correlation.s{CORRELATION_SYMBOLS}_mb"] = perf.peak_memory(
+        lambda: calculate_correlation(SYMBOLS)
+    )
+
+
+def trade(i: int) -> dict:
+    return {
+        "id": f"t{i}",
+        "symbol": SYMBOLS[i % 50],
+        "side": "buy" if i % 3 else "sell",
+        "qty": 1 + i % 7,
+        "price": 100.0 + i % 13,
+        "submitted_at": (datetime(2020, 1, 1) + timedelta(minutes=i)).isoformat(),
+        "notes": "",
+        "tags": [],
+    }
+
+
+def bench_trade_history(flask_app, directory: Path, metrics: dict) -> None:
+    store = TradeStore(directory / "perf.db", batch_size=10_000)
+    p = Portfolio("Hist", "key", "secret", "sim://?cash=1e9")
+    p.history = [trade(i) for i in range(TRADES)]
+    for t in p.history:
+        store.add_trade(p.name, t)
+    store.flush()
+    flask_app.manager.portfolios = [p]
+    client = flask_app.app.test_client()
+    url = "/api/portfolio/Hist/trade_history"
+
+    page = lambda: client.get(f"{url}?limit=100&symbol=S007")
+    metrics["trade_history.memory_page_ms"] = perf.measure(page)
+    metrics["trade_history.memory_all_ms"] = perf.measure(lambda: client.get(url), 3)
+    p.store = store
+    metrics["trade_history.store_page_ms"] = perf.measure(page)
+    metrics["trade_history.store_all_ms"] = perf.measure(lambda: client.get(url), 3)
+    metrics["trade_history.store_all_mb"] = perf.peak_memory(lambda: client.get(url))
+
+    def export():
+        for _ in stream_trades_csv(iter_trades(p)):
+            pass
+
+    def download():
+        resp = client.get("/portfolio/Hist/export", buffered=False)
+        for _ in resp.response:
+            pass
+        resp.close()
+
+    seconds = perf.measure(export, repeat=3) / 1000
+    metrics["export.csv_rows_per_s"] = round(TRADES / seconds)
+    seconds = perf.measure(download, repeat=3) / 1000
+    metrics["export.csv_route_rows_per_s"] = round(TRADES / seconds)
+    metrics["export.csv_route_mb"] = perf.peak_memory(download)
+    p.store = None
+    store.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true", help="save as baseline")
+    parser.add_argument("--baseline", default=str(ROOT / perf.BASELINE_FILE))
+    args = parser.parse_args(argv)
+
+    # run in a scratch directory so the app starts without stored state
+    directory = Path(tempfile.mkdtemp(prefix="perf_"))
+    os.chdir(directory)
+    upstream_cassette(directory)
+    research_engine.FINNHUB_API_KEY = "perf"
+    portfolio_manager.OPENAI_API_KEY = "perf"
+
+    metrics = {}
+    with use_cassette("perf", speed=0, directory=directory) as tape:
+        spec = importlib.util.spec_from_file_location("flask_app", ROOT / "app.py")
+        flask_app = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(flask_app)
+        flask_app.manager.mark_dirty = lambda: None
+        flask_app.manager.journal = None
+
+        bench_step_all(metrics)
+        bench_snapshot(flask_app, metrics)
+        bench_correlation(metrics)
+        bench_trade_history(flask_app, directory, metrics)
+    metrics["process.max_rss_mb"] = round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+    )
+    print("upstream", tape.stats())
+
+    if args.update:
+        perf.save_baseline(metrics, args.baseline)
+        print("baseline saved", args.baseline)
+        return 0
+    baseline = perf.load_baseline(args.baseline)
+    try:
+        rows = perf.compare(metrics, baseline)
+    except ValueError as exc:
+        print(f"{exc}; run with --update to record a baseline on this machine")
+        return 1
+    for row in rows:
+        change = "new" if row["change"] is None else f"{row['change']:+.0%}"
+        flag = "REGRESSED" if row["regressed"] else ""
+        print(f"{row['metric']:<36} {row['value']:>12,.3f} {change:>7} {flag}")
+    regressed = [row["metric"] for row in rows if row["regressed"]]
+    print("regressions", regressed)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+import random
+import time
+
+import pandas as pd
+
+from app.portfolio_manager import Portfolio
+
+RULES = {"day": "D", "week": "W", "month": "ME"}
+
+
+def pandas_pnl(curve, interval):
+    """Reference implementation using pandas resampling."""
+    df = pd.DataFrame(list(curve))
+    df["time"] = pd.to_datetime(df["time"], format="ISO8601")
+    values = df.set_index("time")["value"].resample(RULES[interval]).last()
+    pnl = values.diff().fillna(0)
+    return [{"time": t.isoformat(), "pnl": float(v)} for t, v in pnl.items()]
+
+
+def main():
+    random.seed(7)
+    p = Portfolio("Pnl", "key", "secret", "https://paper-api.alpaca.markets")
+    ts = 1704067200.0  # 2024-01-01
+    value = 1000.0
+    for _ in range(3000):
+        # irregular spacing leaves empty days, weeks and months
+        ts += random.choice([600, 3600, 86400, 86400 * 9, 86400 * 40])
+        value += random.uniform(-20, 20)
+        p.equity_curve.add(ts, round(value, 2))
+        if random.random() < 0.01:
+            p.get_pnl_history("day")
+    for interval in RULES:
+        start = time.perf_counter()
+        fast = p.get_pnl_history(interval)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(interval, "match", fast == pandas_pnl(p.equity_curve, interval),
+              len(fast), f"{elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+from app.portfolio_manager import Portfolio
+from snapshot_cache_test import CountingClient
+
+
+class _Position:
+    def __init__(self, symbol, qty, avg, price):
+        self.data = {
+            "symbol": symbol,
+            "qty": str(qty),
+            "avg_entry_price": str(avg),
+            "current_price": str(price),
+            "market_value": str(qty * price),
+            "unrealized_pl": str(qty * (price - avg)),
+            "unrealized_plpc": str(price / avg - 1),
+        }
+
+    def model_dump(self):
+        return dict(self.data)
+
+
+class PositionsClient(CountingClient):
+    """Broker double returning fixed positions."""
+
+    def __init__(self, positions):
+        super().__init__()
+        self.positions = positions
+        self.position_calls = 0
+
+    def get_all_positions(self):
+        self.position_calls += 1
+        return self.positions
+
+
+def main():
+    p = Portfolio("Synced", "key", "secret", "https://paper-api.alpaca.markets")
+    p.client = PositionsClient(
+        [_Position("AAPL", 10, 100.0, 110.0), _Position("MSFT", 5, 200.0, 210.0)]
+    )
+    p.holdings = {"AAPL": 10, "TSLA": 2}
+    p.avg_prices = {"AAPL": 100.0, "TSLA": 50.0}
+
+    print("positions", [(x["symbol"], x["pnl"]) for x in p.get_positions()])
+    print("allocation", [(a["symbol"], round(a["percent"], 2)) for a in p.get_allocation()])
+    print("position calls", p.client.position_calls)
+    print("drift", [d["symbol"] for d in p.position_drift])
+
+    result = p.sync_positions(adopt=True)
+    print("reported drift", [d["symbol"] for d in result["drift"]])
+    print("holdings after adopt", p.holdings)
+    print("drift after adopt", p.sync_positions()["drift"])
+    print("position calls", p.client.position_calls)
+
+    q = Portfolio("NoPositions", "key", "secret", "https://paper-api.alpaca.markets")
+    q.client = CountingClient()
+    print("fallback", q.broker_positions(), q.sync_positions())
+
+
+if __name__ == "__main__":
+    main()
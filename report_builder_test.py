@@ -0,0 +1,116 @@
+import importlib.util
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from app.portfolio_manager import MultiPortfolioManager, Portfolio
+from app.report_builder import ReportBuilder
+from app.snapshot_cache import snapshot_cache_for
+
+
+def _portfolio(i):
+    p = Portfolio(f"Rep{i}", "key", "secret", "sim://?cash=100000")
+    p.client.set_prices({"AAPL": 150.0, "MSFT": 300.0})
+    p.place_order("AAPL", 2, "buy")
+    p.client.set_prices({"AAPL": 150.0 + i})
+    p.place_order("AAPL", 1, "sell")
+    p.place_order("MSFT", 1, "buy")
+    p.equity_curve = [
+        {"time": "2024-01-01T00:00:00", "value": 100000.0},
+        {"time": "2024-01-02T00:00:00", "value": 100000.0 + i},
+    ]
+    return p
+
+
+def _manager(portfolios):
+    manager = MultiPortfolioManager(portfolios)
+    # benchmark prices are not fetched from the network in this test
+    snapshot_cache_for(manager)._benchmark_fetched = time.monotonic()
+    manager.benchmark_curve.append({"time": "2024-01-01T00:00:00", "value": 4000.0})
+    return manager
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        run(Path(tmp))
+
+
+def run(output_dir):
+    portfolios = [_portfolio(i) for i in range(50)]
+    manager = _manager(portfolios)
+    builder = ReportBuilder(manager, output_dir / "csv")
+
+    start = time.perf_counter()
+    paths = builder.build(portfolios)
+    print(f"reports {time.perf_counter() - start:.3f}s, files {len(paths)}")
+    start = time.perf_counter()
+    builder.build(portfolios)
+    print(f"cached {time.perf_counter() - start:.4f}s, rendered {builder.rendered}, hits {builder.cached}")
+    print(paths[3].read_text().splitlines()[1])
+
+    portfolios[3]._record_equity(990.0)
+    builder.build(portfolios)
+    print("rerendered after change", builder.rendered - 50)
+    manager.benchmark_curve.append({"time": "2024-01-02T00:00:00", "value": 4010.0})
+    builder.build(portfolios)
+    print("rerendered after benchmark", builder.rendered - 51)
+
+    # PDFs depend on cached broker sections and the benchmark as well
+    pdfs = portfolios[:8]
+    builder.build(pdfs, "pdf")
+    rendered = builder.rendered
+    builder.build(pdfs, "pdf")
+    print("pdf cached", builder.rendered == rendered)
+    pdfs[0].client.set_prices({"AAPL": 175.0})
+    snapshot_cache_for(manager).refresh(pdfs[0])
+    builder.build(pdfs, "pdf")
+    print("pdf rerendered after account change", builder.rendered - rendered)
+    manager.benchmark_curve.append({"time": "2024-01-03T00:00:00", "value": 4020.0})
+    builder.build(pdfs, "pdf")
+    print("pdf rerendered after benchmark", builder.rendered - rendered - 1)
+    builder.close()
+
+    # a warm pool renders in parallel; with one CPU the builder renders inline
+    serial = ReportBuilder(manager, output_dir / "serial", workers=1)
+    start = time.perf_counter()
+    serial.build(pdfs, "pdf")
+    serial_time = time.perf_counter() - start
+    pooled = ReportBuilder(manager, output_dir / "pooled")
+    pooled.warm()
+    if pooled.workers > 1:
+        # wait until every worker has imported the renderer
+        for future in [pooled._executor().submit(os.getpid) for _ in range(pooled.workers)]:
+            future.result()
+    start = time.perf_counter()
+    pooled.build(pdfs, "pdf")
+    pooled_time = time.perf_counter() - start
+    print(f"serial pdf {serial_time:.3f}s, pooled pdf {pooled_time:.3f}s, workers {pooled.workers}")
+    if pooled.workers > 1:
+        print("pooled faster", pooled_time < serial_time)
+    else:
+        print("single cpu, pool used", pooled._pool is not None)
+    pooled.close()
+
+    spec = importlib.util.spec_from_file_location("flask_app", "app.py")
+    flask_app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(flask_app)
+    flask_app.manager.portfolios = portfolios[:5]
+    flask_app.report_builder.output_dir = output_dir
+    client = flask_app.app.test_client()
+    resp = client.post("/api/reports/build", json={"kind": "report"})
+    print("accepted", resp.status_code)
+    status_url = resp.json["status_url"]
+    for _ in range(300):
+        job = client.get(status_url).json
+        if job["status"] != "running":
+            break
+        time.sleep(0.1)
+    print("job", job["status"], [f["name"] for f in job["files"]])
+    print("download", client.get(job["files"][0]["url"]).status_code)
+    print("unknown file", client.get("/api/reports/files/portfolios.json").status_code)
+    flask_app.report_builder.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import time
+
+from alpaca.trading.enums import OrderSide, OrderType, TimeInForce
+from alpaca.trading.requests import MarketOrderRequest
+
+from app.portfolio_manager import MultiPortfolioManager, Portfolio
+from app.sim_broker import SimulatedBroker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def order(symbol, qty, side="buy"):
+    return MarketOrderRequest(
+        symbol=symbol,
+        qty=qty,
+        side=OrderSide.BUY if side == "buy" else OrderSide.SELL,
+        type=OrderType.MARKET,
+        time_in_force=TimeInForce.DAY,
+    )
+
+
+def main():
+    broker = SimulatedBroker(cash=10_000, prices={"AAPL": 100.0}, slippage_bps=10)
+    filled = broker.submit_order(order("AAPL", 10)).model_dump()
+    print("status", filled["status"], "fill price", round(filled["filled_avg_price"], 4))
+    account = broker.get_account().model_dump()
+    print("cash", round(account["cash"], 2), "value", round(account["portfolio_value"], 2))
+    for request in (order("AAPL", 11, "sell"), order("MSFT", 1), order("AAPL", 1000)):
+        try:
+            broker.submit_order(request)
+        except ValueError as exc:
+            print("rejected", exc)
+
+    clock = FakeClock()
+    broker = SimulatedBroker(
+        cash=10_000, prices={"AAPL": 100.0}, latency=1.0, fill_ratio=0.4, clock=clock
+    )
+    pending = broker.submit_order(order("AAPL", 10)).model_dump()
+    print("before latency", pending["status"], pending["filled_avg_price"])
+    states = []
+    for _ in range(3):
+        clock.now += 1.0
+        o = broker.get_orders(status="all")[0]
+        states.append((o.status, round(o.filled_qty, 4)))
+    print("fills", states)
+    closed = broker.get_orders(status="closed")
+    print("open orders", len(broker.get_orders()), "closed", len(closed))
+    broker.set_prices({"AAPL": 110.0})
+    position = broker.get_all_positions()[0].model_dump()
+    print("position", position["qty"], position["avg_entry_price"], position["unrealized_pl"])
+    broker.close_all_positions(cancel_orders=True)
+    clock.now += 3.0
+    print("after close", broker.get_all_positions(), round(broker.get_account().cash, 2))
+
+    # queued buys reserve their notional until they fill
+    clock = FakeClock()
+    broker = SimulatedBroker(cash=1_000, prices={"AAPL": 100.0}, latency=1.0, clock=clock)
+    broker.submit_order(order("AAPL", 6))
+    print("buying power with pending buy", broker.get_account().buying_power)
+    try:
+        broker.submit_order(order("AAPL", 6))
+    except ValueError as exc:
+        print("second buy rejected", exc)
+    clock.now += 1.0
+    print("cash after fill", broker.get_account().cash)
+
+    # the Portfolio works against the simulated broker unchanged
+    p = Portfolio("Sim", "key", "secret", "sim://?cash=5000")
+    p.client.set_prices({"AAPL": 50.0, "MSFT": 200.0})
+    p.price_source = p.client.price
+    p.place_order("AAPL", 10, "buy")
+    p.place_order("MSFT", 5, "buy")
+    p.place_order("AAPL", 4, "sell")
+    print("holdings", p.holdings, "drift", p.sync_positions()["drift"])
+    print("positions", [(x["symbol"], x["qty"]) for x in p.get_positions()])
+    ids = {t["id"] for t in p.history}
+    print("orders", len(p.get_orders(status="all")), "trade ids unique", len(ids) == 3)
+
+    # open orders holding a position make only that close fail
+    clock = FakeClock()
+    broker = SimulatedBroker(
+        cash=10_000, prices={"AAPL": 100.0, "MSFT": 200.0}, latency=1.0, clock=clock
+    )
+    broker.submit_order(order("AAPL", 5))
+    broker.submit_order(order("MSFT", 5))
+    clock.now += 1.0
+    broker.submit_order(order("AAPL", 5, "sell"))
+    responses = broker.close_all_positions()
+    print("close responses", [(r.symbol, r.status) for r in responses])
+    print("close error", responses[0].body.message, "positions", broker.get_all_positions()[0].symbol)
+    p.client = broker
+    p.holdings = {"AAPL": 5, "MSFT": 5}
+    p._record_liquidation(responses)
+    print("liquidated", [t["symbol"] for t in p.history if t.get("source") == "liquidation"])
+
+    # a manager of simulated portfolios runs the live trading step offline
+    manager = MultiPortfolioManager(
+        [Portfolio(f"P{i}", "sim", "sim", "sim://?cash=100000") for i in (1, 2)]
+    )
+    for sim in manager.portfolios:
+        sim.client.set_prices({"AAPL": 190.0, "MSFT": 410.0})
+        print(sim.name, "account status", sim.get_account_info().get("status"))
+    manager.step_all(["AAPL", "MSFT"])
+    print("history sizes after step", [len(sim.history) for sim in manager.portfolios])
+
+    # raw broker throughput
+    broker = SimulatedBroker(cash=1e12, prices={f"S{i}": 10.0 + i for i in range(50)})
+    requests = [order(f"S{i % 50}", 1) for i in range(50_000)]
+    start = time.perf_counter()
+    for request in requests:
+        broker.submit_order(request)
+    elapsed = time.perf_counter() - start
+    rate = len(requests) / elapsed
+    print(f"broker orders/s {rate:,.0f}", "over 20k", rate > 20_000)
+    print("bytes per order", round(broker.memory_usage() / len(requests), 1))
+
+    # end to end through the manager's order path
+    portfolios = [
+        Portfolio(f"Load{i}", "key", "secret", "sim://?cash=1e9") for i in range(10)
+    ]
+    manager = MultiPortfolioManager(portfolios)
+    for p in portfolios:
+        p.client.set_prices({f"S{i}": 10.0 + i for i in range(50)})
+        p.price_source = p.client.price
+    n = 2_000
+    start = time.perf_counter()
+    for k in range(n):
+        symbol = f"S{k % 50}"
+        for p in manager.portfolios:
+            side = "sell" if k % 3 == 0 and p.holdings.get(symbol) else "buy"
+            p.place_order(symbol, 1, side)
+    elapsed = time.perf_counter() - start
+    total = n * len(portfolios)
+    print(f"portfolio orders/s {total / elapsed:,.0f}")
+    print("history sizes", {len(p.history) for p in portfolios})
+    print("no drift", all(not p.sync_positions()["drift"] for p in portfolios))
+
+
+if __name__ == "__main__":
+    main()
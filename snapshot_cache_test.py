@@ -0,0 +1,65 @@
+import time
+
+from app.portfolio_manager import Portfolio, MultiPortfolioManager
+from app.snapshot_cache import SnapshotCache
+
+
+class _Account:
+    def __init__(self, value):
+        self.value = value
+
+    def model_dump(self):
+        return {"cash": 1000.0, "portfolio_value": self.value}
+
+
+class CountingClient:
+    """Broker double counting account and order requests."""
+
+    def __init__(self):
+        self.account_calls = 0
+        self.order_calls = 0
+
+    def get_account(self):
+        self.account_calls += 1
+        return _Account(1000.0 + self.account_calls)
+
+    def get_orders(self, status="open"):
+        self.order_calls += 1
+        return []
+
+
+def main():
+    p = Portfolio("Cached", "key", "secret", "https://paper-api.alpaca.markets")
+    p.client = CountingClient()
+    manager = MultiPortfolioManager([p])
+    manager.update_benchmark = lambda: None
+    cache = SnapshotCache(manager, ttls={"account": 0.2})
+
+    cache.snapshot()
+    cache.snapshot()
+    print("account calls after two loads", p.client.account_calls)
+    print("order calls after two loads", p.client.order_calls)
+
+    p.touch("history", "holdings")
+    cache.snapshot()
+    print("account calls after trade", p.client.account_calls)
+
+    time.sleep(0.3)
+    data = cache.snapshot()
+    time.sleep(0.2)
+    print("served stale value", data[0]["portfolio_value"])
+    print("background refreshes", cache.refreshes)
+    print("fresh value", cache.snapshot()[0]["portfolio_value"])
+
+    calls = p.client.account_calls
+    data = cache.snapshot(fresh=True)
+    print("fresh refetched account", p.client.account_calls - calls)
+    print("snapshot revision current", data[0]["revision"] == p.revision())
+
+    p.stop_loss_pct = 0.07
+    print("config revision", p.revision("config") > 0)
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+
+# cold start budget for importing app.py; override with STARTUP_THRESHOLD_MS
+THRESHOLD_MS = float(os.getenv("STARTUP_THRESHOLD_MS", "800"))
+RUNS = 5
+HEAVY_MODULES = ("pandas", "openai", "alpaca", "fpdf", "textblob")
+
+_PROBE = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("flask_app", "app.py")
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+elapsed = (time.perf_counter() - start) * 1000
+heavy = [m for m in %r if m in sys.modules]
+print(json.dumps({"ms": elapsed, "heavy": heavy}))
+""" % (HEAVY_MODULES,)
+
+
+def measure() -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    results = [measure() for _ in range(RUNS)]
+    best = min(r["ms"] for r in results)
+    print(f"startup best of {RUNS}: {best:.0f} ms (threshold {THRESHOLD_MS:.0f} ms)")
+    print("heavy modules loaded", results[0]["heavy"])
+    if best > THRESHOLD_MS or results[0]["heavy"]:
+        print("startup regression")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import importlib.util
+
+from app.portfolio_manager import Portfolio
+from snapshot_cache_test import CountingClient
+
+spec = importlib.util.spec_from_file_location("flask_app", "app.py")
+flask_app = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(flask_app)
+
+
+def main():
+    p = Portfolio("Delta", "key", "secret", "https://paper-api.alpaca.markets")
+    p.client = CountingClient()
+    flask_app.manager.portfolios = [p]
+    flask_app.manager.update_benchmark = lambda: None
+
+    socket = flask_app.socketio.test_client(flask_app.app)
+    flask_app.app.test_client().get("/")
+    socket.get_received()
+    start = flask_app.state.rev
+
+    p.strategy_type = "momentum"
+    flask_app._publish_state()
+    delta = socket.get_received()[0]["args"][0]
+    print("changed sections", list(delta["portfolios"]["Delta"]))
+    print("base", delta["base"] == start)
+
+    flask_app._publish_state()
+    print("no change emits", len(socket.get_received()))
+
+    socket.emit("resync", {"rev": start, "epoch": flask_app.state.epoch})
+    resync = socket.get_received()[0]["args"][0]
+    print("resync sections", list(resync["portfolios"]["Delta"]))
+    socket.emit("resync", {"rev": start, "epoch": "old"})
+    full = socket.get_received()[0]["args"][0]
+    print("other epoch full", full["full"], len(full["portfolios"]["Delta"]))
+
+
+if __name__ == "__main__":
+    main()
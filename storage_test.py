@@ -0,0 +1,77 @@
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from app import storage
+from app.portfolio_manager import Portfolio, MultiPortfolioManager
+from app.storage import TradeStore
+
+
+def main():
+    db = Path(tempfile.mkdtemp()) / "trading.db"
+    p = Portfolio("Store", "key", "secret", "https://paper-api.alpaca.markets")
+    p.history = [
+        {"id": str(i), "symbol": "AAPL" if i % 2 else "MSFT", "side": "buy" if i % 3 else "sell", "qty": 1}
+        for i in range(10)
+    ]
+    p.equity_curve = [{"time": "2023-01-01T00:00:00", "value": 1000.0}]
+    p.log_event("trade", "buy 1 AAPL")
+    manager = MultiPortfolioManager([p])
+    store = TradeStore(db)
+    manager.attach_store(store)
+    p.set_trade_notes("3", "persisted note")
+
+    trades, cursor = store.query_trades("Store", symbol="AAPL", limit=2)
+    print("page1", [t["id"] for t in trades], "cursor", cursor)
+    trades, cursor = store.query_trades("Store", symbol="AAPL", limit=2, before=cursor)
+    print("page2", [t["id"] for t in trades], "cursor", cursor)
+    store.close()
+
+    # simulate a restart: state is restored from the database
+    restored = Portfolio("Store", "key", "secret", "https://paper-api.alpaca.markets")
+    store = TradeStore(db)
+    MultiPortfolioManager([restored]).attach_store(store)
+    print("restored trades", len(restored.history), "equity", len(restored.equity_curve))
+    print("note", restored.find_trade("3").get("notes"))
+    store.close()
+
+    # trades without an order id are not imported again on every start
+    manual = {"symbol": "TSLA", "side": "buy", "qty": 2, "submitted_at": "2024-01-02T10:00:00"}
+    for _ in range(3):
+        again = Portfolio("Store", "key", "secret", "https://paper-api.alpaca.markets")
+        again.history = [dict(manual)]
+        store = TradeStore(db)
+        MultiPortfolioManager([again]).attach_store(store)
+        count = store.count("trades", "Store")
+        store.close()
+    print("trades after 3 restarts", count)
+
+    # a lone write is committed by the timer, without another write or read
+    store = TradeStore(db, flush_interval=0.2)
+    store.add_equity("Idle", {"time": "2024-01-01T00:00:00", "value": 1.0})
+    time.sleep(0.5)
+    with sqlite3.connect(db) as conn:
+        idle = conn.execute("SELECT COUNT(*) FROM equity WHERE portfolio = 'Idle'").fetchone()
+    print("idle write committed", idle[0])
+    store.close()
+
+    # only recent equity points are restored; older ranges are read from the store
+    storage.HOT_EQUITY = 5
+    store = TradeStore(db)
+    for day in range(1, 21):
+        store.add_equity("Curve", {"time": f"2024-01-{day:02d}T00:00:00", "value": 100.0 + day})
+    store.flush()
+    curve = Portfolio("Curve", "key", "secret", "https://paper-api.alpaca.markets")
+    manager = MultiPortfolioManager([curve])
+    manager.attach_store(store)
+    print("hot equity", len(curve.equity_curve), curve.equity_curve[0]["time"])
+    older = curve.equity_series("2024-01-03T00:00:00", "2024-01-10T00:00:00")
+    print("paged", len(older), older[0]["value"], older[-1]["value"])
+    norm = manager.get_normalized_equity(curve)
+    print("normalized to first stored point", round(norm[-1]["value"], 3))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
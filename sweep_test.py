@@ -0,0 +1,118 @@
+import importlib.util
+import os
+import time
+
+from app.backtest import MovingAverageRule, PriceBars
+from app.portfolio_manager import Portfolio
+from app.sweep import SweepJobs, SweepRunner, parameter_grid, random_sample, rank
+from backtest_test import synthetic_bars
+
+
+def shared_blocks():
+    return {f for f in os.listdir("/dev/shm") if f.startswith("psm_")}
+
+
+def main():
+    grid = parameter_grid(
+        {
+            "stop_loss_pct": [0.03, 0.06],
+            "take_profit_pct": [0.1, 0.2],
+            "max_drawdown_pct": [0.1, 0.3],
+            "risk_level": [0.02, 0.1],
+        }
+    )
+    print("grid size", len(grid), grid[0])
+    sample = random_sample({"risk_level": [0.01, 0.1], "stop_loss_pct": [0.02, 0.1]}, 5, seed=1)
+    print("sample in bounds", all(0.01 <= s["risk_level"] <= 0.1 for s in sample))
+    try:
+        parameter_grid({"leverage": [1, 2]})
+    except ValueError as exc:
+        print("rejected", exc)
+    rows = [{"sharpe": None}, {"sharpe": 0.5}, {"sharpe": 1.5}]
+    print("ranked", [r["sharpe"] for r in rank(rows)])
+
+    bars = synthetic_bars(252 * 3, 20)
+    base = Portfolio("Base", "key", "secret", "url", trade_pnl_limit_pct=0.5)
+    start = time.perf_counter()
+    inline = SweepRunner(bars, MovingAverageRule(), base, workers=1).run(grid)
+    print(f"inline {len(grid)} runs {time.perf_counter() - start:.2f}s")
+    before = shared_blocks()
+    start = time.perf_counter()
+    pooled = SweepRunner(bars, MovingAverageRule(), base, workers=2).run(grid)
+    print(f"pool {len(grid)} runs {time.perf_counter() - start:.2f}s (includes worker start)")
+    print("same ranking", [r["sharpe"] for r in inline["results"]] == [r["sharpe"] for r in pooled["results"]])
+    print("shared memory released", shared_blocks() == before)
+    best = pooled["best"]
+    print("best", {k: best[k] for k in ("stop_loss_pct", "take_profit_pct", "risk_level")})
+    by_drawdown = SweepRunner(bars, MovingAverageRule(), base, workers=1).run(grid, "max_drawdown")
+    drawdowns = [r["max_drawdown"] for r in by_drawdown["results"]]
+    print("drawdown ascending", drawdowns == sorted(drawdowns))
+
+    # sweep jobs reuse one pool, so only the first waits for workers to start
+    loads = []
+
+    def load(cls, symbols, start, end, fetch=None):
+        loads.append(list(symbols))
+        return bars
+
+    PriceBars.load = classmethod(load)
+    jobs = SweepJobs(workers=2)
+    times = []
+    for _ in range(2):
+        start = time.perf_counter()
+        job_id = jobs.start_job(base, ["S0"], None, None, configs=grid, benchmark="^spx")
+        while jobs.job(job_id)["status"] == "running":
+            time.sleep(0.01)
+        times.append(time.perf_counter() - start)
+    job = jobs.job(job_id)
+    print(f"sweep jobs {times[0]:.2f}s then {times[1]:.2f}s, reused pool faster", times[1] < times[0])
+    print("job", job["status"], job["result"]["runs"], "benchmark loaded", loads[-1] == ["^spx"])
+    print("same ranking in jobs", [r["sharpe"] for r in job["result"]["results"]] == [r["sharpe"] for r in inline["results"]])
+    print("shared memory released", shared_blocks() == before)
+    jobs.close()
+
+    # the API runs sweeps as jobs and applies the best result
+    spec = importlib.util.spec_from_file_location("flask_app", "app.py")
+    flask_app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(flask_app)
+    p = Portfolio("SweepMe", "key", "secret", "url")
+    flask_app.manager.portfolios = [p]
+    flask_app.manager.mark_dirty = lambda: None
+    client = flask_app.app.test_client()
+    resp = client.post(
+        "/api/portfolio/SweepMe/sweep",
+        json={
+            "symbols": ["S0", "S1"],
+            "start": "2020-01-01",
+            "grid": {"risk_level": [0.02, 0.1], "stop_loss_pct": [0.03, 0.1]},
+            "limit": 2,
+        },
+    )
+    print("accepted", resp.status_code)
+    status_url = resp.json["status_url"]
+    for _ in range(600):
+        job = client.get(status_url).json
+        if job["status"] != "running":
+            break
+        time.sleep(0.05)
+    body = job["result"]
+    print("sweep", job["status"], body["runs"], "rows", len(body["results"]))
+    resp = client.post("/api/portfolio/SweepMe/sweep/apply", json={})
+    print("applied", resp.status_code, resp.json["applied"] == {
+        k: body["best"][k] for k in ("stop_loss_pct", "risk_level")
+    })
+    print("portfolio settings", p.risk_level == body["best"]["risk_level"])
+    print("bad grid", client.post(
+        "/api/portfolio/SweepMe/sweep",
+        json={"symbols": ["S0"], "start": "2020-01-01", "grid": {"leverage": [2]}},
+    ).status_code)
+    calls = len(loads)
+    resp = client.post(
+        "/api/portfolio/SweepMe/sweep",
+        json={"symbols": ["S0"], "start": "2020-01-01", "grid": {"risk_level": [0.1]}, "metric": "alpha"},
+    )
+    print("bad metric", resp.status_code, resp.json["error"], "bars loaded", len(loads) - calls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import math
+from bisect import bisect_right
+
+from app.analytics import PerformanceTracker, values_at
+from app.benchmark import normalize_curve
+from app.portfolio_manager import Portfolio
+from app.timeseries import TimeSeries, to_iso
+
+
+def main():
+    points = [
+        {"time": to_iso(1_700_000_000 + i * 60), "value": 1000 + 50 * math.sin(i / 50)}
+        for i in range(10_000)
+    ]
+    series = TimeSeries(points)
+    print("points", len(series), "bytes", series.memory_usage())
+    print("last", series[-1] == points[-1])
+    sampled = series.downsample(200)
+    print("downsampled", len(sampled), sampled[0] == points[0], sampled[-1] == points[-1])
+    ranged = series.downsample(50, start=points[1000]["time"], end=points[2000]["time"])
+    print("range", len(ranged), ranged[0]["time"], ranged[-1]["time"])
+    norm = series.downsample(None, normalize=True)
+    print("normalized matches", norm == normalize_curve(points))
+
+    p = Portfolio("Series", "key", "secret", "https://paper-api.alpaca.markets")
+    p.equity_curve = points[:3]
+    print("coerced", type(p.equity_curve).__name__, len(p.equity_curve))
+
+    # an equal timestamp replaces the last value, an older one is rejected
+    ordered = TimeSeries()
+    print("added", [ordered.add(t, v) for t, v in [(10, 1.0), (20, 2.0), (20, 2.5), (15, 9.0)]])
+    print("ordered", list(ordered.times), list(ordered.values))
+    print("bisect", bisect_right(ordered.times, 15), values_at(ordered, [15.0, 25.0]).tolist())
+    shuffled = TimeSeries([{"time": to_iso(t), "value": t} for t in (30, 10, 20, 20.0)])
+    print("loaded sorted", list(shuffled.times))
+
+    # a replaced last benchmark value reaches points folded before the change
+    equity, bench = TimeSeries(), TimeSeries()
+    tracker = PerformanceTracker()
+    day = 86400
+    for d in range(30):
+        bench.add(d * day, 400.0 + d * (1 + d % 3))
+        for hour in range(0, 24, 6):
+            equity.add(d * day + hour * 3600, 1000.0 + 2 * d + math.sin(hour + d))
+            if hour == 12:
+                bench.add(d * day, 401.0 + d * (1 + d % 3) + hour / 10)
+            tracker.sync(equity, bench)
+            tracker.metrics()
+    equity.add(29 * day + 18 * 3600, 1100.0)
+    tracker.sync(equity, bench)
+    scratch = PerformanceTracker()
+    scratch.sync(equity, bench)
+    incremental, full = tracker.metrics(), scratch.metrics()
+    print("tracker matches rebuild", all(
+        math.isclose(incremental[k], full[k], rel_tol=1e-9, abs_tol=1e-12)
+        for k in ("beta", "alpha", "sharpe", "total_return")
+    ), round(incremental["beta"], 4), round(incremental["total_return"], 4))
+
+
+if __name__ == "__main__":
+    main()
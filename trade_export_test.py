@@ -0,0 +1,78 @@
+import csv
+import importlib.util
+import io
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+from app.portfolio_manager import Portfolio
+from app.reporting import TRADE_COLUMNS, iter_trades, stream_trades_csv
+from app.storage import TradeStore
+
+spec = importlib.util.spec_from_file_location("flask_app", "app.py")
+flask_app = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(flask_app)
+
+
+def _trades(n):
+    for i in range(n):
+        trade = {
+            "id": f"t{i}",
+            "symbol": "AAPL" if i % 2 else "MSFT",
+            "side": "sell" if i % 3 == 0 else "buy",
+            "qty": 1,
+            "submitted_at": f"2024-01-{i % 28 + 1:02d} 10:00:00+00:00",
+        }
+        if i % 3 == 0:
+            trade["pnl"] = 1.5
+        if i % 5 == 0:
+            trade["source"] = "manual"
+            trade["decision_explainer"] = {"response": "hold"}
+        yield trade
+
+
+def main():
+    p = Portfolio("Export", "key", "secret", "https://paper-api.alpaca.markets")
+    p.history = list(_trades(30))
+    rows = list(csv.reader(io.StringIO("".join(stream_trades_csv(p.history)))))
+    print("header stable", rows[0] == TRADE_COLUMNS)
+    print("rows", len(rows) - 1, "same width", {len(r) for r in rows} == {len(TRADE_COLUMNS)})
+    print("pnl of first sell", rows[1][TRADE_COLUMNS.index("pnl")])
+    print("extra", rows[1][-1])
+
+    filtered = list(iter_trades(p, start="2024-01-05", end="2024-01-06", symbols=["aapl"]))
+    print("filtered", [t["id"] for t in filtered])
+
+    client = flask_app.app.test_client()
+    q = Portfolio("Other", "key", "secret", "https://paper-api.alpaca.markets")
+    q.history = list(_trades(3))
+    flask_app.manager.portfolios = [p, q]
+    resp = client.get("/portfolio/Export/export?symbols=MSFT")
+    print("streamed", resp.is_streamed, resp.mimetype)
+    body = resp.get_data(as_text=True).splitlines()
+    print("MSFT rows", len(body) - 1)
+    resp = client.get("/export/trades.zip?names=Export,Other")
+    archive = zipfile.ZipFile(io.BytesIO(resp.get_data()))
+    print("zip entries", archive.namelist())
+    print("zip rows", [len(archive.read(n).decode().splitlines()) - 1 for n in archive.namelist()])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TradeStore(Path(tmp) / "export.db", batch_size=5000)
+        big = Portfolio("Big", "key", "secret", "https://paper-api.alpaca.markets")
+        for trade in _trades(100_000):
+            store.add_trade(big.name, trade)
+        big.store = store
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = sum(len(c) for c in stream_trades_csv(iter_trades(big)))
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"100k trades {size / 1e6:.1f} MB in {elapsed:.2f}s, peak {peak / 1e6:.1f} MB")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+from app.portfolio_manager import Portfolio, MultiPortfolioManager
+
+
+def main():
+    p1 = Portfolio("Idx1", "key1", "secret1", "https://paper-api.alpaca.markets")
+    p2 = Portfolio("Idx2", "key2", "secret2", "https://paper-api.alpaca.markets")
+    p1.history = [
+        {"id": f"a{i}", "client_order_id": f"c{i}", "symbol": "AAPL" if i % 2 else "MSFT", "side": "buy" if i % 3 else "sell"}
+        for i in range(1000)
+    ]
+    manager = MultiPortfolioManager([p1, p2])
+    p, trade = manager.find_trade("a10")
+    print("by id", p.name, trade["symbol"])
+    p, trade = manager.find_trade("c11")
+    print("by client id", p.name, trade["id"])
+
+    # trades recorded after indexing are picked up on insert
+    p2._record_trade({"id": "b1", "symbol": "TSLA", "side": "buy"})
+    print("inserted", manager.find_trade("b1")[0].name)
+
+    # a replaced history is re-indexed on the next lookup
+    p2.history = [{"id": "b2", "symbol": "TSLA", "side": "sell"}]
+    print("replaced", manager.find_trade("b1"), manager.find_trade("b2")[1]["side"])
+
+    print("AAPL sells", len(manager.filter_trades(p1, symbol="AAPL", side="sell")))
+    print("buys", len(manager.filter_trades(p1, side="buy")))
+
+
+if __name__ == "__main__":
+    main()